@@ -0,0 +1,22 @@
+from django.urls import path
+
+from .async_views import AsyncMovieAPIView, AsyncPersonAPIView
+from .urls import urlpatterns as sync_urlpatterns
+
+app_name = "api"
+
+# Асинхронные представления перекрывают действия 'list' и 'retrieve'
+# вьюсетов с теми же адресами
+urlpatterns = [
+    path("movies/", AsyncMovieAPIView.as_view(), name="movies-list"),
+    path(
+        "movies/<int:pk>/", AsyncMovieAPIView.as_view(), name="movies-detail"
+    ),
+    path("persons/", AsyncPersonAPIView.as_view(), name="persons-list"),
+    path(
+        "persons/<int:pk>/",
+        AsyncPersonAPIView.as_view(),
+        name="persons-detail",
+    ),
+    *sync_urlpatterns,
+]
@@ -0,0 +1,121 @@
+from asgiref.sync import sync_to_async
+from django.http import Http404
+from django.views import View
+from rest_framework.response import Response
+
+from movies.async_views import gather_dict
+from movies.user_state import get_user_state
+from .views import MovieViewSet, PersonViewSet
+
+
+class AsyncReadOnlyAPIView(View):
+    """
+    Асинхронные действия 'list' и 'retrieve' вьюсета 'viewset_class'
+    для ASGI-приложения.
+
+    Аутентификация, права, фильтры, пагинация, условные запросы и
+    сериализаторы - те же, что у вьюсета, поэтому ответы совпадают
+    с синхронными. Объект извлекается асинхронным ORM вместе
+    с пакетными данными ответа ('get_bulk_context' вьюсета) и
+    состоянием пользователя для полей 'user_state_fields' (поле
+    сериализатора - метод 'UserStateResolver'); Запросы к БД при этом
+    выполняются по очереди (см. movies.async_views).
+    """
+
+    viewset_class = None
+    user_state_fields = {}
+
+    def get_viewset(self, request, **kwargs):
+        action = "retrieve" if kwargs else "list"
+        viewset = self.viewset_class(
+            action_map={"get": action},
+            args=(),
+            kwargs=kwargs,
+            format_kwarg=None,
+        )
+        viewset.request = viewset.initialize_request(request, **kwargs)
+        viewset.headers = viewset.default_response_headers
+        return viewset
+
+    async def get(self, request, **kwargs):
+        viewset = self.get_viewset(request, **kwargs)
+        try:
+            response = await self.handle(viewset)
+        except Exception as exc:
+            response = viewset.handle_exception(exc)
+        return viewset.finalize_response(viewset.request, response)
+
+    async def handle(self, viewset):
+        await sync_to_async(viewset.initial)(viewset.request)
+        if viewset.action == "list":
+            get_validators, get_data = viewset.get_list_validators, self.alist
+        else:
+            get_validators = viewset.get_object_validators
+            get_data = self.aretrieve
+        validators = await sync_to_async(get_validators)()
+        response = viewset.get_not_modified_response(validators)
+        if response is None:
+            response = await get_data(viewset)
+        return viewset.set_validator_headers(response, validators)
+
+    async def alist(self, viewset):
+        queryset = viewset.filter_queryset(viewset.get_queryset())
+        page = await sync_to_async(viewset.paginate_queryset)(queryset)
+        objects = page if page is not None else await self.aload(queryset)
+        data = await sync_to_async(
+            lambda: viewset.get_serializer(objects, many=True).data
+        )()
+        if page is not None:
+            return viewset.get_paginated_response(data)
+        return Response(data)
+
+    async def aload(self, queryset):
+        # В Django 4.2 асинхронная итерация не поддерживает prefetch_related
+        if queryset._prefetch_related_lookups:
+            return await sync_to_async(list)(queryset)
+        return [obj async for obj in queryset]
+
+    async def aretrieve(self, viewset):
+        pk = viewset.kwargs[viewset.lookup_url_kwarg or viewset.lookup_field]
+        queryset = viewset.filter_queryset(viewset.get_queryset())
+        stub = queryset.model(pk=pk)
+        preloaded = await gather_dict({
+            "object": self.aget_object(queryset, pk),
+            "context": sync_to_async(viewset.get_bulk_context)([stub.pk]),
+            **self.get_user_state_preloads(viewset, stub),
+        })
+        context = viewset.get_serializer_context() | preloaded["context"]
+        serializer = viewset.get_serializer_class()(
+            preloaded["object"], context=context
+        )
+        return Response(await sync_to_async(lambda: serializer.data)())
+
+    def get_user_state_preloads(self, viewset, stub):
+        """
+        Корутины, извлекающие голос или закладку пользователя для
+        запрошенных полей 'user_state_fields'.
+        """
+        fields = viewset.get_serializer_class().get_requested_fields(
+            viewset.request
+        )
+        user_state = get_user_state(viewset.request)
+        return {
+            field: sync_to_async(getattr(user_state, method))(stub)
+            for field, method in self.user_state_fields.items()
+            if fields is None or field in fields
+        }
+
+    async def aget_object(self, queryset, pk):
+        try:
+            return await queryset.aget(pk=pk)
+        except queryset.model.DoesNotExist:
+            raise Http404
+
+
+class AsyncMovieAPIView(AsyncReadOnlyAPIView):
+    viewset_class = MovieViewSet
+    user_state_fields = {"is_in_bookmarks": "has_bookmark"}
+
+
+class AsyncPersonAPIView(AsyncReadOnlyAPIView):
+    viewset_class = PersonViewSet
@@ -0,0 +1,20 @@
+from rest_framework.filters import BaseFilterBackend
+
+
+class FullTextSearchFilter(BaseFilterBackend):
+    """
+    Полнотекстовый поиск по параметру запроса 'search'. Индекс поиска
+    определяется атрибутом 'search_index' вьюсета; Результаты сортируются
+    по релевантности.
+    """
+
+    search_param = "search"
+
+    def filter_queryset(self, request, queryset, view):
+        search = request.query_params.get(self.search_param)
+        search_index = getattr(view, "search_index", None)
+        if not search or search_index is None:
+            return queryset
+        return search_index.order_by_rank(
+            search_index.search(queryset, search)
+        )
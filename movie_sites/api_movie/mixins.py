@@ -0,0 +1,215 @@
+import hashlib
+
+from django.conf import settings
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+
+from movies.mixins import QueryPlanMixin
+from movies.user_state import get_user_state
+from movies.utils import get_ip
+
+
+def _timestamp(moment):
+    return int(moment.timestamp()) if moment else None
+
+
+class SerializerQueryPlanMixin(QueryPlanMixin):
+    """
+    Класс-миксин для вьюсетов: применяет к queryset план запроса
+    сериализатора текущего действия ('get_query_plan' с учетом выбранных
+    в запросе полей или атрибут 'query_plan').
+    """
+
+    def get_query_plan(self):
+        serializer_class = self.get_serializer_class()
+        if hasattr(serializer_class, "get_query_plan"):
+            return serializer_class.get_query_plan(self.request)
+        return getattr(serializer_class, "query_plan", None)
+
+
+class UserStateContextMixin:
+    """
+    Класс-миксин для вьюсетов: передает в контекст сериализатора резолвер
+    голосов и закладок пользователя ('user_state'), общий для всех
+    объектов ответа.
+    """
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context["user_state"] = get_user_state(self.request)
+        return context
+
+
+class ConditionalGetMixin:
+    """
+    Класс-миксин для вьюсетов: поддержка условных запросов (ETag,
+    Last-Modified) для действий 'list' и 'retrieve'.
+
+    Версия объекта - его отметка времени изменения 'updated_at', версия
+    списка - наибольшая отметка и количество объектов выборки. В ETag
+    также входят путь с параметрами запроса (от 'fields' и 'expand'
+    зависит набор полей), пользователь и IP-адрес (от них зависят голоса,
+    закладки и оценка пользователя). Если версия
+    у клиента совпадает с текущей, то возвращается ответ 304 без
+    извлечения и сериализации объектов.
+    """
+
+    modified_field = "updated_at"
+
+    def get_etag(self, last_modified, *parts):
+        user = self.request.user
+        parts = (
+            *parts,
+            last_modified.isoformat() if last_modified else "",
+            user.pk if user.is_authenticated else "",
+            get_ip(self.request),
+        )
+        return quote_etag(hashlib.md5(
+            ":".join(map(str, parts)).encode()
+        ).hexdigest())
+
+    def get_list_validators(self):
+        """Возвращает отметку изменения и ETag текущей выборки."""
+        queryset = self.filter_queryset(self.get_queryset())
+        stats = queryset.prefetch_related(None).order_by().aggregate(
+            last_modified=Max(self.modified_field), count=Count("pk")
+        )
+        return stats["last_modified"], self.get_etag(
+            stats["last_modified"], stats["count"],
+            self.request.get_full_path(),
+        )
+
+    def get_object_validators(self):
+        """
+        Возвращает отметку изменения и ETag запрошенного объекта;
+        Если объект не найден (или значение поиска некорректно), то
+        возвращает None, и 404 вызывает 'get_object'.
+        """
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        queryset = self.filter_queryset(self.get_queryset())
+        try:
+            last_modified = queryset.prefetch_related(None).filter(**{
+                self.lookup_field: self.kwargs[lookup_url_kwarg]
+            }).values_list(self.modified_field, flat=True).first()
+        except (TypeError, ValueError, DjangoValidationError):
+            return None
+        if last_modified is None:
+            return None
+        return last_modified, self.get_etag(
+            last_modified, self.kwargs[lookup_url_kwarg],
+            self.request.get_full_path(),
+        )
+
+    def get_not_modified_response(self, validators):
+        """
+        Возвращает ответ 304 (или 412), если версия у клиента актуальна,
+        иначе - None.
+        """
+        if validators is None:
+            return None
+        last_modified, etag = validators
+        return get_conditional_response(
+            self.request, etag=etag, last_modified=_timestamp(last_modified)
+        )
+
+    def set_validator_headers(self, response, validators):
+        """Добавляет в ответ заголовки версии (ETag, Last-Modified)."""
+        if validators is None or response.status_code not in (200, 304):
+            return response
+        last_modified, etag = validators
+        response["ETag"] = etag
+        if last_modified is not None:
+            response["Last-Modified"] = http_date(_timestamp(last_modified))
+        # Представление зависит от пользователя и формата ответа; Параметры
+        # 'fields' и 'expand' входят в URL и в ETag
+        patch_vary_headers(response, ("Accept", "Authorization"))
+        return response
+
+    def conditional_response(self, validators, get_response):
+        """
+        Возвращает ответ 304, если версия у клиента актуальна,
+        иначе - ответ 'get_response()' с заголовками версии.
+        """
+        response = self.get_not_modified_response(validators)
+        if response is None:
+            response = get_response()
+        return self.set_validator_headers(response, validators)
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(
+            self.get_list_validators(),
+            lambda: super(ConditionalGetMixin, self).list(
+                request, *args, **kwargs
+            ),
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional_response(
+            self.get_object_validators(),
+            lambda: super(ConditionalGetMixin, self).retrieve(
+                request, *args, **kwargs
+            ),
+        )
+
+
+class BulkRetrieveMixin:
+    """
+    Класс-миксин для вьюсетов: действие 'bulk' возвращает несколько
+    объектов по списку id из параметра 'ids' ('?ids=3,1,2').
+
+    Объекты извлекаются одним запросом с планом запроса сериализатора
+    (с учетом параметров 'fields' и 'expand'), голоса и закладки
+    пользователя - пакетно. Результаты выводятся в порядке id запроса,
+    ненайденные id перечисляются в 'missing'. Количество id ограничено
+    настройкой API_BULK_MAX_IDS.
+    """
+
+    bulk_ids_query_param = "ids"
+
+    def get_bulk_ids(self):
+        param = self.bulk_ids_query_param
+        values = ",".join(self.request.query_params.getlist(param))
+        try:
+            ids = [int(value) for value in values.split(",") if value.strip()]
+        except ValueError:
+            raise ValidationError(
+                {param: "Ожидается список id через запятую."}
+            )
+        if not ids:
+            raise ValidationError({param: "Не передано ни одного id."})
+        ids = list(dict.fromkeys(ids))
+        max_ids = getattr(settings, "API_BULK_MAX_IDS", 300)
+        if len(ids) > max_ids:
+            raise ValidationError(
+                {param: f"Можно запросить не более {max_ids} объектов."}
+            )
+        return ids
+
+    def get_bulk_context(self, objects):
+        """
+        Возвращает данные, загруженные пакетно для всех объектов ответа,
+        которые добавляются в контекст сериализатора.
+        """
+        return {}
+
+    @action(detail=False)
+    def bulk(self, request):
+        """Объекты по списку id в порядке запроса."""
+        ids = self.get_bulk_ids()
+        objects = self.get_queryset().in_bulk(ids)
+        get_user_state(request).register(*objects.values())
+        context = self.get_serializer_context()
+        context.update(self.get_bulk_context(list(objects)))
+        serializer = self.get_serializer_class()(
+            [objects[pk] for pk in ids if pk in objects],
+            many=True, context=context,
+        )
+        return Response({
+            "results": serializer.data,
+            "missing": [pk for pk in ids if pk not in objects],
+        })
@@ -0,0 +1,86 @@
+from django.core.paginator import InvalidPage
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+from movies.mixins import QUANTITY_PER_PAGE
+from movies.pagination import KeysetPaginator, get_sort_fields
+
+
+class KeysetPagination(BasePagination):
+    """
+    Keyset-пагинация для вьюсетов каталога.
+
+    Включается, если в запросе передан 'page_size' или 'cursor'; Без них
+    список возвращается целиком, как и раньше. Порядок задается параметром
+    'sort' (значения SORT_CHOICES формы фильтрации из атрибута вьюсета
+    'filter_form') или сортировкой модели по умолчанию.
+    """
+
+    cursor_query_param = "cursor"
+    page_size_query_param = "page_size"
+    sort_query_param = "sort"
+    max_page_size = 100
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return QUANTITY_PER_PAGE
+        return max(1, min(page_size, self.max_page_size))
+
+    def get_ordering(self, request, queryset, view):
+        sort_fields = get_sort_fields(view.filter_form.SORT_CHOICES)
+        ordering = [
+            field for field in request.query_params.getlist(
+                self.sort_query_param
+            )
+            if field in sort_fields
+        ]
+        return ordering or list(queryset.model._meta.ordering)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if not (
+            self.page_size_query_param in request.query_params
+            or self.cursor_query_param in request.query_params
+        ):
+            return None
+        self.request = request
+        paginator = KeysetPaginator(
+            queryset,
+            self.get_page_size(request),
+            self.get_ordering(request, queryset, view),
+        )
+        try:
+            self.page = paginator.page(
+                request.query_params.get(self.cursor_query_param)
+            )
+        except InvalidPage as error:
+            raise NotFound(str(error)) from error
+        return list(self.page)
+
+    def get_link(self, cursor):
+        if cursor is None:
+            return None
+        return replace_query_param(
+            self.request.build_absolute_uri(), self.cursor_query_param, cursor
+        )
+
+    def get_paginated_response(self, data):
+        return Response({
+            "next": self.get_link(self.page.next_cursor),
+            "previous": self.get_link(self.page.previous_cursor),
+            "results": data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "properties": {
+                "next": {"type": "string", "nullable": True},
+                "previous": {"type": "string", "nullable": True},
+                "results": schema,
+            },
+        }
+
@@ -1,5 +1,9 @@
+from operator import attrgetter
+
+from django.core.files.storage import FileSystemStorage
+from django.db import models
+from django.utils.encoding import filepath_to_uri, iri_to_uri
 from rest_framework import serializers
-from django.contrib.contenttypes.models import ContentType
 
 from movies.models import (
     Movie,
@@ -10,17 +14,218 @@ from movies.models import (
     Rating,
     Comment
 )
+from movies.loaders import CommentThreadLoader
+from movies.query_plans import QueryPlan
+from movies.user_state import get_user_state
 from movies.utils import get_ip
 
 
-class FilterCommentListSerializer(serializers.ListSerializer):
+def get_vote_display(vote):
+    """
+    Возвращает название голоса пользователя;
+    Если пользователь не голосовал, то возвращает False.
+    """
+    if vote is None:
+        return False
+    return LikeDislike.Vote(vote).label
+
+
+def get_context_user_state(context):
+    """
+    Возвращает резолвер состояния пользователя из контекста сериализатора
+    (ключ 'user_state') или резолвер запроса.
+    """
+    user_state = context.get("user_state")
+    if user_state is None and context.get("request") is not None:
+        user_state = get_user_state(context["request"])
+    return user_state
+
+
+class FastListSerializer(serializers.ListSerializer):
     """
-    Сериализатор для CommentSerializer, чтобы отфильтровать комментарии,
-    которые являются дочерними.
+    Сериализатор списков для "плоских" сериализаторов моделей (все поля -
+    столбцы модели без вложенных сериализаторов и методов).
+
+    Вместо вызова 'get_attribute' и 'to_representation' каждого поля
+    каждого объекта строки собираются из 'values_list' (для queryset) или
+    атрибутов объектов (для списка объектов) функциями преобразования,
+    подготовленными один раз на весь список. Результат совпадает
+    с результатом 'ListSerializer'; для сериализаторов с другими полями
+    используется обычная сериализация.
     """
+
+    plain_fields = (
+        serializers.BooleanField, serializers.CharField,
+        serializers.DateField, serializers.DateTimeField,
+        serializers.FloatField, serializers.IntegerField,
+        serializers.DecimalField, serializers.ChoiceField,
+    )
+
+    def get_fast_fields(self):
+        """
+        Возвращает список (имя поля, поле модели, преобразование);
+        Если сериализатор нельзя обработать быстро, то возвращает None.
+        """
+        model_fields = {
+            field.name: field
+            for field in self.child.Meta.model._meta.concrete_fields
+        }
+        fast_fields = []
+        for name, field in self.child.fields.items():
+            model_field = model_fields.get(field.source)
+            if field.write_only or model_field is None:
+                return None
+            if model_field.is_relation:
+                return None
+            if isinstance(field, serializers.FileField):
+                converter = self.get_file_converter(field, model_field)
+            elif isinstance(field, self.plain_fields):
+                converter = field.to_representation
+            else:
+                return None
+            fast_fields.append((name, model_field, converter))
+        return fast_fields
+
+    def get_file_converter(self, field, model_field):
+        """
+        Преобразование имени файла в URL, как в 'FileField.to_representation'.
+        Для файловой системы URL собирается из 'base_url' хранилища без
+        urljoin, для запроса абсолютный URL собирается из общего префикса
+        (при именах, которые urljoin мог бы изменить, используются методы
+        хранилища и запроса).
+        """
+        use_url = getattr(field, "use_url", True)
+        storage = model_field.storage
+        base_url = (
+            storage.base_url if isinstance(storage, FileSystemStorage)
+            else None
+        )
+        if base_url is not None and not (
+            base_url.startswith("/") and not base_url.startswith("//")
+            and iri_to_uri(base_url) == base_url
+        ):
+            base_url = None
+        request = self.context.get("request")
+        prefix = request.build_absolute_uri("/")[:-1] if request else None
+
+        def get_url(name):
+            if base_url is not None:
+                path = filepath_to_uri(name).lstrip("/")
+                if "/." not in f"/{path}":
+                    url = base_url + path
+                    return prefix + url if request else url
+            url = storage.url(name)
+            return request.build_absolute_uri(url) if request else url
+
+        def to_representation(value):
+            name = getattr(value, "name", value)
+            if not name:
+                return None
+            return get_url(name) if use_url else name
+
+        return to_representation
+
     def to_representation(self, data):
-        data = data.filter(major=None)
-        return super().to_representation(data)
+        fast_fields = self.get_fast_fields()
+        if fast_fields is None:
+            return super().to_representation(data)
+        names = [name for name, _, _ in fast_fields]
+        converters = [converter for _, _, converter in fast_fields]
+        iterable = data.all() if isinstance(data, models.Manager) else data
+        if isinstance(iterable, models.QuerySet):
+            rows = iterable.values_list(*(
+                model_field.attname for _, model_field, _ in fast_fields
+            ))
+        else:
+            getter = attrgetter(*(
+                model_field.attname for _, model_field, _ in fast_fields
+            ))
+            rows = (
+                getter(obj) if len(names) > 1 else (getter(obj),)
+                for obj in iterable
+            )
+        return [
+            dict(zip(names, [
+                None if value is None else converter(value)
+                for converter, value in zip(converters, row)
+            ]))
+            for row in rows
+        ]
+
+
+class SparseFieldsMixin:
+    """
+    Класс-миксин сериализатора: выбор выводимых полей параметрами запроса.
+
+    'fields' - поля через запятую, которые нужно вывести ('?fields=id,name')
+    или исключить с префиксом '-' ('?fields=-comments');
+    'expand' - вложенные поля из 'Meta.expandable_fields', которые
+    добавляются к выбранным в 'fields' ('?fields=name&expand=comments').
+    Без параметров выводятся все поля.
+
+    Невыбранные поля не вычисляются и не извлекаются из базы данных:
+    план запроса (см. 'get_query_plan') собирается из планов выбранных
+    полей 'field_query_plans', для остальных полей модели в 'only'
+    попадают их столбцы.
+    """
+
+    fields_query_param = "fields"
+    expand_query_param = "expand"
+    query_plan = QueryPlan()
+    field_query_plans = {}
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        fields = self.get_requested_fields(self.context.get("request"))
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+    @classmethod
+    def get_requested_fields(cls, request):
+        """
+        Возвращает кортеж выбранных полей в порядке 'Meta.fields';
+        Если поля не выбирались, то возвращает None.
+        """
+        params = getattr(request, "query_params", None)
+        if not params or not params.get(cls.fields_query_param):
+            return None
+        names = {
+            name.strip()
+            for name in params[cls.fields_query_param].split(",")
+        }
+        excluded = {name[1:] for name in names if name.startswith("-")}
+        included = names - {f"-{name}" for name in excluded}
+        if included:
+            included |= {
+                name.strip()
+                for name in params.get(cls.expand_query_param, "").split(",")
+            } & set(getattr(cls.Meta, "expandable_fields", ()))
+        return tuple(
+            name for name in cls.Meta.fields
+            if (name in included if included else name not in excluded)
+        )
+
+    @classmethod
+    def get_query_plan(cls, request=None):
+        """Возвращает план запроса для полей, выбранных в запросе."""
+        fields = cls.get_requested_fields(request)
+        if fields is None:
+            return cls.query_plan
+        query_plan = QueryPlan(only=("id",))
+        for name in fields:
+            query_plan |= cls.get_field_query_plan(name)
+        return query_plan
+
+    @classmethod
+    def get_field_query_plan(cls, name):
+        if name in cls.field_query_plans:
+            return cls.field_query_plans[name]
+        field = next((
+            field for field in cls.Meta.model._meta.concrete_fields
+            if field.name == name and not field.is_relation
+        ), None)
+        return QueryPlan(only=(name,)) if field else QueryPlan()
 
 
 class CommentChildrenSerializer(serializers.ModelSerializer):
@@ -35,36 +240,24 @@ class CommentChildrenSerializer(serializers.ModelSerializer):
         model = Comment
 
     def get_votes(self, obj):
-        request = self.context.get("request")
-        content_type = ContentType.objects.get_for_model(obj)
-        try:
-            like = LikeDislike.objects.get(
-                user=request.user, content_type=content_type, object_id=obj.id)
-        except LikeDislike.DoesNotExist:
-            return False
-        return like.get_vote_display()
+        return get_vote_display(obj.user_vote)
 
 
 class CommentSerializer(serializers.ModelSerializer):
-    """Сериализатор для вывода комментариев."""
+    """
+    Сериализатор для вывода комментариев. Принимает корневые комментарии
+    дерева, загруженного 'CommentThreadLoader'.
+    """
 
-    children = CommentChildrenSerializer(many=True)
+    children = CommentChildrenSerializer(many=True, source="thread_children")
     votes = serializers.SerializerMethodField()
 
     class Meta:
-        list_serializer_class = FilterCommentListSerializer
         fields = ("name", "text", "votes", "children")
         model = Comment
 
     def get_votes(self, obj):
-        request = self.context.get("request")
-        content_type = ContentType.objects.get_for_model(obj)
-        try:
-            like = LikeDislike.objects.get(
-                user=request.user, content_type=content_type, object_id=obj.id)
-        except LikeDislike.DoesNotExist:
-            return False
-        return like.get_vote_display()
+        return get_vote_display(obj.user_vote)
 
 
 class CountrySerializer(serializers.ModelSerializer):
@@ -83,12 +276,13 @@ class GenreSerializer(serializers.ModelSerializer):
         model = Genre
 
 
-class MovieListSerializer(serializers.ModelSerializer):
+class MovieListSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """Сериализатор для вывода списка фильмов."""
 
     class Meta:
         fields = ("id", "name", "release_year", "poster", "rating")
         model = Movie
+        list_serializer_class = FastListSerializer
 
 
 class PersonSerializer(serializers.ModelSerializer):
@@ -99,15 +293,16 @@ class PersonSerializer(serializers.ModelSerializer):
         model = Person
 
 
-class PersonListSerializer(serializers.ModelSerializer):
+class PersonListSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """Сериализатор для вывода списка персон."""
 
     class Meta:
         fields = ("id", "first_name", "last_name", "picture", "birthdate")
         model = Person
+        list_serializer_class = FastListSerializer
 
 
-class PersonDetailSerializer(serializers.ModelSerializer):
+class PersonDetailSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """Подробное описание персоны."""
 
     country = serializers.SlugRelatedField(slug_field="name", read_only=True)
@@ -127,17 +322,24 @@ class PersonDetailSerializer(serializers.ModelSerializer):
         )
         model = Person
 
+    query_plan = QueryPlan(select_related=("country",))
+    field_query_plans = {
+        "country": QueryPlan(select_related=("country",), only=("country",)),
+        "age": QueryPlan(only=("birthdate",)),
+        "gender": QueryPlan(only=("gender",)),
+        "all_votes": QueryPlan(only=("likes", "dislikes")),
+        "all_likes": QueryPlan(only=("likes",)),
+        "all_dislikes": QueryPlan(only=("dislikes",)),
+    }
+
     def get_votes(self, obj):
-        request = self.context.get("request")
-        content_type = ContentType.objects.get_for_model(obj)
-        try:
-            like = LikeDislike.objects.get(user=request.user, object_id=obj.id, content_type=content_type)
-        except LikeDislike.DoesNotExist:
+        user_state = get_context_user_state(self.context)
+        if user_state is None:
             return False
-        return like.get_vote_display()
+        return get_vote_display(user_state.get_vote(obj))
 
 
-class MovieDetailSerializer(serializers.ModelSerializer):
+class MovieDetailSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """Подробное описание фильма."""
 
     genres = GenreSerializer(read_only=True, many=True)
@@ -148,7 +350,7 @@ class MovieDetailSerializer(serializers.ModelSerializer):
     is_in_bookmarks = serializers.SerializerMethodField(
         method_name="get_is_in_bookmarks", read_only=True)
     my_rating = serializers.SerializerMethodField(read_only=True)
-    comments = CommentSerializer(read_only=True, many=True)
+    comments = serializers.SerializerMethodField(read_only=True)
 
     class Meta:
         fields = (
@@ -156,15 +358,51 @@ class MovieDetailSerializer(serializers.ModelSerializer):
             "description", "category", "genres", "countries", "actors",
             "directors", "is_in_bookmarks", "comments"
         )
+        expandable_fields = (
+            "genres", "countries", "actors", "directors", "comments",
+        )
         model = Movie
 
+    query_plan = QueryPlan(
+        select_related=("category",),
+        prefetch_related=("genres", "countries", "actors", "directors"),
+    )
+    field_query_plans = {
+        "category": QueryPlan(
+            select_related=("category",), only=("category",)
+        ),
+        "genres": QueryPlan(prefetch_related=("genres",)),
+        "countries": QueryPlan(prefetch_related=("countries",)),
+        "actors": QueryPlan(prefetch_related=("actors",)),
+        "directors": QueryPlan(prefetch_related=("directors",)),
+    }
+
     def get_is_in_bookmarks(self, obj):
-        request = self.context.get("request")
-        if request is None or request.user.is_anonymous:
+        user_state = get_context_user_state(self.context)
+        if user_state is None:
             return False
-        return obj.bookmarks.filter(user=request.user).exists()
+        return user_state.has_bookmark(obj)
+
+    def get_comments(self, obj):
+        """
+        Дерево комментариев с голосами пользователя. Деревья, загруженные
+        заранее для нескольких фильмов, передаются в контексте
+        ('comment_threads'), иначе загружаются для текущего фильма.
+        """
+        threads = self.context.get("comment_threads")
+        if threads is None:
+            threads = CommentThreadLoader(
+                get_context_user_state(self.context)
+            ).load([obj.id])
+        return CommentSerializer(
+            threads.get(obj.id, []), many=True, context=self.context
+        ).data
 
     def get_my_rating(self, obj):
+        my_ratings = self.context.get("my_ratings")
+        if my_ratings is not None:
+            rating = my_ratings.get(obj.id)
+            return rating.get_score_display() if rating else False
         request = self.context.get("request")
         ip = get_ip(request)
         try:
@@ -0,0 +1,32 @@
+from rest_framework.throttling import BaseThrottle
+
+from movies.throttling import check_throttle
+from .filters import FullTextSearchFilter
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """
+    Ограничение частоты запросов к API корзиной токенов области
+    'throttle_scope' представления (частота задается в настройке
+    THROTTLE_RATES). Клиент - пользователь или IP-адрес.
+    """
+
+    def get_scope(self, request, view):
+        return getattr(view, "throttle_scope", None)
+
+    def allow_request(self, request, view):
+        scope = self.get_scope(request, view)
+        self.wait_seconds = check_throttle(request, scope) if scope else 0
+        return not self.wait_seconds
+
+    def wait(self):
+        return self.wait_seconds
+
+
+class SearchThrottle(TokenBucketThrottle):
+    """Ограничивает запросы с полнотекстовым поиском (область 'search')."""
+
+    def get_scope(self, request, view):
+        if request.query_params.get(FullTextSearchFilter.search_param):
+            return "search"
+        return None
@@ -1,7 +1,7 @@
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
-from .views import MovieViewSet, PersonViewSet
+from .views import CatalogExportView, MovieViewSet, PersonViewSet
 
 app_name = "api"
 
@@ -11,6 +11,11 @@ router.register("movies", MovieViewSet, basename="movies")
 router.register("persons", PersonViewSet, basename="persons")
 
 urlpatterns = [
+    path(
+        "export/<slug:resource>/",
+        CatalogExportView.as_view(),
+        name="export",
+    ),
     path("", include(router.urls)),
     path("auth/", include("djoser.urls")),
     path("auth/", include("djoser.urls.jwt"))
@@ -1,32 +1,183 @@
+from django.http import StreamingHttpResponse
+from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.negotiation import BaseContentNegotiation
+from rest_framework.response import Response
+from rest_framework.views import APIView
 from rest_framework.viewsets import ReadOnlyModelViewSet
 
-from movies.models import Movie, Person
+from movies.cache import normalize_params
+from movies.export import EXPORT_FORMATS, EXPORTS, parse_updated_since
+from movies.filters import MovieFacets, filter_movies
+from movies.forms import FilterMovieForm, FilterPersonForm
+from movies.loaders import CommentThreadLoader
+from movies.mixins import CachedCountMixin
+from movies.models import Movie, Person, Rating
+from movies.search import movie_index, person_index
+from movies.user_state import get_user_state
+from movies.utils import get_ip
+from .filters import FullTextSearchFilter
+from .mixins import (
+    BulkRetrieveMixin, ConditionalGetMixin, SerializerQueryPlanMixin,
+    UserStateContextMixin,
+)
+from .pagination import KeysetPagination
 from .serializers import (
     MovieListSerializer,
     MovieDetailSerializer,
     PersonListSerializer,
     PersonDetailSerializer
 )
+from .throttling import SearchThrottle, TokenBucketThrottle
 
 
-class MovieViewSet(ReadOnlyModelViewSet):
+class MovieViewSet(
+    BulkRetrieveMixin, ConditionalGetMixin, UserStateContextMixin,
+    SerializerQueryPlanMixin, CachedCountMixin, ReadOnlyModelViewSet,
+):
     """Вьюсет для фильмов."""
 
     queryset = Movie.objects.all()
     serializer_class = MovieListSerializer
+    filter_backends = (FullTextSearchFilter,)
+    search_index = movie_index
+    pagination_class = KeysetPagination
+    filter_form = FilterMovieForm
+    throttle_classes = (SearchThrottle,)
 
     def get_serializer_class(self):
         if self.action == "list":
             return super().get_serializer_class()
         return MovieDetailSerializer
 
+    def get_bulk_context(self, objects):
+        """
+        Деревья комментариев и оценки пользователя для всех фильмов ответа.
+        """
+        context = super().get_bulk_context(objects)
+        fields = self.get_serializer_class().get_requested_fields(
+            self.request
+        )
+        if fields is None or "comments" in fields:
+            context["comment_threads"] = CommentThreadLoader(
+                get_user_state(self.request)
+            ).load(objects)
+        if fields is None or "my_rating" in fields:
+            context["my_ratings"] = {
+                rating.movie_id: rating
+                for rating in Rating.objects.filter(
+                    movie_id__in=objects, ip=get_ip(self.request)
+                )
+            }
+        return context
+
+    @action(detail=False)
+    def facets(self, request):
+        """
+        Количество фильмов для каждой опции фильтрации (жанры, страны,
+        десятилетия, пороги рейтинга) среди результатов поиска 'search' при
+        фильтрах из параметров запроса и общее количество фильмов 'count';
+        'count_is_approximate' равен true, если количество ограничено
+        настройкой CATALOG_COUNT_APPROXIMATE_ABOVE.
+        """
+        queryset = self.filter_queryset(self.get_queryset())
+        paginator = self.get_paginator(filter_movies(
+            queryset, request.query_params
+        ).order_by("pk"), 1)
+        scope = normalize_params(request.query_params, keep=("search",))
+        facets = MovieFacets(
+            request.query_params, queryset, scope=f"{request.path}?{scope}"
+        )
+        return Response({
+            **facets.get(),
+            "count": paginator.count,
+            "count_is_approximate": paginator.count_is_approximate,
+        })
 
-class PersonViewSet(ReadOnlyModelViewSet):
+
+class PersonViewSet(
+    BulkRetrieveMixin, ConditionalGetMixin, UserStateContextMixin,
+    SerializerQueryPlanMixin, ReadOnlyModelViewSet,
+):
     """Вьюсет для персон."""
     queryset = Person.objects.all()
     serializer_class = PersonListSerializer
+    filter_backends = (FullTextSearchFilter,)
+    search_index = person_index
+    pagination_class = KeysetPagination
+    filter_form = FilterPersonForm
+    throttle_classes = (SearchThrottle,)
 
     def get_serializer_class(self):
         if self.action == "list":
             return super().get_serializer_class()
         return PersonDetailSerializer
+
+    def get_queryset(self):
+        """
+        Для подробного описания голос пользователя ('my_votes')
+        извлекается вместе с персоной.
+        """
+        queryset = super().get_queryset()
+        if self.action == "list":
+            return queryset
+        fields = self.get_serializer_class().get_requested_fields(
+            self.request
+        )
+        if fields is None or "my_votes" in fields:
+            queryset = queryset.with_vote_stats(self.request.user)
+        return queryset
+
+
+class ExportContentNegotiation(BaseContentNegotiation):
+    """
+    Выгрузка возвращает данные в формате из параметра 'output' независимо
+    от заголовка Accept; Ошибки выводятся первым рендерером вьюсета.
+    """
+
+    def select_parser(self, request, parsers):
+        return parsers[0]
+
+    def select_renderer(self, request, renderers, format_suffix=None):
+        return renderers[0], renderers[0].media_type
+
+
+class CatalogExportView(APIView):
+    """
+    Потоковая выгрузка фильмов или персон ('/export/movies/',
+    '/export/persons/'). Параметры: 'output' - формат ('ndjson' или 'csv'),
+    'updated_since' - выгрузить только объекты, измененные после этой
+    даты (ISO 8601).
+    """
+
+    content_negotiation_class = ExportContentNegotiation
+    throttle_classes = (TokenBucketThrottle,)
+    throttle_scope = "export"
+    content_types = {
+        "ndjson": "application/x-ndjson",
+        "csv": "text/csv; charset=utf-8",
+    }
+
+    def get(self, request, resource):
+        if resource not in EXPORTS:
+            raise NotFound()
+        output_format = request.query_params.get("output", "ndjson")
+        if output_format not in EXPORT_FORMATS:
+            raise ValidationError(
+                {"output": f"Допустимые форматы: {', '.join(EXPORT_FORMATS)}."}
+            )
+        updated_since = request.query_params.get("updated_since")
+        if updated_since:
+            try:
+                updated_since = parse_updated_since(updated_since)
+            except ValueError as error:
+                raise ValidationError({"updated_since": str(error)})
+        export = EXPORTS[resource](updated_since=updated_since or None)
+        response = StreamingHttpResponse(
+            export.stream(output_format),
+            content_type=self.content_types[output_format],
+        )
+        response["Content-Disposition"] = (
+            f'attachment; filename="{resource}.{output_format}"'
+        )
+        return response
@@ -0,0 +1,15 @@
+"""
+Конфигурация URL для запросов ASGI-приложения (см. 'AsyncUrlconfMiddleware'):
+асинхронные представления каталога и API для чтения, остальные адреса -
+из movie_sites.urls.
+"""
+
+from django.urls import include, path
+
+from .urls import urlpatterns as sync_urlpatterns
+
+urlpatterns = [
+    path("", include("movies.async_urls", namespace="movies")),
+    path("api/v1/", include("api_movie.async_urls", namespace="api")),
+    *sync_urlpatterns,
+]
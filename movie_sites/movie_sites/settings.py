@@ -52,9 +52,12 @@ MIDDLEWARE = [
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
-    "debug_toolbar.middleware.DebugToolbarMiddleware",
+    "movies.middleware.AsyncUrlconfMiddleware",
 ]
 
+if DEBUG:
+    MIDDLEWARE.append("debug_toolbar.middleware.DebugToolbarMiddleware")
+
 ROOT_URLCONF = "movie_sites.urls"
 
 
@@ -135,6 +138,41 @@ STATICFILES_DIRS = [BASE_DIR.joinpath('static')]
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
+# Режим пагинации списков фильмов и персон: "page" (номера страниц)
+# или "keyset" (курсоры без COUNT и OFFSET)
+CATALOG_PAGINATION_MODE = "page"
+
+# Время жизни (в секундах) закешированного количества результатов
+# фильтрации и порог, после которого количество выводится как "N+"
+# (None - всегда считать точно)
+CATALOG_COUNT_CACHE_TIMEOUT = 300
+CATALOG_COUNT_APPROXIMATE_ABOVE = None
+
+# Наибольшее количество id в одном запросе к действию API 'bulk'
+API_BULK_MAX_IDS = 300
+
+# Обслуживать запросы ASGI-приложения асинхронными представлениями
+# списков и страниц фильмов и персон и API для чтения; Включается
+# переменной окружения CATALOG_ASYNC_VIEWS=1. Не включать вместе
+# с синхронными middleware (debug_toolbar): asgiref 3.7 блокируется на
+# конкурентных вызовах sync_to_async внутри async_to_sync
+CATALOG_ASYNC_VIEWS = os.getenv("CATALOG_ASYNC_VIEWS", "0").lower() in (
+    "1", "true", "yes",
+)
+CATALOG_ASYNC_URLCONF = "movie_sites.async_urls"
+
+# Ограничение частоты запросов клиента (пользователя или IP-адреса)
+# по областям: "N/период" - N запросов подряд, далее не чаще N за период
+# (период: s, m, h, d). Области без частоты не ограничиваются
+THROTTLE_RATES = {
+    "rating": "10/min",
+    "vote": "30/min",
+    "bookmark": "30/min",
+    "comment": "5/min",
+    "search": "60/min",
+    "export": "10/hour",
+}
+
 LOGIN_URL = "auth/login"
 LOGIN_REDIRECT_URL = "/"
 
@@ -143,7 +181,7 @@ REST_FRAMEWORK = {
         "rest_framework.permissions.IsAuthenticatedOrReadOnly"
     ],
     "DEFAULT_AUTHENTICATION_CLASSES": [
-        "rest_framework_simplejwt.authentication.JWTAuthentication"
+        "users.authentication.CachedJWTAuthentication"
     ]
 }
 
@@ -152,6 +190,15 @@ SIMPLE_JWT = {
     "AUTH_HEADER_TYPES": ("Bearer",),
 }
 
+# Время жизни (в секундах) пользователя, извлеченного по JWT, в общем кеше
+# и в памяти процесса (см. users.authentication.UserCache)
+JWT_USER_CACHE_TIMEOUT = 60
+JWT_USER_LOCAL_CACHE_TIMEOUT = 5
+
+# Количество процессов перекодирования изображений в WEBP при импорте
+# и загрузке в админке (None - количество ядер, см. movies.images)
+IMAGE_WORKERS = None
+
 SWAGGER_SETTINGS = {
     "SECURITY_DEFINITIONS": {
         "Bearer": {"type": "apiKey", "name": "Authorization", "in": "header"}
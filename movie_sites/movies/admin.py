@@ -1,5 +1,15 @@
-from django.contrib import admin
+from pathlib import Path
 
+from django.contrib import admin, messages
+from django.core.exceptions import PermissionDenied
+from django.db.models import Value
+from django.db.models.functions import Concat, Replace
+from django.shortcuts import redirect
+from django.template.response import TemplateResponse
+from django.urls import path, reverse
+
+from .forms import ImageUploadForm
+from .images import ImagePipeline
 from .models import (
     Person,
     Country,
@@ -15,7 +25,6 @@ from .models import (
 )
 
 
-admin.site.register(Person)
 admin.site.register(Country)
 admin.site.register(Genre)
 admin.site.register(Category)
@@ -26,10 +35,102 @@ admin.site.register(Bookmark)
 admin.site.register(ContentType)
 
 
+class BulkImageUploadMixin:
+    """
+    Класс-миксин ModelAdmin: страница загрузки нескольких изображений
+    в поле 'image_field'. Файл сопоставляется объектам по имени без
+    расширения (выражение 'image_name_expression' - имя объекта, в котором
+    пробелы заменены на '_'); Изображения перекодируются в WEBP
+    параллельно в общем пуле процессов ('ImagePipeline') и сохраняются
+    объектам пакетно; Файлы, которые не удалось обработать, перечисляются
+    в сообщении.
+    """
+
+    image_field = None
+    image_name_expression = None
+    change_list_template = "admin/movies/change_list_upload.html"
+
+    def get_urls(self):
+        info = self.opts.app_label, self.opts.model_name
+        return [
+            path(
+                "upload-images/",
+                self.admin_site.admin_view(self.upload_images_view),
+                name="%s_%s_upload_images" % info,
+            ),
+            *super().get_urls(),
+        ]
+
+    def get_image_owners(self, names):
+        """Возвращает словарь 'имя файла -> список объектов'."""
+        owners = {}
+        image_name = Replace(
+            self.image_name_expression, Value(" "), Value("_")
+        )
+        for obj in self.model.objects.annotate(
+            image_name=image_name
+        ).filter(image_name__in=names):
+            owners.setdefault(obj.image_name, []).append(obj)
+        return owners
+
+    def get_image_jobs(self, files, owners):
+        for file in files:
+            objs = owners.get(Path(file.name).stem, ())
+            data = file.read() if objs else None
+            for obj in objs:
+                yield obj, self.image_field, data
+
+    def upload_images_view(self, request):
+        if not self.has_change_permission(request):
+            raise PermissionDenied
+        form = ImageUploadForm(request.POST or None, request.FILES or None)
+        if form.is_valid():
+            files = form.cleaned_data["images"]
+            owners = self.get_image_owners({
+                Path(file.name).stem for file in files
+            })
+            pipeline = ImagePipeline()
+            saved = pipeline.save(self.get_image_jobs(files, owners))
+            self.message_user(request, f"Сохранено изображений: {len(saved)}")
+            unmatched = [
+                file.name for file in files
+                if Path(file.name).stem not in owners
+            ]
+            failed = sorted({str(obj) for obj, _, _ in pipeline.failed})
+            if unmatched or failed:
+                self.message_user(
+                    request,
+                    f"Не найдены объекты: {', '.join(unmatched) or '-'}; "
+                    f"не удалось обработать: {', '.join(failed) or '-'}",
+                    messages.WARNING,
+                )
+            return redirect(reverse(
+                "admin:%s_%s_changelist"
+                % (self.opts.app_label, self.opts.model_name)
+            ))
+        context = {
+            **self.admin_site.each_context(request),
+            "opts": self.opts,
+            "form": form,
+            "title": "Загрузка изображений",
+        }
+        return TemplateResponse(
+            request, "admin/movies/upload_images.html", context
+        )
+
+
 class ActorInline(admin.TabularInline):
     model = MovieActor
 
 
 @admin.register(Movie)
-class MovieAdmin(admin.ModelAdmin):
+class MovieAdmin(BulkImageUploadMixin, admin.ModelAdmin):
     inlines = (ActorInline,)
+    image_field = "poster"
+    image_name_expression = "name"
+
+
+@admin.register(Person)
+class PersonAdmin(BulkImageUploadMixin, admin.ModelAdmin):
+    image_field = "picture"
+    image_name_expression = Concat("first_name", Value(" "), "last_name")
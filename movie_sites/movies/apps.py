@@ -5,3 +5,6 @@ class MoviesConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "movies"
     verbose_name = "Фильмы"
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,28 @@
+from django.urls import path
+
+from .async_views import (
+    AsyncMovieDetailView,
+    AsyncMovieListView,
+    AsyncPersonDetailView,
+    AsyncPersonListView,
+)
+from .urls import urlpatterns as sync_urlpatterns
+
+app_name = "movies"
+
+# Асинхронные представления перекрывают синхронные с теми же адресами
+urlpatterns = [
+    path("", AsyncMovieListView.as_view(), name="index"),
+    path(
+        "movie/<int:movie_id>/",
+        AsyncMovieDetailView.as_view(),
+        name="movie_detail",
+    ),
+    path("persons/", AsyncPersonListView.as_view(), name="persons"),
+    path(
+        "person/<int:person_id>/",
+        AsyncPersonDetailView.as_view(),
+        name="person_detail",
+    ),
+    *sync_urlpatterns,
+]
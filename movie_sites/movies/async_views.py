@@ -0,0 +1,172 @@
+"""
+Асинхронные варианты представлений списков и страниц фильмов и персон
+для ASGI-приложения (см. 'AsyncUrlconfMiddleware').
+
+Синхронный ORM вызывается через sync_to_async с thread_sensitive=True
+(так же работает и асинхронный ORM Django 4.2), поэтому все запросы
+к БД одного процесса выполняются по очереди в общем потоке: запросы
+страницы не выполняются параллельно, а представления лишь не занимают
+цикл событий, пока ждут БД.
+"""
+
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.http import Http404
+from django.utils.translation import gettext as _
+
+from .loaders import CommentThreadLoader
+from .user_state import get_user_state
+from .views import (
+    MovieDetailView, MovieListView, PersonDetailView, PersonListView,
+)
+
+
+async def aresolve_user(request):
+    """
+    Извлекает пользователя запроса (сессия и пользователь загружаются
+    лениво синхронным ORM) вне цикла событий.
+    """
+    await sync_to_async(lambda: request.user.is_authenticated)()
+    return request.user
+
+
+async def gather_dict(coroutines):
+    """
+    Ожидает корутины словаря через asyncio.gather; Возвращает словарь
+    результатов с теми же ключами. Обертки sync_to_async при этом
+    выполняются последовательно (см. описание модуля).
+    """
+    results = await asyncio.gather(*coroutines.values())
+    return dict(zip(coroutines, results))
+
+
+class AsyncPreloadMixin:
+    """
+    Класс-миксин асинхронного GET-запроса: независимые запросы к БД
+    (словарь корутин 'get_preloads') выполняются до построения контекста,
+    их результаты доступны в 'self.preloaded'. Контекст
+    строится в потоке, так как формы, пагинатор и резолвер состояния
+    пользователя используют синхронный ORM; Шаблон рендерится
+    обработчиком ASGI также в потоке.
+    """
+
+    preloaded = None
+
+    def get_preloads(self):
+        return {}
+
+    async def get(self, request, *args, **kwargs):
+        await aresolve_user(request)
+        self.set_preloaded(await gather_dict(self.get_preloads()))
+        context = await sync_to_async(self.get_context_data)()
+        return self.render_to_response(context)
+
+    def set_preloaded(self, preloaded):
+        self.preloaded = preloaded
+
+
+class AsyncDetailMixin(AsyncPreloadMixin):
+    """
+    Класс-миксин асинхронной страницы объекта: объект извлекается
+    асинхронным ORM ('aget') вместе с закладкой пользователя
+    и данными из 'get_object_preloads'.
+    """
+
+    def get_preloads(self):
+        pk = self.kwargs[self.pk_url_kwarg]
+        stub = self.model(pk=pk)
+        user_state = get_user_state(self.request)
+        return {
+            "object": self.aget_object(pk),
+            "bookmark": sync_to_async(user_state.has_bookmark)(stub),
+            **self.get_object_preloads(stub, user_state),
+        }
+
+    def get_object_preloads(self, stub, user_state):
+        """
+        Корутины, загружающие данные объекта по его заглушке 'stub'
+        (экземпляр модели только с pk).
+        """
+        return {}
+
+    async def aget_object(self, pk):
+        try:
+            return await self.get_queryset().aget(pk=pk)
+        except self.model.DoesNotExist:
+            raise Http404(
+                _("No %(verbose_name)s found matching the query")
+                % {"verbose_name": self.model._meta.verbose_name}
+            )
+
+    def set_preloaded(self, preloaded):
+        super().set_preloaded(preloaded)
+        self.object = preloaded["object"]
+
+
+class AsyncListMixin(AsyncPreloadMixin):
+    """
+    Класс-миксин асинхронного списка: страница (количество объектов
+    и объекты страницы) извлекается вместе с данными из
+    'get_list_preloads'.
+    """
+
+    def get_preloads(self):
+        self.object_list = self.get_queryset()
+        return {
+            "page": sync_to_async(self.load_page)(),
+            **self.get_list_preloads(),
+        }
+
+    def get_list_preloads(self):
+        return {}
+
+    def load_page(self):
+        """Выполняет пагинацию и извлекает объекты страницы."""
+        page_size = self.get_paginate_by(self.object_list)
+        paginator, page, object_list, is_paginated = (
+            super().paginate_queryset(self.object_list, page_size)
+        )
+        page.object_list = list(object_list)
+        return paginator, page, page.object_list, is_paginated
+
+    def paginate_queryset(self, queryset, page_size):
+        return self.preloaded["page"]
+
+
+class AsyncMovieListView(AsyncListMixin, MovieListView):
+    """Список фильмов; Фасеты фильтра считаются вместе со страницей."""
+
+    def get_list_preloads(self):
+        return {"facets": sync_to_async(super().get_facets)()}
+
+    def get_facets(self):
+        return self.preloaded["facets"]
+
+
+class AsyncPersonListView(AsyncListMixin, PersonListView):
+    """Список персон."""
+
+
+class AsyncMovieDetailView(AsyncDetailMixin, MovieDetailView):
+    """
+    Страница фильма; Фильм, дерево комментариев с голосами и закладка
+    пользователя извлекаются до построения контекста.
+    """
+
+    def get_object_preloads(self, stub, user_state):
+        return {
+            "comments": sync_to_async(
+                CommentThreadLoader(user_state).load_for
+            )(stub),
+        }
+
+    def get_comments(self):
+        return self.preloaded["comments"]
+
+
+class AsyncPersonDetailView(AsyncDetailMixin, PersonDetailView):
+    """
+    Страница персоны; Персона с голосом пользователя и закладка
+    извлекаются до построения контекста.
+    """
@@ -0,0 +1,47 @@
+"""Версии данных каталога для инвалидации кеша."""
+
+import time
+
+from django.core.cache import cache
+
+
+def normalize_params(params, keep=None, ignore=()):
+    """
+    Приводит параметры запроса (QueryDict) к каноническому виду для ключа
+    кеша: отсортированный список пар (параметр, отсортированные непустые
+    значения). Можно оставить только параметры 'keep' или исключить
+    параметры 'ignore'.
+    """
+    return sorted(
+        (key, sorted(value for value in values if value))
+        for key, values in params.lists()
+        if (keep is None or key in keep) and key not in ignore
+        and any(values)
+    )
+
+
+def get_version_key(model):
+    return f"catalog_version:{model._meta.label_lower}"
+
+
+def get_catalog_version(model):
+    """
+    Возвращает текущую версию данных модели. Версия входит в ключи кеша
+    (например, количества результатов фильтрации), поэтому ее изменение
+    делает все ранее сохраненные значения недействительными.
+    """
+    key = get_version_key(model)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns(), None)
+        version = cache.get(key)
+    return version
+
+
+def bump_catalog_version(model):
+    """Изменяет версию данных модели после изменения ее объектов."""
+    key = get_version_key(model)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, time.time_ns(), None)
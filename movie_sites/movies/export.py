@@ -0,0 +1,180 @@
+"""Потоковая выгрузка каталога фильмов и персон (NDJSON, CSV)."""
+
+import csv
+import datetime
+import json
+from collections import defaultdict
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .models import Movie, MovieActor, Person
+
+EXPORT_FORMATS = ("ndjson", "csv")
+
+
+def parse_updated_since(value):
+    """
+    Преобразует строку с датой ('2024-01-31') или датой и временем
+    в ISO 8601 в datetime с часовым поясом; Для некорректного значения
+    вызывает ValueError.
+    """
+    moment = parse_datetime(value)
+    if moment is None:
+        date = parse_date(value)
+        if date is None:
+            raise ValueError(f"Некорректная дата: {value}")
+        moment = datetime.datetime.combine(date, datetime.time())
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+class _Echo:
+    """Буфер для csv.writer, возвращающий записанную строку."""
+
+    def write(self, value):
+        return value
+
+
+class CatalogExport:
+    """
+    Выгрузка объектов модели построчно.
+
+    Объекты извлекаются порциями по 'chunk_size' в порядке первичного
+    ключа условием 'pk > последний выгруженный' (без OFFSET и COUNT),
+    поэтому потребление памяти не зависит от размера каталога. Каждая
+    строка - словарь значений полей 'fields' (ключ - имя в выгрузке,
+    значение - поле модели или связанной модели). Если задан
+    'updated_since', то выгружаются только объекты, измененные после
+    этого момента.
+    """
+
+    model = None
+    fields = {}
+
+    def __init__(self, updated_since=None, chunk_size=1000):
+        self.updated_since = updated_since
+        self.chunk_size = chunk_size
+
+    @property
+    def columns(self):
+        return list(self.fields)
+
+    def get_queryset(self):
+        qs = self.model.objects.all()
+        if self.updated_since is not None:
+            qs = qs.filter(updated_at__gt=self.updated_since)
+        return qs
+
+    def iter_chunks(self):
+        """Возвращает порции строк выгрузки."""
+        qs = self.get_queryset().order_by("pk").values_list(
+            "pk", *self.fields.values()
+        )
+        last_pk = 0
+        while True:
+            values = list(qs.filter(pk__gt=last_pk)[:self.chunk_size])
+            if not values:
+                return
+            last_pk = values[-1][0]
+            rows = [dict(zip(self.fields, row[1:])) for row in values]
+            self.extend_rows(rows)
+            yield rows
+
+    def extend_rows(self, rows):
+        """Дополняет порцию строк данными связанных объектов."""
+
+    def iter_rows(self):
+        for rows in self.iter_chunks():
+            yield from rows
+
+    def as_ndjson(self):
+        """Строки выгрузки в формате NDJSON (JSON-объект на строку)."""
+        for row in self.iter_rows():
+            yield json.dumps(
+                row, cls=DjangoJSONEncoder, ensure_ascii=False
+            ) + "\n"
+
+    def as_csv(self):
+        """
+        Строки выгрузки в формате CSV с заголовком; Списки выводятся
+        через '|'.
+        """
+        writer = csv.writer(_Echo())
+        yield writer.writerow(self.columns)
+        for row in self.iter_rows():
+            yield writer.writerow([
+                "|".join(map(str, value)) if isinstance(value, list) else
+                value.isoformat() if isinstance(value, datetime.date) else
+                value
+                for value in row.values()
+            ])
+
+    def stream(self, output_format):
+        """Возвращает итератор строк выгрузки в формате 'output_format'."""
+        if output_format == "csv":
+            return self.as_csv()
+        return self.as_ndjson()
+
+
+class MovieExport(CatalogExport):
+    model = Movie
+    fields = {
+        "id": "id",
+        "name": "name",
+        "description": "description",
+        "release_year": "release_year",
+        "category": "category__name",
+        "rating": "rating",
+        "rating_count": "rating_count",
+        "poster": "poster",
+        "updated_at": "updated_at",
+    }
+    relations = {
+        "genres": (Movie.genres.through, "genre__name"),
+        "countries": (Movie.countries.through, "country__name"),
+        "actors": (MovieActor, "actor_id"),
+        "directors": (Movie.directors.through, "person_id"),
+    }
+
+    @property
+    def columns(self):
+        return [*self.fields, *self.relations]
+
+    def extend_rows(self, rows):
+        """
+        Добавляет жанры, страны и id актеров и режиссеров: по одному
+        запросу на связь для всей порции.
+        """
+        movie_ids = [row["id"] for row in rows]
+        for name, (through, field) in self.relations.items():
+            values = defaultdict(list)
+            for movie_id, value in through.objects.filter(
+                movie_id__in=movie_ids
+            ).order_by("pk").values_list("movie_id", field):
+                values[movie_id].append(value)
+            for row in rows:
+                row[name] = values[row["id"]]
+
+
+class PersonExport(CatalogExport):
+    model = Person
+    fields = {
+        "id": "id",
+        "first_name": "first_name",
+        "last_name": "last_name",
+        "birthdate": "birthdate",
+        "gender": "gender",
+        "country": "country__name",
+        "picture": "picture",
+        "is_actor": "is_actor",
+        "is_director": "is_director",
+        "likes": "likes",
+        "dislikes": "dislikes",
+        "updated_at": "updated_at",
+    }
+
+
+EXPORTS = {"movies": MovieExport, "persons": PersonExport}
@@ -0,0 +1,105 @@
+"""Потоковое чтение файлов импорта (JSON-массив, NDJSON, gzip)."""
+
+import gzip
+import json
+from itertools import chain
+
+GZIP_MAGIC = b"\x1f\x8b"
+
+
+class FeedError(ValueError):
+    """Некорректный файл импорта."""
+
+
+def open_feed(path):
+    """
+    Открывает файл импорта в текстовом режиме; Файл, сжатый gzip,
+    определяется по первым байтам и распаковывается на лету.
+    """
+    with open(path, "rb") as file:
+        compressed = file.read(2) == GZIP_MAGIC
+    if compressed:
+        return gzip.open(path, "rt", encoding="utf-8-sig")
+    return open(path, encoding="utf-8-sig")
+
+
+def read_feed(path, read_size=65536):
+    """
+    Генератор записей файла импорта по одной: если файл начинается
+    с '[', то он читается как JSON-массив, иначе - как NDJSON (объект
+    JSON в каждой непустой строке). Файл читается блоками по 'read_size'
+    символов, поэтому потребление памяти не зависит от размера файла
+    (только от размера записи). Для некорректного файла вызывает
+    FeedError.
+    """
+    with open_feed(path) as file:
+        first = file.read(1)
+        while first.isspace():
+            first = file.read(1)
+        if first == "[":
+            yield from iter_json_array(file, read_size)
+        elif first:
+            yield from iter_ndjson(chain([first + file.readline()], file))
+
+
+def iter_ndjson(lines):
+    """Генератор объектов из строк NDJSON."""
+    for number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError as error:
+            raise FeedError(f"Строка {number}: {error}") from error
+
+
+def iter_json_array(file, read_size=65536):
+    """
+    Генератор элементов JSON-массива, открывающая скобка которого уже
+    прочитана из 'file'. Элементы декодируются 'raw_decode' из буфера,
+    который дочитывается блоками, пока элемент в нем не поместится;
+    Разобранная часть буфера при дочитывании отбрасывается.
+    """
+    decoder = json.JSONDecoder()
+    buffer, position = "", 0
+
+    def fill():
+        nonlocal buffer, position
+        more = file.read(read_size)
+        if more:
+            buffer, position = buffer[position:] + more, 0
+        return bool(more)
+
+    # Ожидается: 'first' - первый элемент или ']', 'value' - элемент
+    # (после ','), 'separator' - ',' или ']'
+    state = "first"
+    while True:
+        while True:
+            while position < len(buffer) and buffer[position].isspace():
+                position += 1
+            if position < len(buffer) or not fill():
+                break
+        if position == len(buffer):
+            raise FeedError("Неожиданный конец JSON-массива")
+        char = buffer[position]
+        if state != "value" and char == "]":
+            return
+        if state == "separator":
+            if char != ",":
+                raise FeedError(f"Ожидалась ',' или ']', получено {char!r}")
+            position += 1
+            state = "value"
+            continue
+        while True:
+            try:
+                value, end = decoder.raw_decode(buffer, position)
+            except ValueError as error:
+                if not fill():
+                    raise FeedError(error) from error
+                continue
+            # Число в конце буфера могло быть прочитано не полностью
+            if end < len(buffer) or not fill():
+                break
+        yield value
+        position = end
+        state = "separator"
@@ -1,24 +1,37 @@
 """Кастомные поля."""
 
-import io
-
-from PIL import Image
 from django.core.files.base import ContentFile
 from django.db import models
 from django.db.models.fields.files import ImageFieldFile
 
+from .images import encode_webp
+
 
 class WEBPFieldFile(ImageFieldFile):
     """Кастомный класс ImageFieldFile сохраняет файл в формате WEBP."""
 
     def save(self, name, content, save=True):
         content.file.seek(0)
-        image = Image.open(content.file)
-        image_bytes = io.BytesIO()
-        image.save(fp=image_bytes, format="WEBP")
-        image_content_file = ContentFile(content=image_bytes.getvalue())
+        image_content_file = ContentFile(content=encode_webp(content.file))
         super().save(name, image_content_file, save)
 
 
 class WEBPField(models.ImageField):
     attr_class = WEBPFieldFile
+
+
+class SearchMatchField(models.TextField):
+    """
+    Скрытый столбец таблицы FTS5 с именем самой таблицы; Поддерживает
+    lookup 'match' - условие MATCH по всем столбцам индекса.
+    """
+
+
+@SearchMatchField.register_lookup
+class Match(models.Lookup):
+    lookup_name = "match"
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f"{lhs} MATCH {rhs}", [*lhs_params, *rhs_params]
@@ -1,9 +1,17 @@
+import hashlib
 from abc import ABC, abstractclassmethod
 
-from django.db.models import Q
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, F, IntegerField, Q
+from django.db.models.functions import Cast, Coalesce
 
+from .cache import get_catalog_version, normalize_params
 from .forms import FilterMovieForm, FilterPersonForm
-from .models import MovieActor
+from .models import Movie, Rating
+from .search import person_index
+
+FACET_PARAMS = ("genres", "countries", "rating", "start_year", "end_year")
 
 
 class FilterBaseMixin(ABC):
@@ -42,9 +50,18 @@ class FilterBaseMixin(ABC):
         context |= kwargs
         return super().get_context_data(**context)
 
+    def get_base_queryset(self):
+        """
+        QuerySet раздела до фильтрации формой (например, фильмы категории,
+        закладки пользователя или результаты поиска).
+        """
+        return super().get_queryset()
+
     def get_queryset(self):
         """Возвращаем окончательный QuerySet."""
-        return self.get_sorted_qs(self.get_filtered_qs(super().get_queryset()))
+        return self.get_sorted_qs(
+            self.get_filtered_qs(self.get_base_queryset())
+        )
 
     def get_sorted_qs(self, qs):
         """Метод принимает queryset и отдает отсортированный queryset."""
@@ -61,27 +78,35 @@ class FilterOrderPersonMixin(FilterBaseMixin):
 
     def get_filtered_qs(self, qs):
         """Метод принимает queryset и отдает отфильтрованный queryset;
-        Фильтрация производится по полям: Пол, Режиссеры и Актеры.
-        Осуществляется поиск по Фамилии и Имени
+        Фильтрация производится по полям: Пол, Режиссеры и Актеры (по
+        индексированным флагам ролей 'is_actor' и 'is_director').
+        Осуществляется полнотекстовый поиск по Фамилии и Имени
         """
-        actor_ids = MovieActor.objects.values_list("actor_id", flat=True)
         search = self.request.GET.get("search")
-        profile = self.request.GET.get("profile")
+        profiles = self.request.GET.getlist("profile")
         gender = self.request.GET.get("gender")
         if search:
-            qs = qs.filter(
-                Q(first_name__icontains=search) |
-                Q(last_name__icontains=search)
-            )
-        if profile:
-            if profile == "actors":
-                qs = qs.filter(id__in=actor_ids)
-            else:
-                qs = qs.exclude(id__in=actor_ids)
+            qs = person_index.search(qs, search)
+        if profiles:
+            roles = Q()
+            if "actors" in profiles:
+                roles |= Q(is_actor=True)
+            if "directors" in profiles:
+                roles |= Q(is_director=True)
+            qs = qs.filter(roles)
         if gender:
             qs = qs.filter(gender=gender)
         return qs
 
+    def get_sorted_qs(self, qs):
+        """
+        Если задан поисковый запрос и не выбрана сортировка, то персоны
+        сортируются по релевантности.
+        """
+        if self.request.GET.get("search") and not self.request.GET.get("sort"):
+            return person_index.order_by_rank(qs)
+        return super().get_sorted_qs(qs)
+
     def get_mixin_context_data(self, **kwargs):
         """
         Добавляем в контекст переменные 'current_profile', 'current_gender'
@@ -94,6 +119,36 @@ class FilterOrderPersonMixin(FilterBaseMixin):
         }
 
 
+def filter_movies(qs, params, skip=()):
+    """
+    Функция принимает queryset, параметры запроса и отдает отфильтрованный
+    queryset; Фильтрация производится по полям: Жанры, Рейтинг, Страны,
+    Год производства. Фильтры, перечисленные в 'skip' ("genres", "rating",
+    "countries", "years"), не применяются. Жанры и страны фильтруются
+    подзапросом к промежуточным таблицам, чтобы фильм с несколькими
+    выбранными жанрами не дублировался в выдаче и в количестве результатов.
+    """
+
+    genres = params.getlist("genres")
+    rating = params.get("rating")
+    countries = params.getlist("countries")
+    start_year = params.get("start_year")
+    end_year = params.get("end_year")
+    if genres and "genres" not in skip:
+        qs = qs.filter(id__in=Movie.genres.through.objects.filter(
+            genre_id__in=genres
+        ).values("movie_id"))
+    if rating and "rating" not in skip:
+        qs = qs.filter(rating__gte=rating)
+    if countries and "countries" not in skip:
+        qs = qs.filter(id__in=Movie.countries.through.objects.filter(
+            country_id__in=countries
+        ).values("movie_id"))
+    if start_year and end_year and "years" not in skip:
+        qs = qs.filter(release_year__range=(start_year, end_year))
+    return qs
+
+
 class FilterOrderMovieMixin(FilterBaseMixin):
     """
     Класс для фильтрации фильмов по жанрам, рейтингу на сайте, странам,
@@ -107,31 +162,18 @@ class FilterOrderMovieMixin(FilterBaseMixin):
     def get_filtered_qs(self, qs):
         """Метод принимает queryset и отдает отфильтрованный queryset;
         Фильтрация производится по полям: Жанры, Рейтинг, Страны,
-        Год производства.
-        """
-
-        genres = self.request.GET.getlist("genres")
-        rating = self.request.GET.get("rating")
-        countries = self.request.GET.getlist("countries")
-        start_year = self.request.GET.get("start_year")
-        end_year = self.request.GET.get("end_year")
-        if genres:
-            qs = qs.filter(genres__id__in=genres)
-        if rating:
-            qs = qs.filter(rating__gte=rating)
-        if countries:
-            qs = qs.filter(countries__id__in=countries)
-        if start_year and end_year:
-            qs = qs.filter(release_year__range=(start_year, end_year))
-        return qs
+        Год производства (см. 'filter_movies').
+        """
+
+        return filter_movies(qs, self.request.GET)
 
     def get_mixin_context_data(self, **kwargs):
         """
         Добавляем в контекст переменные 'current_genre', 'current_countries'
         для отображения в шаблоне выбранных опций фильтрации в предыдущем
-        запросе.
+        запросе и 'facets' - количество фильмов для каждой опции фильтрации.
         """
-        context = {}
+        context = {"facets": self.get_facets()}
         context["current_genre"] = [
             int(i) for i in self.request.GET.getlist("genres")
         ]
@@ -139,3 +181,138 @@ class FilterOrderMovieMixin(FilterBaseMixin):
             int(i) for i in self.request.GET.getlist("countries")
         ]
         return context
+
+    def get_facets(self):
+        """
+        Количество фильмов раздела ('get_base_queryset') для каждой опции
+        фильтрации.
+        """
+        return MovieFacets(
+            self.request.GET,
+            self.get_base_queryset(),
+            scope=self.get_facets_scope(),
+        ).get()
+
+    def get_facets_scope(self):
+        """
+        Раздел для ключа кеша фасетов: путь запроса и параметры, кроме
+        фильтров фасетов, номера страницы и сортировки; None отключает
+        кеширование (например, для закладок пользователя).
+        """
+        if not getattr(self, "count_cache_enabled", True):
+            return None
+        params = normalize_params(
+            self.request.GET, ignore=FACET_PARAMS + ("page", "cursor", "sort")
+        )
+        return f"{self.request.path}?{params}"
+
+
+class MovieFacets:
+    """
+    Подсчет количества фильмов для каждой опции фильтрации (фасета) при
+    текущем состоянии фильтра: по жанрам, странам, десятилетиям и порогам
+    рейтинга. Каждый фасет считается одним сгруппированным запросом
+    с учетом всех выбранных фильтров, кроме собственного (чтобы было видно,
+    сколько фильмов даст выбор еще одной опции). Фильмы выбираются из
+    'queryset' (по умолчанию - все фильмы): так фасеты страницы категории,
+    закладок или поиска совпадают с количеством фильмов в списке.
+    Результат кешируется до изменения данных фильмов; Ключ кеша включает
+    'scope' - строку, однозначно определяющую 'queryset'. Если 'scope'
+    равен None при заданном 'queryset', то результат не кешируется.
+    """
+
+    def __init__(self, params, queryset=None, scope=None):
+        self.params = params
+        self.scope = scope
+        if queryset is None:
+            queryset, self.scope = Movie.objects.all(), ""
+        self.queryset = queryset.order_by()
+
+    def get(self):
+        """
+        Возвращает словарь фасетов: 'genres' и 'countries' - {id: количество},
+        'decades' - {первый год десятилетия: количество},
+        'rating' - {оценка: количество фильмов с рейтингом не ниже оценки}.
+        """
+        key = self.get_cache_key()
+        facets = cache.get(key) if key else None
+        if facets is None:
+            facets = {
+                "genres": self.count_links(
+                    Movie.genres.through, "genre_id", skip="genres"
+                ),
+                "countries": self.count_links(
+                    Movie.countries.through, "country_id", skip="countries"
+                ),
+                "decades": self.count_decades(),
+                "rating": self.count_rating(),
+            }
+            if key:
+                cache.set(
+                    key,
+                    facets,
+                    getattr(settings, "CATALOG_COUNT_CACHE_TIMEOUT", 300),
+                )
+        return facets
+
+    def get_cache_key(self):
+        if self.scope is None:
+            return None
+        params = normalize_params(self.params, keep=FACET_PARAMS)
+        digest = hashlib.md5(f"{self.scope}|{params}".encode()).hexdigest()
+        version = get_catalog_version(Movie)
+        return f"catalog_facets:{version}:{digest}"
+
+    def filtered(self, skip):
+        return filter_movies(self.queryset, self.params, skip=(skip,))
+
+    def count_links(self, through, field, skip):
+        rows = through.objects.filter(
+            movie_id__in=self.filtered(skip).values("id")
+        ).values(field).annotate(count=Count("movie_id"))
+        return {row[field]: row["count"] for row in rows}
+
+    def count_decades(self):
+        rows = self.filtered("years").annotate(
+            decade=F("release_year") / 10 * 10
+        ).values("decade").annotate(count=Count("id")).order_by("decade")
+        return {row["decade"]: row["count"] for row in rows}
+
+    def count_rating(self):
+        rows = self.filtered("rating").annotate(
+            score=Cast(Coalesce("rating", 0.0), IntegerField())
+        ).values("score").annotate(count=Count("id"))
+        buckets = {row["score"]: row["count"] for row in rows}
+        return {
+            score: sum(
+                count for bucket, count in buckets.items() if bucket >= score
+            )
+            for score, _ in Rating.RATING_CHOICES
+        }
+
+
+class FullTextSearchMixin:
+    """
+    Миксин полнотекстового поиска для списков объектов. Поисковый запрос
+    берется из GET-параметра 'search_param' и ограничивает раздел
+    ('get_base_queryset'), к которому затем применяются фильтры;
+    Если сортировка не выбрана, то результаты сортируются по релевантности.
+    """
+
+    search_index = None
+    search_param = "s"
+
+    def get_base_queryset(self):
+        qs = super().get_base_queryset()
+        search = self.request.GET.get(self.search_param)
+        if search:
+            qs = self.search_index.search(qs, search)
+        return qs
+
+    def get_sorted_qs(self, qs):
+        if (
+            self.request.GET.get(self.search_param)
+            and not self.request.GET.get("sort")
+        ):
+            return self.search_index.order_by_rank(qs)
+        return super().get_sorted_qs(qs)
@@ -162,3 +162,29 @@ class FilterPersonForm(forms.Form):
     class Meta:
         fields = ("search", "profile", "gender", "sort")
 
+
+class MultipleFileInput(forms.ClearableFileInput):
+    allow_multiple_selected = True
+
+
+class MultipleImageField(forms.ImageField):
+    """Поле для загрузки нескольких изображений; Значение - список файлов."""
+
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault("widget", MultipleFileInput())
+        super().__init__(*args, **kwargs)
+
+    def clean(self, data, initial=None):
+        if not isinstance(data, (list, tuple)):
+            data = [data]
+        return [super(MultipleImageField, self).clean(item) for item in data]
+
+
+class ImageUploadForm(forms.Form):
+    """Форма для загрузки нескольких изображений в админке."""
+
+    images = MultipleImageField(
+        label="Изображения",
+        help_text="Имя файла - название фильма или имя и фамилия персоны "
+                  "через '_' (например, 'Иван_Петров.jpeg').",
+    )
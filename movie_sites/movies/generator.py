@@ -0,0 +1,364 @@
+"""Генератор синтетического каталога для тестов производительности."""
+
+import datetime
+import io
+import random
+from collections import Counter
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.contrib.contenttypes.models import ContentType
+from django.core.management import call_command
+from django.db import transaction
+
+from .cache import bump_catalog_version
+from .importer import NameMap, chunked
+from .models import (
+    Bookmark, Category, Comment, Country, Genre, LikeDislike, Movie,
+    MovieActor, Person, Rating,
+)
+
+User = get_user_model()
+
+FIRST_NAMES = (
+    "Александр", "Анна", "Борис", "Вера", "Григорий", "Дарья", "Евгений",
+    "Екатерина", "Иван", "Ирина", "Константин", "Мария", "Никита", "Ольга",
+    "Павел", "Светлана", "Сергей", "Татьяна", "Юрий", "Яна",
+)
+LAST_NAMES = (
+    "Иванов", "Петров", "Сидоров", "Смирнов", "Кузнецов", "Попов",
+    "Васильев", "Соколов", "Михайлов", "Новиков", "Федоров", "Морозов",
+    "Волков", "Алексеев", "Лебедев", "Семенов", "Егоров", "Павлов",
+)
+WORDS = (
+    "тайна", "город", "ночь", "последний", "путь", "звезда", "война",
+    "любовь", "тень", "остров", "небо", "время", "дом", "море", "огонь",
+    "история", "герой", "дорога", "зима", "сердце", "мечта", "игра",
+)
+GENRES = (
+    "Драма", "Комедия", "Боевик", "Триллер", "Фантастика", "Ужасы",
+    "Мелодрама", "Детектив", "Приключения", "Мультфильм",
+)
+COUNTRIES = (
+    "Россия", "США", "Франция", "Великобритания", "Германия", "Италия",
+    "Япония", "Индия", "Испания", "Канада",
+)
+SCORE_WEIGHTS = (1, 1, 2, 3, 5, 8, 10, 9, 6, 3)
+
+
+def skewed_index(rng, size, skew):
+    """
+    Возвращает случайный индекс от 0 до size - 1: при skew > 1 малые
+    индексы выбираются чаще (доля объектов с индексом меньше 'x * size'
+    равна x ** (1 / skew)), поэтому первые объекты - популярные.
+    """
+    return min(int(size * rng.random() ** skew), size - 1)
+
+
+class CatalogGenerator:
+    """
+    Генератор синтетического каталога: пользователи, персоны, фильмы
+    с жанрами, странами, режиссерами и актерами, оценки, деревья
+    комментариев, голоса за персоны и комментарии и закладки.
+
+    Объекты создаются через bulk_create порциями по 'chunk_size' (каждая
+    порция - в отдельной транзакции). Популярность распределена
+    неравномерно ('skewed_index' с показателем 'skew'): на первые фильмы
+    и персоны приходится большая часть оценок, комментариев, ролей,
+    голосов и закладок. Каждый шаг использует собственный генератор
+    случайных чисел, инициализированный 'seed' и именем шага, поэтому
+    при одинаковых параметрах данные совпадают. Пользователи получают
+    имена '<prefix><номер>' без пароля.
+
+    bulk_create не отправляет сигналы, поэтому после генерации
+    пересчитываются счетчики голосов, рейтинги, роли персон, поисковый
+    индекс и версии данных каталога.
+    """
+
+    def __init__(self, movies=1000, persons=500, users=100, ratings=10000,
+                 comments=5000, votes=10000, bookmarks=2000, skew=3.0,
+                 seed=0, chunk_size=5000, actors_per_movie=5,
+                 comment_depth=3, log=None):
+        self.sizes = {
+            "movies": movies, "persons": persons, "users": users,
+            "ratings": ratings, "comments": comments, "votes": votes,
+            "bookmarks": bookmarks,
+        }
+        self.skew = skew
+        self.seed = seed
+        self.chunk_size = chunk_size
+        self.actors_per_movie = actors_per_movie
+        self.comment_depth = comment_depth
+        self.log = log or (lambda message: None)
+        self.counts = Counter()
+
+    @property
+    def user_prefix(self):
+        return f"synthetic{self.seed}_"
+
+    def exists(self):
+        """Проверяет, сгенерированы ли уже данные с этим 'seed'."""
+        return User.objects.filter(
+            username__startswith=self.user_prefix
+        ).exists()
+
+    def get_random(self, step):
+        return random.Random(f"{self.seed}:{step}")
+
+    def pick(self, rng, ids):
+        return ids[skewed_index(rng, len(ids), self.skew)]
+
+    def insert(self, model, objs, key=None):
+        """
+        Вставляет объекты порциями; Возвращает список значений 'key'
+        вставленных объектов (если задан).
+        """
+        name = str(model._meta.verbose_name_plural)
+        result = []
+        for chunk in chunked(objs, self.chunk_size):
+            with transaction.atomic():
+                created = model.objects.bulk_create(chunk)
+            if key is not None:
+                result.extend(map(key, created))
+            self.counts[name] += len(created)
+        self.log(f"{name}: {self.counts[name]}")
+        return result
+
+    def run(self, stdout=None):
+        """
+        Генерирует каталог и пересчитывает производные данные; Возвращает
+        количество созданных объектов по моделям. Вывод команд пересчета
+        пишется в 'stdout'.
+        """
+        user_ids = self.generate_users()
+        person_ids = self.generate_persons()
+        movie_ids = self.generate_movies()
+        if movie_ids and person_ids:
+            self.generate_roles(movie_ids, person_ids)
+        if movie_ids:
+            self.generate_ratings(movie_ids)
+        comment_ids = self.generate_comments(movie_ids) if movie_ids else []
+        if user_ids:
+            self.generate_votes(user_ids, person_ids, comment_ids)
+            self.generate_bookmarks(user_ids, movie_ids, person_ids)
+        self.rebuild(person_ids, stdout or io.StringIO())
+        return dict(self.counts)
+
+    def generate_users(self):
+        password = make_password(None)
+        return self.insert(User, (
+            User(username=f"{self.user_prefix}{number}", password=password)
+            for number in range(self.sizes["users"])
+        ), key=lambda user: user.pk)
+
+    def generate_persons(self):
+        rng = self.get_random("persons")
+        countries = NameMap(Country)
+        countries.ensure(COUNTRIES)
+        country_ids = [countries[name] for name in COUNTRIES]
+
+        def build(number):
+            birthdate = datetime.date(1930, 1, 1) + datetime.timedelta(
+                days=rng.randrange(70 * 365)
+            )
+            return Person(
+                first_name=rng.choice(FIRST_NAMES),
+                # Номер делает пару (фамилия, имя) уникальной
+                last_name=f"{rng.choice(LAST_NAMES)} {self.seed}-{number}",
+                birthdate=birthdate,
+                gender=rng.choice((Person.M, Person.F)),
+                country_id=self.pick(rng, country_ids),
+            )
+
+        return self.insert(Person, (
+            build(number) for number in range(self.sizes["persons"])
+        ), key=lambda person: person.pk)
+
+    def generate_movies(self):
+        rng = self.get_random("movies")
+        categories = NameMap(Category)
+        categories.ensure(["Фильмы"])
+        genres, countries = NameMap(Genre), NameMap(Country)
+        genres.ensure(GENRES)
+        countries.ensure(COUNTRIES)
+        genre_ids = [genres[name] for name in GENRES]
+        country_ids = [countries[name] for name in COUNTRIES]
+
+        def build(number):
+            words = rng.sample(WORDS, rng.randint(1, 3))
+            return Movie(
+                name=f"{' '.join(words).capitalize()} {number}",
+                description=" ".join(rng.choices(WORDS, k=30)),
+                release_year=rng.randint(1950, 2023),
+                category_id=categories["Фильмы"],
+            )
+
+        movie_ids = self.insert(Movie, (
+            build(number) for number in range(self.sizes["movies"])
+        ), key=lambda movie: movie.pk)
+        self.insert(Movie.genres.through, (
+            Movie.genres.through(movie_id=movie_id, genre_id=genre_id)
+            for movie_id in movie_ids
+            for genre_id in self.sample(rng, genre_ids, rng.randint(1, 3))
+        ))
+        self.insert(Movie.countries.through, (
+            Movie.countries.through(movie_id=movie_id, country_id=country_id)
+            for movie_id in movie_ids
+            for country_id in self.sample(rng, country_ids, rng.randint(1, 2))
+        ))
+        return movie_ids
+
+    def sample(self, rng, ids, count):
+        """
+        Возвращает до 'count' различных id, выбранных с учетом
+        популярности.
+        """
+        count = min(count, len(ids))
+        chosen = set()
+        for _ in range(count * 10):
+            if len(chosen) == count:
+                break
+            chosen.add(self.pick(rng, ids))
+        return sorted(chosen)
+
+    def generate_roles(self, movie_ids, person_ids):
+        rng = self.get_random("roles")
+        self.insert(Movie.directors.through, (
+            Movie.directors.through(
+                movie_id=movie_id, person_id=self.pick(rng, person_ids)
+            )
+            for movie_id in movie_ids
+        ))
+        self.insert(MovieActor, (
+            MovieActor(
+                movie_id=movie_id,
+                actor_id=actor_id,
+                role=rng.choice(FIRST_NAMES),
+            )
+            for movie_id in movie_ids
+            for actor_id in self.sample(
+                rng, person_ids, rng.randint(1, self.actors_per_movie)
+            )
+        ))
+
+    def generate_ratings(self, movie_ids):
+        rng = self.get_random("ratings")
+        scores = [score for score, _ in Rating.RATING_CHOICES]
+        # IP-адрес строится из номера оценки, чтобы пары фильм - IP
+        # не повторялись (ограничение 'unique_rating_movie_ip')
+        self.insert(Rating, (
+            Rating(
+                movie_id=self.pick(rng, movie_ids),
+                score=rng.choices(scores, SCORE_WEIGHTS)[0],
+                ip=f"10.{number >> 16 & 255}.{number >> 8 & 255}."
+                   f"{number & 255}",
+            )
+            for number in range(self.sizes["ratings"])
+        ))
+
+    def generate_comments(self, movie_ids):
+        """
+        Создает корневые комментарии к фильмам, а затем 'comment_depth'
+        уровней ответов: на каждом уровне - половина комментариев
+        предыдущего, родители выбираются с учетом популярности. Возвращает
+        id всех комментариев.
+        """
+        rng = self.get_random("comments")
+        total = self.sizes["comments"]
+        shares = [2 ** -depth for depth in range(self.comment_depth + 1)]
+        sizes = [int(total * share / sum(shares)) for share in shares]
+        # Первый уровень - корневые комментарии, остальные - ответы
+        sizes[0] += total - sum(sizes)
+
+        def build(movie_id, major_id=None):
+            number = rng.randrange(self.sizes["users"] or 1)
+            return Comment(
+                movie_id=movie_id,
+                major_id=major_id,
+                name=f"Зритель {number}",
+                email=f"viewer{number}@example.com",
+                text=" ".join(rng.choices(WORDS, k=rng.randint(3, 40))),
+            )
+
+        level = self.insert(Comment, (
+            build(self.pick(rng, movie_ids)) for _ in range(sizes[0])
+        ), key=lambda comment: (comment.pk, comment.movie_id))
+        comment_ids = [pk for pk, _ in level]
+        for size in sizes[1:]:
+            if not level:
+                break
+            parents = [self.pick(rng, level) for _ in range(size)]
+            level = self.insert(Comment, (
+                build(movie_id, major_id) for major_id, movie_id in parents
+            ), key=lambda comment: (comment.pk, comment.movie_id))
+            comment_ids.extend(pk for pk, _ in level)
+        return comment_ids
+
+    def generate_user_objects(self, step, model, user_ids, targets, total,
+                              **fields):
+        """
+        Создает 'total' объектов 'model' (голоса или закладки),
+        распределенных поровну между пользователями: каждый пользователь
+        выбирает различные объекты из 'targets' (словарь 'модель -> список
+        id') с учетом популярности. 'fields' - функции (rng) -> значение
+        дополнительных полей.
+        """
+        targets = {
+            ContentType.objects.get_for_model(target_model): ids
+            for target_model, ids in targets.items() if ids
+        }
+        if not targets:
+            return
+        rng = self.get_random(step)
+        content_types = list(targets)
+        per_user, extra = divmod(total, len(user_ids))
+
+        def build():
+            for index, user_id in enumerate(user_ids):
+                count = per_user + (index < extra)
+                chosen = set()
+                for _ in range(count * 10):
+                    if len(chosen) == count:
+                        break
+                    content_type = rng.choice(content_types)
+                    chosen.add(
+                        (content_type, self.pick(rng, targets[content_type]))
+                    )
+                for content_type, object_id in sorted(
+                    chosen, key=lambda item: (item[0].pk, item[1])
+                ):
+                    yield model(
+                        user_id=user_id,
+                        content_type=content_type,
+                        object_id=object_id,
+                        **{name: get(rng) for name, get in fields.items()},
+                    )
+
+        self.insert(model, build())
+
+    def generate_votes(self, user_ids, person_ids, comment_ids):
+        self.generate_user_objects(
+            "votes", LikeDislike, user_ids,
+            {Person: person_ids, Comment: comment_ids},
+            self.sizes["votes"],
+            vote=lambda rng: 1 if rng.random() < 0.7 else -1,
+        )
+
+    def generate_bookmarks(self, user_ids, movie_ids, person_ids):
+        self.generate_user_objects(
+            "bookmarks", Bookmark, user_ids,
+            {Movie: movie_ids, Person: person_ids},
+            self.sizes["bookmarks"],
+        )
+
+    def rebuild(self, person_ids, stdout):
+        """Пересчитывает данные, которые bulk_create не обновляет."""
+        for person_chunk in chunked(person_ids, self.chunk_size):
+            Person.refresh_roles(person_chunk)
+        for command in (
+            "rebuild_vote_counters", "reconcile_ratings",
+            "rebuild_search_index",
+        ):
+            call_command(command, stdout=stdout)
+        bump_catalog_version(Movie)
+        bump_catalog_version(Person)
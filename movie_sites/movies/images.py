@@ -0,0 +1,173 @@
+"""Параллельная обработка изображений (постеры фильмов, фото персон)."""
+
+import io
+import logging
+import os
+import threading
+from collections import defaultdict
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from itertools import islice
+
+from PIL import Image
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import transaction
+from django.utils import timezone
+
+from .cache import bump_catalog_version
+
+logger = logging.getLogger(__name__)
+
+# Общие пулы процессов по количеству процессов
+_executors = {}
+_executors_lock = threading.Lock()
+
+
+def encode_webp(source):
+    """
+    Декодирует изображение (путь к файлу, файловый объект или байты)
+    и кодирует его в WEBP; Возвращает байты WEBP. Выполняется в процессах
+    пула, поэтому не обращается к Django.
+    """
+    if isinstance(source, bytes):
+        source = io.BytesIO(source)
+    output = io.BytesIO()
+    with Image.open(source) as image:
+        image.save(fp=output, format="WEBP")
+    return output.getvalue()
+
+
+def get_executor(workers):
+    """
+    Возвращает общий пул из 'workers' процессов; Пул создается при первом
+    обращении и используется всеми заданиями процесса Django.
+    """
+    with _executors_lock:
+        executor = _executors.get(workers)
+        if executor is None:
+            executor = _executors[workers] = ProcessPoolExecutor(workers)
+        return executor
+
+
+def discard_executor(workers, executor):
+    """
+    Убирает неработоспособный пул (процесс пула завершился аварийно);
+    Следующее обращение к 'get_executor' создаст новый пул.
+    """
+    with _executors_lock:
+        if _executors.get(workers) is executor:
+            del _executors[workers]
+    executor.shutdown(wait=False, cancel_futures=True)
+
+
+class ImagePipeline:
+    """
+    Перекодирование изображений в WEBP в общем пуле процессов.
+
+    Задание - кортеж (объект, имя поля WEBPField, источник: путь к файлу
+    или байты). Изображения декодируются и кодируются параллельно в
+    'workers' процессах (по умолчанию - настройка IMAGE_WORKERS или
+    количество ядер); Одновременно в работе не более 'max_pending'
+    заданий. Пул создается при первом задании и используется повторно
+    (см. 'get_executor').
+    Кодирование ('encode') не обращается к БД, поэтому выполняется до
+    транзакции; Затем 'write' сохраняет результаты в хранилище поля и
+    записывает пути файлов в БД одним bulk_update на модель и поле (вместе
+    с отметкой изменения 'updated_at'), и версия данных модели меняется.
+    Изображения, которые не удалось обработать (в том числе при аварийном
+    завершении процесса пула), пропускаются и попадают в 'failed'. При
+    workers=0 изображения обрабатываются в текущем процессе.
+    """
+
+    def __init__(self, workers=None, max_pending=None):
+        if workers is None:
+            workers = getattr(settings, "IMAGE_WORKERS", None)
+        self.workers = (os.cpu_count() or 1) if workers is None else workers
+        self.max_pending = max_pending or 2 * max(self.workers, 1)
+        self.failed = []
+
+    def encode(self, jobs):
+        """
+        Генератор пар (задание, байты WEBP) в порядке готовности
+        изображений.
+        """
+        jobs = iter(jobs)
+        if not self.workers:
+            for job in jobs:
+                yield from self.get_result(job, encode_webp, job[2])
+            return
+        pending = {}
+        while True:
+            for job in islice(jobs, self.max_pending - len(pending)):
+                executor = get_executor(self.workers)
+                try:
+                    future = executor.submit(encode_webp, job[2])
+                except BrokenProcessPool as error:
+                    discard_executor(self.workers, executor)
+                    self.fail(job, error)
+                    continue
+                pending[future] = job, executor
+            if not pending:
+                return
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                job, executor = pending.pop(future)
+                if isinstance(future.exception(), BrokenProcessPool):
+                    discard_executor(self.workers, executor)
+                yield from self.get_result(job, future.result)
+
+    def get_result(self, job, func, *args):
+        """
+        Генератор пары (задание, результат 'func'); Если изображение
+        не удалось обработать, то задание попадает в 'failed'.
+        """
+        try:
+            data = func(*args)
+        except Exception as error:
+            # Для поврежденных файлов PIL вызывает не только OSError
+            # (SyntaxError, DecompressionBombError и др.), а результаты
+            # аварийно завершенного пула - BrokenProcessPool
+            self.fail(job, error)
+            return
+        yield job, data
+
+    def fail(self, job, error):
+        obj, field_name, _ = job
+        logger.warning(
+            "Не удалось обработать изображение %s.%s объекта %s: %s",
+            type(obj).__name__, field_name, obj, error,
+        )
+        self.failed.append(job)
+
+    def write(self, results):
+        """
+        Сохраняет изображения пар (задание, байты WEBP) объектам;
+        Возвращает список объектов с новыми изображениями.
+        """
+        updated = defaultdict(list)
+        for (obj, field_name, _), data in results:
+            field = obj._meta.get_field(field_name)
+            getattr(obj, field_name).name = field.storage.save(
+                field.generate_filename(obj, "image.webp"), ContentFile(data)
+            )
+            updated[type(obj), field_name].append(obj)
+        now = timezone.now()
+        for (model, field_name), objs in updated.items():
+            fields = [field_name]
+            if hasattr(model, "touch"):
+                fields.append("updated_at")
+                for obj in objs:
+                    obj.updated_at = now
+            model.objects.bulk_update(objs, fields)
+            bump_catalog_version(model)
+        return [obj for objs in updated.values() for obj in objs]
+
+    def save(self, jobs):
+        """
+        Кодирует изображения заданий, затем сохраняет их объектам
+        в транзакции; Возвращает список объектов с новыми изображениями.
+        """
+        results = list(self.encode(jobs))
+        with transaction.atomic():
+            return self.write(results)
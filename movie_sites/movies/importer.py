@@ -0,0 +1,450 @@
+"""Пакетный импорт фильмов из выгрузки парсера."""
+
+import hashlib
+import json
+import os
+from itertools import islice
+from pathlib import Path
+
+from django.db import transaction
+from django.utils.text import slugify
+
+from .cache import bump_catalog_version
+from .images import ImagePipeline
+from .models import Category, Country, Genre, ImportedRecord, Movie
+from .search import movie_index
+
+TRANSLIT = str.maketrans({
+    "а": "a", "б": "b", "в": "v", "г": "g", "д": "d", "е": "e", "ё": "e",
+    "ж": "zh", "з": "z", "и": "i", "й": "i", "к": "k", "л": "l", "м": "m",
+    "н": "n", "о": "o", "п": "p", "р": "r", "с": "s", "т": "t", "у": "u",
+    "ф": "f", "х": "kh", "ц": "ts", "ч": "ch", "ш": "sh", "щ": "shch",
+    "ъ": "", "ы": "y", "ь": "", "э": "e", "ю": "iu", "я": "ia",
+})
+
+
+def make_slug(name, taken):
+    """
+    Возвращает идентификатор для названия 'name': транслитерация
+    кириллицы и slugify; Если идентификатор уже есть в множестве 'taken',
+    то добавляется суффикс '-2', '-3' и т.д. Результат зависит только от
+    названия и занятых идентификаторов. Новый идентификатор добавляется
+    в 'taken'.
+    """
+    base = slugify(name.lower().translate(TRANSLIT)) or "item"
+    slug, number = base, 1
+    while slug in taken:
+        number += 1
+        slug = f"{base}-{number}"
+    taken.add(slug)
+    return slug
+
+
+def chunked(iterable, size):
+    """Разбивает итерируемый объект на списки по 'size' элементов."""
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def normalize_names(value):
+    """
+    Приводит список названий стран или жанров (или одно название)
+    к списку уникальных непустых названий вида 'Title'; None остается
+    None.
+    """
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = [value]
+    names = (str(name).strip().title() for name in value)
+    return list(dict.fromkeys(name for name in names if name))
+
+
+class NameMap:
+    """
+    Словарь 'название -> id' объектов модели (Country, Genre, Category),
+    загружаемый одним запросом. Недостающие объекты создаются пакетно;
+    Для моделей с полем 'slug' идентификатор генерируется 'make_slug'.
+    """
+
+    def __init__(self, model):
+        self.model = model
+        self.has_slug = any(
+            field.name == "slug" for field in model._meta.fields
+        )
+        self.ids = dict(model.objects.values_list("name", "id"))
+        self.slugs = (
+            set(model.objects.values_list("slug", flat=True))
+            if self.has_slug else set()
+        )
+
+    def __getitem__(self, name):
+        return self.ids[name]
+
+    def ensure(self, names):
+        """Создает недостающие объекты с названиями 'names'."""
+        missing = [
+            name for name in dict.fromkeys(names) if name not in self.ids
+        ]
+        if not missing:
+            return
+        self.model.objects.bulk_create(
+            [self.build(name) for name in missing], ignore_conflicts=True
+        )
+        self.ids.update(
+            self.model.objects.filter(name__in=missing).values_list(
+                "name", "id"
+            )
+        )
+
+    def build(self, name):
+        if self.has_slug:
+            return self.model(name=name, slug=make_slug(name, self.slugs))
+        return self.model(name=name)
+
+
+class Checkpoint:
+    """
+    Файл контрольной точки импорта: количество записей источника,
+    импортированных в завершенных транзакциях. 'source' - строка,
+    идентифицирующая источник (путь, размер и время изменения файла);
+    Контрольная точка другого источника игнорируется. Файл
+    перезаписывается атомарно (os.replace), поэтому после сбоя в нем
+    остается позиция последней завершенной порции.
+    """
+
+    def __init__(self, path, source):
+        self.path = Path(path)
+        self.source = source
+
+    def load(self):
+        """Возвращает количество импортированных записей или 0."""
+        try:
+            with open(self.path, encoding="utf-8") as file:
+                data = json.load(file)
+        except (OSError, ValueError):
+            return 0
+        if not isinstance(data, dict) or data.get("source") != self.source:
+            return 0
+        return data.get("position", 0)
+
+    def save(self, position):
+        temp_path = self.path.with_name(f"{self.path.name}.tmp")
+        with open(temp_path, "w", encoding="utf-8") as file:
+            json.dump(
+                {"source": self.source, "position": position},
+                file,
+                ensure_ascii=False,
+            )
+        os.replace(temp_path, self.path)
+
+    def clear(self):
+        self.path.unlink(missing_ok=True)
+
+
+class MovieImporter:
+    """
+    Пакетный импорт фильмов.
+
+    Запись - словарь с ключами 'Название', 'Год', 'Страна', 'Жанры' и
+    'Описание' (необязательные). Фильм определяется парой (название,
+    год). Записи обрабатываются порциями по 'chunk_size', каждая порция -
+    в отдельной транзакции и за фиксированное количество запросов:
+    существующие фильмы и их связи извлекаются пакетно, новые фильмы и
+    связи с жанрами и странами создаются через bulk_create. Id стран,
+    жанров и категорий хранятся в словарях 'название -> id' ('NameMap'),
+    недостающие создаются пакетно. Если задан каталог 'poster_dir', то
+    фильмам без постера сохраняется постер '<название через _>.jpeg' из
+    этого каталога; Постеры порции перекодируются параллельно в 'workers'
+    процессах ('ImagePipeline') до транзакции порции, в транзакции
+    выполняется только запись в БД.
+
+    В режиме синхронизации ('sync') для каждой записи хранится хеш ее
+    содержимого ('ImportedRecord'): неизмененные записи пропускаются без
+    обращения к фильмам, у измененных обновляется описание, а жанры и
+    страны приводятся к указанным в записи (лишние связи удаляются).
+    Без синхронизации связи только добавляются. Если задана контрольная
+    точка 'checkpoint' ('Checkpoint'), то после каждой порции в нее
+    записывается позиция, и повторный запуск продолжает импорт с
+    последней завершенной порции; После успешного импорта файл удаляется.
+
+    bulk_create не отправляет сигналы, поэтому поисковый индекс и версия
+    данных фильмов обновляются импортом. Результат - количество
+    вставленных, обновленных (изменены описание, жанры, страны, категория
+    или постер) и пропущенных (без изменений, некорректные и повторные)
+    записей в 'stats'.
+    """
+
+    def __init__(self, category_name="Фильмы", poster_dir=None,
+                 chunk_size=500, workers=None, sync=False, checkpoint=None):
+        self.category_name = category_name
+        self.poster_dir = Path(poster_dir) if poster_dir else None
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self.sync = sync
+        self.checkpoint = checkpoint
+        self.stats = {"inserted": 0, "updated": 0, "skipped": 0}
+        self.name_max_length = Movie._meta.get_field("name").max_length
+
+    def run(self, records):
+        """Импортирует записи; Возвращает 'stats'."""
+        self.countries = NameMap(Country)
+        self.genres = NameMap(Genre)
+        categories = NameMap(Category)
+        categories.ensure([self.category_name])
+        self.category_id = categories[self.category_name]
+        position = self.checkpoint.load() if self.checkpoint else 0
+        records = islice(records, position, None)
+        self.images = ImagePipeline(self.workers)
+        for chunk in chunked(records, self.chunk_size):
+            rows = self.parse_chunk(chunk)
+            posters = self.encode_posters(rows)
+            with transaction.atomic():
+                self.import_rows(rows, posters)
+            position += len(chunk)
+            if self.checkpoint:
+                self.checkpoint.save(position)
+        if self.checkpoint:
+            self.checkpoint.clear()
+        if self.stats["inserted"] or self.stats["updated"]:
+            bump_catalog_version(Movie)
+        return self.stats
+
+    def parse_record(self, record):
+        """
+        Возвращает словарь с ключом фильма 'key' (название, год),
+        названиями стран и жанров и описанием записи или None для
+        некорректной записи. Отсутствующие в записи страны, жанры и
+        описание - None (не изменяются).
+        """
+        try:
+            name = str(record["Название"]).strip()
+            year = int(record["Год"])
+        except (KeyError, TypeError, ValueError):
+            return None
+        if not name or len(name) > self.name_max_length or year < 0:
+            return None
+        description = record.get("Описание")
+        return {
+            "key": (name, year),
+            "country": normalize_names(record.get("Страна")),
+            "genre": normalize_names(record.get("Жанры")),
+            "description": (
+                None if description is None else str(description).strip()
+            ),
+        }
+
+    @staticmethod
+    def get_source_key(key):
+        name, year = key
+        return f"{year}:{name}"
+
+    @staticmethod
+    def get_content_hash(row):
+        content = [
+            row["key"],
+            *(
+                None if row[field] is None else sorted(row[field])
+                for field in ("country", "genre")
+            ),
+            row["description"],
+        ]
+        return hashlib.sha256(
+            json.dumps(content, ensure_ascii=False).encode()
+        ).hexdigest()
+
+    def exclude_unchanged(self, rows):
+        """
+        Исключает записи, хеш которых совпадает с сохраненным; Добавляет
+        остальным записям хеш 'hash'.
+        """
+        stored = dict(ImportedRecord.objects.filter(
+            source_key__in=[self.get_source_key(key) for key in rows]
+        ).values_list("source_key", "content_hash"))
+        changed = {}
+        for key, row in rows.items():
+            row["hash"] = self.get_content_hash(row)
+            if stored.get(self.get_source_key(key)) == row["hash"]:
+                self.stats["skipped"] += 1
+            else:
+                changed[key] = row
+        return changed
+
+    def parse_chunk(self, records):
+        """
+        Возвращает словарь 'ключ фильма -> запись' порции без
+        некорректных, повторных и (в режиме синхронизации) неизмененных
+        записей.
+        """
+        rows = {}
+        for record in records:
+            row = self.parse_record(record)
+            if row is None or row["key"] in rows:
+                self.stats["skipped"] += 1
+                continue
+            rows[row["key"]] = row
+        if self.sync:
+            rows = self.exclude_unchanged(rows)
+        return rows
+
+    def import_rows(self, rows, posters):
+        if not rows:
+            return
+        for field, names in (("country", self.countries),
+                             ("genre", self.genres)):
+            names.ensure(
+                name for row in rows.values() for name in row[field] or ()
+            )
+            for row in rows.values():
+                if row[field] is not None:
+                    row[f"{field}_ids"] = [names[name] for name in row[field]]
+        movies = {}
+        for movie in Movie.objects.filter(
+            name__in={name for name, _ in rows}
+        ).only(
+            "id", "name", "release_year", "description", "category_id",
+            "poster",
+        ):
+            movies.setdefault((movie.name, movie.release_year), movie)
+        existing = {key: movies[key] for key in rows if key in movies}
+        created = Movie.objects.bulk_create([
+            Movie(
+                name=name,
+                release_year=year,
+                description=rows[name, year]["description"],
+                category_id=self.category_id,
+            )
+            for name, year in rows if (name, year) not in existing
+        ])
+        movies.update(
+            {(movie.name, movie.release_year): movie for movie in created}
+        )
+        changed = self.link(rows, movies, Movie.countries.through, "country")
+        changed |= self.link(rows, movies, Movie.genres.through, "genre")
+        described = self.update_descriptions(rows, existing)
+        changed |= {movie.pk for movie in described}
+        without_category = [
+            movie.pk for movie in existing.values()
+            if movie.category_id is None
+        ]
+        Movie.objects.filter(pk__in=without_category).update(
+            category_id=self.category_id
+        )
+        changed |= set(without_category)
+        changed |= self.attach_posters(
+            {key: movies[key] for key in rows}, posters
+        )
+        created_ids = {movie.pk for movie in created}
+        Movie.touch(changed - created_ids)
+        movie_index.update_many(created + described)
+        if self.sync:
+            self.save_hashes(rows, movies)
+        updated = sum(movie.pk in changed for movie in existing.values())
+        self.stats["inserted"] += len(created)
+        self.stats["updated"] += updated
+        self.stats["skipped"] += len(existing) - updated
+
+    def update_descriptions(self, rows, existing):
+        """
+        Обновляет описания существующих фильмов, если они изменились;
+        Возвращает список обновленных фильмов.
+        """
+        described = []
+        for key, movie in existing.items():
+            description = rows[key]["description"]
+            if description is not None and description != movie.description:
+                movie.description = description
+                described.append(movie)
+        Movie.objects.bulk_update(described, ["description"])
+        return described
+
+    def save_hashes(self, rows, movies):
+        ImportedRecord.objects.bulk_create(
+            [
+                ImportedRecord(
+                    source_key=self.get_source_key(key),
+                    content_hash=row["hash"],
+                    movie=movies[key],
+                )
+                for key, row in rows.items()
+            ],
+            update_conflicts=True,
+            unique_fields=["source_key"],
+            update_fields=["content_hash", "movie", "imported_at"],
+        )
+
+    def link(self, rows, movies, through, field):
+        """
+        Создает недостающие связи фильмов порции со странами или жанрами
+        через промежуточную модель 'through', а в режиме синхронизации -
+        удаляет лишние; Возвращает множество id фильмов с измененными
+        связями. Связи фильмов, в записях которых нет поля, не меняются.
+        """
+        movie_ids = {
+            movies[key].pk for key, row in rows.items()
+            if row[field] is not None
+        }
+        wanted = {
+            (movies[key].pk, related_id)
+            for key, row in rows.items()
+            for related_id in row.get(f"{field}_ids", ())
+        }
+        present = {
+            (movie_id, related_id): pk
+            for pk, movie_id, related_id in through.objects.filter(
+                movie_id__in=movie_ids
+            ).values_list("pk", "movie_id", f"{field}_id")
+        }
+        missing = wanted - present.keys()
+        extra = present.keys() - wanted if self.sync else set()
+        through.objects.bulk_create([
+            through(movie_id=movie_id, **{f"{field}_id": related_id})
+            for movie_id, related_id in sorted(missing)
+        ])
+        through.objects.filter(
+            pk__in=[present[link] for link in extra]
+        ).delete()
+        return {movie_id for movie_id, _ in missing | extra}
+
+    def get_poster_path(self, name):
+        return self.poster_dir / f"{name.replace(' ', '_')}.jpeg"
+
+    def encode_posters(self, rows):
+        """
+        Перекодирует постеры фильмов порции, у которых еще нет постера;
+        Возвращает словарь 'ключ фильма -> байты WEBP'.
+        """
+        if self.poster_dir is None:
+            return {}
+        keys = [key for key in rows if self.get_poster_path(key[0]).is_file()]
+        if not keys:
+            return {}
+        with_poster = set(Movie.objects.filter(
+            name__in={name for name, _ in keys}, poster__isnull=False
+        ).exclude(poster="").values_list("name", "release_year"))
+        jobs = (
+            (
+                Movie(name=name, release_year=year),
+                "poster",
+                str(self.get_poster_path(name)),
+            )
+            for name, year in keys if (name, year) not in with_poster
+        )
+        return {
+            (movie.name, movie.release_year): data
+            for (movie, _, _), data in self.images.encode(jobs)
+        }
+
+    def attach_posters(self, movies, posters):
+        """
+        Сохраняет перекодированные постеры 'posters' фильмам 'movies'
+        (словарь 'ключ -> фильм') без постера; Возвращает множество id
+        фильмов с новым постером.
+        """
+        results = [
+            ((movie, "poster", None), posters[key])
+            for key, movie in movies.items()
+            if key in posters and not movie.poster
+        ]
+        return {movie.pk for movie in self.images.write(results)}
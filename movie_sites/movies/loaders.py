@@ -0,0 +1,48 @@
+"""Загрузчики данных, извлекающие связанные объекты пакетно."""
+
+from .models import Comment
+
+
+class CommentThreadLoader:
+    """
+    Загрузчик дерева комментариев к фильмам.
+
+    За фиксированное количество запросов (комментарии, голоса пользователя)
+    извлекает все комментарии фильмов и собирает из них дерево. Количество
+    лайков и дизлайков хранится в самих комментариях. Каждому комментарию
+    проставляются атрибуты:
+    'thread_children' - список дочерних комментариев,
+    'user_vote' - голос текущего пользователя (1, -1 или None).
+    Голоса пользователя извлекаются через 'UserStateResolver' запроса.
+    """
+
+    def __init__(self, user_state=None):
+        self.user_state = user_state
+
+    def load(self, movie_ids):
+        """
+        Принимает список id фильмов и возвращает словарь, где ключ - id
+        фильма, а значение - список корневых комментариев.
+        """
+        movie_ids = list(movie_ids)
+        comments = list(Comment.objects.filter(movie_id__in=movie_ids))
+        comments_by_id = {comment.id: comment for comment in comments}
+        threads = {movie_id: [] for movie_id in movie_ids}
+        for comment in comments:
+            comment.thread_children = []
+            comment.user_vote = None
+        for comment in comments:
+            major = comments_by_id.get(comment.major_id)
+            if major is None:
+                threads[comment.movie_id].append(comment)
+            else:
+                major.thread_children.append(comment)
+        if comments and self.user_state is not None:
+            self.user_state.register(*comments)
+            for comment in comments:
+                comment.user_vote = self.user_state.get_vote(comment)
+        return threads
+
+    def load_for(self, movie):
+        """Возвращает список корневых комментариев определенного фильма."""
+        return self.load([movie.id])[movie.id]
@@ -0,0 +1,114 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import cycle, islice
+from typing import Any
+
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import AsyncClient, Client, override_settings
+from django.urls import reverse
+
+from ...models import Movie, Person
+
+
+class Command(BaseCommand):
+    help = (
+        "Сравнивает пропускную способность страниц и API каталога: "
+        "WSGI (синхронные представления в потоках), ASGI с синхронными "
+        "и ASGI с асинхронными представлениями."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--requests",
+            type=int,
+            default=200,
+            help="Количество запросов в каждом режиме.",
+        )
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=10,
+            help="Количество одновременных запросов (потоков WSGI).",
+        )
+
+    def get_paths(self):
+        movie = Movie.objects.order_by("pk").first()
+        person = Person.objects.order_by("pk").first()
+        if movie is None or person is None:
+            raise CommandError("В каталоге нет фильмов или персон.")
+        return [
+            reverse("movies:index"),
+            reverse("movies:movie_detail", args=[movie.pk]),
+            reverse("movies:persons"),
+            reverse("movies:person_detail", args=[person.pk]),
+            reverse("api:movies-list") + "?page_size=8",
+            reverse("api:movies-detail", args=[movie.pk]),
+            reverse("api:persons-detail", args=[person.pk]),
+        ]
+
+    def handle(self, *args: Any, **options: Any) -> str | None:
+        paths = list(islice(cycle(self.get_paths()), options["requests"]))
+        concurrency = options["concurrency"]
+        # Без debug_toolbar: панель меняет ответы, а синхронный
+        # middleware выполняет асинхронные представления через async_to_sync
+        middleware = [
+            name for name in settings.MIDDLEWARE if "debug_toolbar" not in name
+        ]
+        modes = {
+            "WSGI": (False, self.run_wsgi),
+            "ASGI, синхронные представления": (False, self.run_asgi),
+            "ASGI, асинхронные представления": (True, self.run_asgi),
+        }
+        self.stdout.write(
+            f"{len(paths)} запросов, одновременно {concurrency}"
+        )
+        for name, (async_views, run) in modes.items():
+            with override_settings(
+                DEBUG=False,
+                MIDDLEWARE=middleware,
+                CATALOG_ASYNC_VIEWS=async_views,
+            ):
+                started = time.perf_counter()
+                statuses = run(paths, concurrency)
+                elapsed = time.perf_counter() - started
+            errors = sum(status != 200 for status in statuses)
+            if errors:
+                raise CommandError(f"{name}: {errors} ответов с ошибкой")
+            self.stdout.write(
+                f"  {name}: {len(paths) / elapsed:.1f} запр/с "
+                f"({elapsed * 1000:.0f} мс)"
+            )
+
+    def run_wsgi(self, paths, concurrency):
+        def worker(chunk):
+            client = Client()
+            try:
+                return [client.get(path).status_code for path in chunk]
+            finally:
+                connections.close_all()
+
+        chunks = [paths[i::concurrency] for i in range(concurrency)]
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            return [
+                status
+                for statuses in executor.map(worker, chunks)
+                for status in statuses
+            ]
+
+    def run_asgi(self, paths, concurrency):
+        return async_to_sync(self.arun_asgi)(paths, concurrency)
+
+    async def arun_asgi(self, paths, concurrency):
+        client = AsyncClient()
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def request(path):
+            async with semaphore:
+                response = await client.get(path)
+            return response.status_code
+
+        return await asyncio.gather(*(request(path) for path in paths))
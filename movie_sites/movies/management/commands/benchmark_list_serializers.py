@@ -0,0 +1,65 @@
+import time
+from typing import Any
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test import RequestFactory
+from rest_framework import serializers
+from rest_framework.renderers import JSONRenderer
+
+from api_movie.serializers import MovieListSerializer, PersonListSerializer
+from ...models import Movie, Person
+
+
+class Command(BaseCommand):
+    help = (
+        "Сравнивает время сериализации списков фильмов и персон обычным "
+        "ListSerializer и FastListSerializer и проверяет, что JSON совпадает."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--rows",
+            type=int,
+            default=1000,
+            help="Количество объектов в сериализуемом списке.",
+        )
+        parser.add_argument(
+            "--repeat",
+            type=int,
+            default=5,
+            help="Количество повторов (выводится лучшее время).",
+        )
+
+    def handle(self, *args: Any, **options: Any) -> str | None:
+        context = {"request": RequestFactory().get("/api/v1/")}
+        for serializer_class, model in (
+            (MovieListSerializer, Movie), (PersonListSerializer, Person)
+        ):
+            queryset = model.objects.order_by("pk")[:options["rows"]]
+            objects = list(queryset)
+            variants = {
+                "ListSerializer": lambda: serializers.ListSerializer(
+                    objects, child=serializer_class(), context=context
+                ).data,
+                "FastListSerializer (объекты)": lambda: serializer_class(
+                    objects, many=True, context=context
+                ).data,
+                "FastListSerializer (queryset)": lambda: serializer_class(
+                    queryset.all(), many=True, context=context
+                ).data,
+            }
+            self.stdout.write(
+                f"{model._meta.verbose_name_plural}: {len(objects)} объектов"
+            )
+            expected = None
+            for name, serialize in variants.items():
+                best = float("inf")
+                for _ in range(options["repeat"]):
+                    started = time.perf_counter()
+                    content = JSONRenderer().render(serialize())
+                    best = min(best, time.perf_counter() - started)
+                if expected is None:
+                    expected = content
+                elif content != expected:
+                    raise CommandError(f"{name}: JSON не совпадает")
+                self.stdout.write(f"  {name}: {best * 1000:.1f} мс")
@@ -1,39 +1,82 @@
-import json
-
+import os
 from typing import Any
-from django.core.management.base import BaseCommand
-from django.core.files import File
-from ...models import Movie, Country, Genre, Category
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ...feeds import FeedError, read_feed
+from ...importer import Checkpoint, MovieImporter
 
 
 class Command(BaseCommand):
-    def handle(self, *args: Any, **options: Any) -> str | None:
-        count = 0
-        category = Category.objects.get(name="Фильмы", slug="film")
-        with open("/home/bissalievok/Dev/parser/film_popular_foreign_short.json", "r") as film:
-            info_film = json.load(film)
+    help = (
+        "Импортирует фильмы из выгрузки парсера (JSON-массив или NDJSON, "
+        "возможно сжатый gzip; записи с ключами 'Название', 'Год', "
+        "'Страна', 'Жанры', 'Описание') пакетами."
+    )
 
-        for film in info_film:
-            name = film["Название"]
-            year = film["Год"]
-            countries = film["Страна"]
-            genres = film["Жанры"]
-            movie, _ = Movie.objects.get_or_create(name=name, release_year=year)
-            for country in countries:
-                c, _ = Country.objects.get_or_create(name=country.strip().title())
-                movie.countries.add(c)
-            for genre in genres:
-                count += 1
-                g, created = Genre.objects.get_or_create(name=genre.strip().title())
-                if created:
-                    g.slug = f"slug_{count}"
-                    g.save()
-                movie.genres.add(g)
-                movie.category = category
-            movie.save()
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="Путь к файлу с фильмами.")
+        parser.add_argument(
+            "--posters",
+            help="Каталог постеров '<название через _>.jpeg'.",
+        )
+        parser.add_argument(
+            "--category",
+            default="Фильмы",
+            help="Категория новых фильмов (создается, если ее нет).",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=500,
+            help="Количество записей, импортируемых в одной транзакции.",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            help="Количество процессов обработки постеров (по умолчанию - "
+                 "количество ядер, 0 - в текущем процессе).",
+        )
+        parser.add_argument(
+            "--sync",
+            action="store_true",
+            help="Синхронизация: пропускать записи, не изменившиеся с "
+                 "прошлого импорта, и приводить жанры и страны фильмов "
+                 "к указанным в записях.",
+        )
+        parser.add_argument(
+            "--checkpoint",
+            help="Файл контрольной точки: после сбоя импорт продолжится "
+                 "с последней завершенной порции.",
+        )
 
-            if not movie.poster:
-                with open(f"/home/bissalievok/Dev/parser/poster_popular/{name.replace(' ', '_')}.jpeg", "rb") as img:
-                    poster = img
-                    movie, _ = Movie.objects.get_or_create(name=name, release_year=year)
-                    movie.poster.save(f"{name.replace(' ', '_')}.jpeg", File(poster))
+    def handle(self, *args: Any, **options: Any) -> str | None:
+        path = options["path"]
+        try:
+            stat = os.stat(path)
+        except OSError as error:
+            raise CommandError(error)
+        checkpoint = None
+        if options["checkpoint"]:
+            checkpoint = Checkpoint(
+                options["checkpoint"],
+                f"{os.path.abspath(path)}:{stat.st_size}:{stat.st_mtime_ns}",
+            )
+            if position := checkpoint.load():
+                self.stderr.write(f"Импорт продолжается с записи {position}")
+        importer = MovieImporter(
+            category_name=options["category"],
+            poster_dir=options["posters"],
+            chunk_size=options["chunk_size"],
+            workers=options["workers"],
+            sync=options["sync"],
+            checkpoint=checkpoint,
+        )
+        try:
+            stats = importer.run(read_feed(path))
+        except FeedError as error:
+            raise CommandError(f"Некорректный файл импорта: {error}")
+        self.stdout.write(
+            f"Вставлено: {stats['inserted']}, обновлено: {stats['updated']}, "
+            f"пропущено: {stats['skipped']}"
+        )
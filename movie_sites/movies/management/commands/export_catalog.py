@@ -0,0 +1,55 @@
+from typing import Any
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ...export import EXPORT_FORMATS, EXPORTS, parse_updated_since
+
+
+class Command(BaseCommand):
+    help = (
+        "Выгружает фильмы или персоны в формате NDJSON или CSV "
+        "(в файл или стандартный вывод)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("resource", choices=sorted(EXPORTS))
+        parser.add_argument(
+            "--output-format",
+            choices=EXPORT_FORMATS,
+            default="ndjson",
+            help="Формат выгрузки.",
+        )
+        parser.add_argument(
+            "--updated-since",
+            help="Выгрузить только объекты, измененные после этой даты "
+                 "(ISO 8601).",
+        )
+        parser.add_argument(
+            "--file",
+            help="Путь к файлу выгрузки (по умолчанию - стандартный вывод).",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=1000,
+            help="Количество объектов, извлекаемых за один запрос.",
+        )
+
+    def handle(self, *args: Any, **options: Any) -> str | None:
+        updated_since = None
+        if options["updated_since"]:
+            try:
+                updated_since = parse_updated_since(options["updated_since"])
+            except ValueError as error:
+                raise CommandError(error)
+        export = EXPORTS[options["resource"]](
+            updated_since=updated_since, chunk_size=options["chunk_size"]
+        )
+        lines = export.stream(options["output_format"])
+        if not options["file"]:
+            for line in lines:
+                self.stdout.write(line, ending="")
+            return
+        with open(options["file"], "w", encoding="utf-8", newline="") as file:
+            file.writelines(lines)
+        self.stderr.write(f"Выгрузка сохранена в {options['file']}")
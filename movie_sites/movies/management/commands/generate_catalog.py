@@ -0,0 +1,62 @@
+from typing import Any
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ...generator import CatalogGenerator
+
+
+class Command(BaseCommand):
+    help = (
+        "Генерирует синтетический каталог (пользователи, персоны, фильмы, "
+        "роли, оценки, комментарии, голоса, закладки) с неравномерной "
+        "популярностью для тестов производительности."
+    )
+
+    SIZES = {
+        "users": (1000, "Количество пользователей."),
+        "persons": (20000, "Количество персон."),
+        "movies": (50000, "Количество фильмов."),
+        "ratings": (1000000, "Количество оценок."),
+        "comments": (500000, "Количество комментариев (вместе с ответами)."),
+        "votes": (500000, "Количество голосов за персоны и комментарии."),
+        "bookmarks": (100000, "Количество закладок фильмов и персон."),
+    }
+
+    def add_arguments(self, parser):
+        for name, (default, help_text) in self.SIZES.items():
+            parser.add_argument(
+                f"--{name}", type=int, default=default, help=help_text
+            )
+        parser.add_argument(
+            "--seed",
+            type=int,
+            default=0,
+            help="Начальное значение генератора случайных чисел.",
+        )
+        parser.add_argument(
+            "--skew",
+            type=float,
+            default=3.0,
+            help="Неравномерность популярности (1 - равномерно).",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=5000,
+            help="Количество объектов, вставляемых в одной транзакции.",
+        )
+
+    def handle(self, *args: Any, **options: Any) -> str | None:
+        generator = CatalogGenerator(
+            **{name: options[name] for name in self.SIZES},
+            skew=options["skew"],
+            seed=options["seed"],
+            chunk_size=options["chunk_size"],
+            log=self.stdout.write,
+        )
+        if generator.exists():
+            raise CommandError(
+                f"Каталог с seed={options['seed']} уже сгенерирован."
+            )
+        counts = generator.run(stdout=self.stdout)
+        self.stdout.write(f"Создано объектов: {sum(counts.values())}")
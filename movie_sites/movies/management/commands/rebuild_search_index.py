@@ -0,0 +1,25 @@
+from typing import Any
+
+from django.core.management.base import BaseCommand
+
+from ...search import movie_index, person_index
+
+
+class Command(BaseCommand):
+    help = "Пересобирает полнотекстовый индекс фильмов и персон."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=1000,
+            help="Количество объектов, индексируемых за один запрос.",
+        )
+
+    def handle(self, *args: Any, **options: Any) -> str | None:
+        for index in (movie_index, person_index):
+            indexed = index.rebuild(options["chunk_size"])
+            self.stdout.write(
+                f"{index.model._meta.verbose_name_plural}: "
+                f"проиндексировано {indexed}"
+            )
@@ -0,0 +1,81 @@
+from typing import Any
+
+from django.contrib.contenttypes.models import ContentType
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Q
+
+from ...cache import bump_catalog_version
+from ...models import Comment, LikeDislike, Movie, Person
+
+
+class Command(BaseCommand):
+    help = (
+        "Пересчитывает счетчики лайков и дизлайков персон и комментариев "
+        "по таблице голосов."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=1000,
+            help="Количество объектов, пересчитываемых в одной транзакции.",
+        )
+
+    def handle(self, *args: Any, **options: Any) -> str | None:
+        for model in (Person, Comment):
+            updated = self.rebuild(model, options["chunk_size"])
+            if updated:
+                bump_catalog_version(model)
+            self.stdout.write(
+                f"{model._meta.verbose_name_plural}: обновлено {updated}"
+            )
+
+    def rebuild(self, model, chunk_size):
+        """
+        Пересчитывает счетчики объектов модели порциями по 'chunk_size',
+        сохраняя только объекты с расхождениями и обновляя отметку
+        изменения их самих (персоны) или их фильмов (комментарии).
+        Возвращает количество исправленных объектов.
+        """
+        content_type = ContentType.objects.get_for_model(model)
+        updated = last_pk = 0
+        while True:
+            with transaction.atomic():
+                objects = list(
+                    model.objects.filter(pk__gt=last_pk)
+                    .order_by("pk")
+                    .only("pk", "likes", "dislikes")[:chunk_size]
+                )
+                if not objects:
+                    return updated
+                last_pk = objects[-1].pk
+                counters = {
+                    row["object_id"]: row
+                    for row in LikeDislike.objects.filter(
+                        content_type=content_type,
+                        object_id__gte=objects[0].pk,
+                        object_id__lte=last_pk,
+                    ).values("object_id").annotate(
+                        likes=Count("id", filter=Q(vote__gt=0)),
+                        dislikes=Count("id", filter=Q(vote__lt=0)),
+                    )
+                }
+                changed = []
+                for obj in objects:
+                    row = counters.get(obj.pk, {"likes": 0, "dislikes": 0})
+                    if (obj.likes, obj.dislikes) != (
+                        row["likes"], row["dislikes"]
+                    ):
+                        obj.likes = row["likes"]
+                        obj.dislikes = row["dislikes"]
+                        changed.append(obj)
+                model.objects.bulk_update(changed, ["likes", "dislikes"])
+                if changed and model is Comment:
+                    Movie.touch(Comment.objects.filter(
+                        pk__in=[obj.pk for obj in changed]
+                    ).values("movie_id"))
+                elif changed:
+                    model.touch([obj.pk for obj in changed])
+                updated += len(changed)
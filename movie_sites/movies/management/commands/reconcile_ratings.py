@@ -0,0 +1,75 @@
+from typing import Any
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.utils import timezone
+
+from ...cache import bump_catalog_version
+from ...models import Movie, Rating
+
+
+class Command(BaseCommand):
+    help = (
+        "Пересчитывает сумму, количество оценок и рейтинг фильмов по таблице "
+        "оценок, исправляя расхождения."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=1000,
+            help="Количество фильмов, пересчитываемых в одной транзакции.",
+        )
+
+    def handle(self, *args: Any, **options: Any) -> str | None:
+        updated = self.reconcile(options["chunk_size"])
+        if updated:
+            bump_catalog_version(Movie)
+        self.stdout.write(f"Фильмы: обновлено {updated}")
+
+    def reconcile(self, chunk_size):
+        """
+        Пересчитывает агрегаты оценок фильмов порциями по 'chunk_size',
+        сохраняя только фильмы с расхождениями (вместе с отметкой изменения
+        'updated_at'). Возвращает количество исправленных фильмов.
+        """
+        updated = last_pk = 0
+        while True:
+            with transaction.atomic():
+                movies = list(
+                    Movie.objects.filter(pk__gt=last_pk)
+                    .order_by("pk")
+                    .only("pk", "rating", "rating_sum", "rating_count")
+                    [:chunk_size]
+                )
+                if not movies:
+                    return updated
+                last_pk = movies[-1].pk
+                aggregates = {
+                    row["movie_id"]: row
+                    for row in Rating.objects.filter(
+                        movie_id__gte=movies[0].pk, movie_id__lte=last_pk
+                    ).values("movie_id").annotate(
+                        total=Sum("score"), count=Count("id")
+                    )
+                }
+                changed = []
+                for movie in movies:
+                    row = aggregates.get(movie.pk, {"total": 0, "count": 0})
+                    rating = row["total"] / row["count"] if row["count"] else 0
+                    current = (
+                        movie.rating_sum, movie.rating_count, movie.rating
+                    )
+                    if current != (row["total"], row["count"], rating):
+                        movie.rating_sum = row["total"]
+                        movie.rating_count = row["count"]
+                        movie.rating = rating
+                        movie.updated_at = timezone.now()
+                        changed.append(movie)
+                Movie.objects.bulk_update(
+                    changed,
+                    ["rating_sum", "rating_count", "rating", "updated_at"],
+                )
+                updated += len(changed)
@@ -0,0 +1,22 @@
+from typing import Any
+
+from django.core.management.base import BaseCommand
+
+from ...throttling import get_rejected_counts, reset_rejected_counts
+
+
+class Command(BaseCommand):
+    help = "Выводит количество отклоненных запросов по областям ограничения."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--reset",
+            action="store_true",
+            help="Обнулить счетчики после вывода.",
+        )
+
+    def handle(self, *args: Any, **options: Any) -> str | None:
+        for scope, count in get_rejected_counts().items():
+            self.stdout.write(f"{scope}: {count}")
+        if options["reset"]:
+            reset_rejected_counts()
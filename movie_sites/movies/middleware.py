@@ -0,0 +1,30 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+
+class AsyncUrlconfMiddleware:
+    """
+    Направляет запросы ASGI-приложения в конфигурацию URL
+    CATALOG_ASYNC_URLCONF с асинхронными представлениями списков и страниц
+    фильмов и персон и API для чтения (если CATALOG_ASYNC_VIEWS = True).
+    Запросы WSGI-приложения обрабатываются синхронными представлениями.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        if getattr(settings, "CATALOG_ASYNC_VIEWS", False):
+            request.urlconf = settings.CATALOG_ASYNC_URLCONF
+        return await self.get_response(request)
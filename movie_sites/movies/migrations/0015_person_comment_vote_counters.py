@@ -0,0 +1,65 @@
+# Generated by Django 4.2.6 on 2026-10-18 18:44
+
+import datetime
+import django.core.validators
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+
+def fill_vote_counters(apps, schema_editor):
+    ContentType = apps.get_model("contenttypes", "ContentType")
+    LikeDislike = apps.get_model("movies", "LikeDislike")
+    for model_name in ("person", "comment"):
+        content_type = ContentType.objects.filter(
+            app_label="movies", model=model_name
+        ).first()
+        if content_type is None:
+            continue
+        model = apps.get_model("movies", model_name)
+        counters = LikeDislike.objects.filter(
+            content_type=content_type
+        ).values("object_id").annotate(
+            likes=Count("id", filter=Q(vote__gt=0)),
+            dislikes=Count("id", filter=Q(vote__lt=0)),
+        )
+        for row in counters:
+            model.objects.filter(pk=row["object_id"]).update(
+                likes=row["likes"], dislikes=row["dislikes"]
+            )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('movies', '0014_alter_person_birthdate'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comment',
+            name='dislikes',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Дизлайки'),
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='likes',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Лайки'),
+        ),
+        migrations.AddField(
+            model_name='person',
+            name='dislikes',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Дизлайки'),
+        ),
+        migrations.AddField(
+            model_name='person',
+            name='likes',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Лайки'),
+        ),
+        migrations.AlterField(
+            model_name='person',
+            name='birthdate',
+            field=models.DateField(validators=[django.core.validators.MaxValueValidator(datetime.date(2026, 10, 18), 'Дата рождения не может быть больше нынешней!')], verbose_name='Дата рождения'),
+        ),
+        migrations.RunPython(fill_vote_counters, migrations.RunPython.noop),
+    ]
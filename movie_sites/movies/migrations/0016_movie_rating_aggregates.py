@@ -0,0 +1,39 @@
+# Generated by Django 4.2.6 on 2026-10-18 18:45
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def fill_rating_aggregates(apps, schema_editor):
+    Movie = apps.get_model("movies", "Movie")
+    Rating = apps.get_model("movies", "Rating")
+    aggregates = Rating.objects.values("movie_id").annotate(
+        total=Sum("score"), count=Count("id")
+    )
+    for row in aggregates:
+        Movie.objects.filter(pk=row["movie_id"]).update(
+            rating_sum=row["total"],
+            rating_count=row["count"],
+            rating=row["total"] / row["count"],
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0015_person_comment_vote_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='movie',
+            name='rating_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Количество оценок'),
+        ),
+        migrations.AddField(
+            model_name='movie',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Сумма оценок'),
+        ),
+        migrations.RunPython(fill_rating_aggregates, migrations.RunPython.noop),
+    ]
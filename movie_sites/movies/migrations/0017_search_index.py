@@ -0,0 +1,44 @@
+from django.db import migrations
+
+INDEXES = (
+    ("movies_movie", ("name", "description"), "bm25(10.0, 1.0)"),
+    ("movies_person", ("last_name", "first_name"), "bm25(2.0, 1.0)"),
+)
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    for table, fields, rank in INDEXES:
+        columns = ", ".join(fields)
+        values = ", ".join(f"COALESCE({field}, '')" for field in fields)
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE {table}_fts USING fts5({columns}, "
+            f"tokenize='unicode61 remove_diacritics 2')"
+        )
+        schema_editor.execute(
+            f"INSERT INTO {table}_fts({table}_fts, rank) "
+            f"VALUES ('rank', '{rank}')"
+        )
+        schema_editor.execute(
+            f"INSERT INTO {table}_fts(rowid, {columns}) "
+            f"SELECT id, {values} FROM {table}"
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    for table, _, _ in INDEXES:
+        schema_editor.execute(f"DROP TABLE IF EXISTS {table}_fts")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0016_movie_rating_aggregates'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
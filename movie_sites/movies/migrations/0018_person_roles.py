@@ -0,0 +1,37 @@
+# Generated by Django 4.2.6 on 2026-10-18 18:51
+
+from django.db import migrations, models
+from django.db.models import Exists, OuterRef
+
+
+def fill_person_roles(apps, schema_editor):
+    Person = apps.get_model("movies", "Person")
+    Movie = apps.get_model("movies", "Movie")
+    MovieActor = apps.get_model("movies", "MovieActor")
+    Person.objects.update(
+        is_actor=Exists(MovieActor.objects.filter(actor_id=OuterRef("pk"))),
+        is_director=Exists(
+            Movie.directors.through.objects.filter(person_id=OuterRef("pk"))
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0017_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='person',
+            name='is_actor',
+            field=models.BooleanField(db_index=True, default=False, editable=False, verbose_name='Актер'),
+        ),
+        migrations.AddField(
+            model_name='person',
+            name='is_director',
+            field=models.BooleanField(db_index=True, default=False, editable=False, verbose_name='Режиссер'),
+        ),
+        migrations.RunPython(fill_person_roles, migrations.RunPython.noop),
+    ]
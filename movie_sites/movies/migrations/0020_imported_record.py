@@ -0,0 +1,28 @@
+# Generated by Django 4.2.6 on 2026-10-18 19:25
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0019_movie_person_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportedRecord',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source_key', models.CharField(max_length=200, unique=True, verbose_name='Ключ записи')),
+                ('content_hash', models.CharField(max_length=64, verbose_name='Хеш содержимого')),
+                ('imported_at', models.DateTimeField(auto_now=True, verbose_name='Дата импорта')),
+                ('movie', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='imported_records', to='movies.movie', verbose_name='Фильм')),
+            ],
+            options={
+                'verbose_name': 'Импортированная запись',
+                'verbose_name_plural': 'Импортированные записи',
+            },
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 4.2.6 on 2026-10-18 21:10
+
+from django.db import migrations, models
+from django.db.models import Count, Max, Sum
+
+
+def remove_duplicate_ratings(apps, schema_editor):
+    """
+    Оставляет последнюю оценку каждого IP-адреса для фильма и
+    пересчитывает агрегаты оценок фильмов, у которых были дубликаты.
+    """
+    Movie = apps.get_model("movies", "Movie")
+    Rating = apps.get_model("movies", "Rating")
+    duplicates = Rating.objects.values("movie_id", "ip").annotate(
+        last_id=Max("id"), count=Count("id")
+    ).filter(count__gt=1)
+    movie_ids = set()
+    for row in duplicates:
+        Rating.objects.filter(
+            movie_id=row["movie_id"], ip=row["ip"], id__lt=row["last_id"]
+        ).delete()
+        movie_ids.add(row["movie_id"])
+    aggregates = Rating.objects.filter(movie_id__in=movie_ids).values(
+        "movie_id"
+    ).annotate(total=Sum("score"), count=Count("id"))
+    for row in aggregates:
+        Movie.objects.filter(pk=row["movie_id"]).update(
+            rating_sum=row["total"],
+            rating_count=row["count"],
+            rating=row["total"] / row["count"],
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0020_imported_record'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_ratings, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='rating',
+            constraint=models.UniqueConstraint(fields=('movie', 'ip'), name='unique_rating_movie_ip'),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 4.2.6 on 2026-10-18 20:39
+
+from django.db import migrations, models
+import django.db.models.deletion
+import movies.fields
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0021_rating_unique_movie_ip'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MovieSearchEntry',
+            fields=[
+                ('rank', models.FloatField(verbose_name='Релевантность')),
+                ('movie', models.OneToOneField(db_column='rowid', db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='search_entry', serialize=False, to='movies.movie')),
+                ('document', movies.fields.SearchMatchField(db_column='movies_movie_fts')),
+            ],
+            options={
+                'db_table': 'movies_movie_fts',
+                'abstract': False,
+                'managed': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='PersonSearchEntry',
+            fields=[
+                ('rank', models.FloatField(verbose_name='Релевантность')),
+                ('person', models.OneToOneField(db_column='rowid', db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='search_entry', serialize=False, to='movies.person')),
+                ('document', movies.fields.SearchMatchField(db_column='movies_person_fts')),
+            ],
+            options={
+                'db_table': 'movies_person_fts',
+                'abstract': False,
+                'managed': False,
+            },
+        ),
+    ]
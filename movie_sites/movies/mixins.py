@@ -1,16 +1,186 @@
+import hashlib
+import math
+
+from django.conf import settings
+from django.core.paginator import InvalidPage
+from django.http import Http404, HttpResponse
 from django.views.generic import ListView
 
+from .cache import get_catalog_version, normalize_params
 from .filters import FilterOrderMovieMixin, FilterOrderPersonMixin
 from .models import Movie, Person
+from .pagination import (
+    CachedCountPaginator, KeysetPaginator, get_sort_fields,
+)
+from .query_plans import QueryPlan
+from .throttling import check_throttle
+from .user_state import get_user_state
 
 # Переменная определяет кол-во объектов на странице
 QUANTITY_PER_PAGE: int = 8
 
 
-class BaseMovieListMixin(FilterOrderMovieMixin, ListView):
+class UserStateMixin:
+    """
+    Класс-миксин регистрирует выводимые на странице объекты в резолвере
+    состояния пользователя, чтобы теги 'get_status_vote' и
+    'bookmark_is_exists' извлекали голоса и закладки одним запросом.
+    """
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        user_state = get_user_state(self.request)
+        if context.get("object") is not None:
+            user_state.register(context["object"])
+        if context.get("object_list") is not None:
+            user_state.register(*context["object_list"])
+        return context
+
+
+class QueryPlanMixin:
+    """
+    Класс-миксин применяет к queryset представления план запроса
+    'query_plan' (см. 'QueryPlan'), чтобы связанные объекты извлекались
+    заранее, а не отдельным запросом на каждое обращение.
+    """
+
+    query_plan = QueryPlan()
+
+    def get_query_plan(self):
+        return self.query_plan
+
+    def get_queryset(self):
+        qs = super().get_queryset()
+        query_plan = self.get_query_plan()
+        if query_plan is None:
+            return qs
+        return query_plan.apply(qs)
+
+
+class ThrottleMixin:
+    """
+    Класс-миксин ограничивает частоту запросов клиента (пользователя или
+    IP-адреса) к представлению корзиной токенов области 'throttle_scope'
+    (частота задается в настройке THROTTLE_RATES). На лишний запрос
+    возвращается ответ 429 с заголовком Retry-After.
+    """
+
+    throttle_scope = None
+
+    def dispatch(self, request, *args, **kwargs):
+        if self.throttle_scope is not None:
+            wait = check_throttle(request, self.throttle_scope)
+            if wait:
+                response = HttpResponse(
+                    "Слишком много запросов, повторите позже.", status=429
+                )
+                response["Retry-After"] = math.ceil(wait)
+                return response
+        return super().dispatch(request, *args, **kwargs)
+
+
+class KeysetPaginationMixin:
+    """
+    Класс-миксин добавляет спискам режим keyset-пагинации (настройка
+    CATALOG_PAGINATION_MODE = "keyset" или атрибут 'pagination_mode').
+    Страница выбирается по курсору из GET-параметра 'cursor' условием на
+    ключ сортировки, без COUNT(*) и OFFSET. Ключ строится из выбранной
+    сортировки (одно из значений SORT_CHOICES формы фильтрации) или
+    сортировки модели по умолчанию и первичного ключа.
+    Списки, отсортированные по релевантности поиска, пагинируются
+    постранично.
+    """
+
+    pagination_mode = None
+    cursor_kwarg = "cursor"
+
+    def get_pagination_mode(self):
+        return self.pagination_mode or getattr(
+            settings, "CATALOG_PAGINATION_MODE", "page"
+        )
+
+    def get_keyset_ordering(self):
+        sort_fields = get_sort_fields(self.filter_form.SORT_CHOICES)
+        ordering = [
+            field for field in self.request.GET.getlist("sort")
+            if field in sort_fields
+        ]
+        return ordering or list(self.model._meta.ordering)
+
+    def paginate_queryset(self, queryset, page_size):
+        if (
+            self.get_pagination_mode() != "keyset"
+            or "search_rank" in queryset.query.order_by
+        ):
+            return super().paginate_queryset(queryset, page_size)
+        paginator = KeysetPaginator(
+            queryset, page_size, self.get_keyset_ordering()
+        )
+        try:
+            page = paginator.page(self.request.GET.get(self.cursor_kwarg))
+        except InvalidPage as error:
+            raise Http404(str(error)) from error
+        return (paginator, page, page.object_list, page.has_other_pages())
+
+
+class CachedCountMixin:
+    """
+    Класс-миксин кеширует количество объектов списка, по которому строится
+    постраничный паджинатор. Ключ кеша состоит из пути запроса,
+    нормализованных параметров фильтрации (без номера страницы и
+    сортировки) и версии данных модели, которая меняется при изменении
+    объектов (см. signals.py). Настройки:
+    CATALOG_COUNT_CACHE_TIMEOUT - время жизни значения в секундах;
+    CATALOG_COUNT_APPROXIMATE_ABOVE - порог, после которого количество
+    не считается точно и выводится как 'N+'.
+    Миксин подходит и для вьюсетов API: 'get_paginator' можно вызвать
+    для любого queryset, чтобы получить его (кешированное) количество.
+    """
+
+    paginator_class = CachedCountPaginator
+    count_cache_enabled = True
+    count_cache_ignored_params = ("page", "cursor", "sort")
+
+    def get_count_cache_key(self, queryset):
+        if not self.count_cache_enabled:
+            return None
+        params = normalize_params(
+            self.request.GET, ignore=self.count_cache_ignored_params
+        )
+        digest = hashlib.md5(
+            f"{self.request.path}?{params}".encode()
+        ).hexdigest()
+        model = queryset.model
+        label = model._meta.label_lower
+        version = get_catalog_version(model)
+        return f"catalog_count:{label}:{version}:{digest}"
+
+    def get_paginator(self, queryset, per_page, **kwargs):
+        return self.paginator_class(
+            queryset,
+            per_page,
+            cache_key=self.get_count_cache_key(queryset),
+            cache_timeout=getattr(
+                settings, "CATALOG_COUNT_CACHE_TIMEOUT", 300
+            ),
+            approximate_above=getattr(
+                settings, "CATALOG_COUNT_APPROXIMATE_ABOVE", None
+            ),
+            **kwargs,
+        )
+
+
+class BaseMovieListMixin(
+    UserStateMixin,
+    KeysetPaginationMixin,
+    CachedCountMixin,
+    FilterOrderMovieMixin,
+    ListView,
+):
     """
-    Класс-миксин наследуется от класса ListView и
-    FilterOrderMovieMixin(фильтрация фильмов).
+    Класс-миксин наследуется от класса ListView,
+    FilterOrderMovieMixin(фильтрация фильмов), KeysetPaginationMixin,
+    CachedCountMixin и UserStateMixin.
     """
     model = Movie
     template_name = "movies/movies.html"
@@ -18,10 +188,17 @@ class BaseMovieListMixin(FilterOrderMovieMixin, ListView):
     extra_context = {"title": "Фильмы"}
 
 
-class BasePersonListMixin(FilterOrderPersonMixin, ListView):
+class BasePersonListMixin(
+    UserStateMixin,
+    KeysetPaginationMixin,
+    CachedCountMixin,
+    FilterOrderPersonMixin,
+    ListView,
+):
     """
-    Класс-миксин наследуется от класса ListView и
-    FilterOrderPersonMixin(фильтрация персон).
+    Класс-миксин наследуется от класса ListView,
+    FilterOrderPersonMixin(фильтрация персон), KeysetPaginationMixin,
+    CachedCountMixin и UserStateMixin.
     """
     model = Person
     template_name = "movies/person_list.html"
@@ -7,11 +7,12 @@ from django.contrib.contenttypes.fields import (
 from django.contrib.contenttypes.models import ContentType
 from django.core.validators import MaxValueValidator
 from django.db import models
-from django.db.models import Manager, Q, Sum
+from django.db.models import Exists, F, Manager, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Cast, NullIf
 from django.urls import reverse
 from django.utils import timezone
 
-from .fields import WEBPField
+from .fields import SearchMatchField, WEBPField
 
 User = get_user_model()
 
@@ -21,7 +22,91 @@ def get_image_folder(instance, filename):
     return f"{instance.__class__.__name__}/{uuid.uuid4().hex}.webp"
 
 
-class Person(models.Model):
+class AbstractVotes(models.Model):
+    """
+    Абстрактная модель для объектов, за которые можно проголосовать
+    (Person, Comment). Хранит счетчики лайков и дизлайков, которые
+    поддерживаются в актуальном состоянии при голосовании.
+    """
+
+    likes = models.PositiveIntegerField("Лайки", default=0, editable=False)
+    dislikes = models.PositiveIntegerField(
+        "Дизлайки", default=0, editable=False
+    )
+
+    class Meta:
+        abstract = True
+
+    def get_like_count(self):
+        return self.likes
+
+    def get_dislike_count(self):
+        return self.dislikes
+
+    @classmethod
+    def update_vote_counters(cls, pk, old_vote=None, new_vote=None):
+        """
+        Атомарно изменяет счетчики объекта при смене голоса пользователя
+        с 'old_vote' на 'new_vote' (1, -1 или None).
+        """
+        deltas = {"likes": 0, "dislikes": 0}
+        for vote, delta in ((old_vote, -1), (new_vote, 1)):
+            if vote:
+                deltas["likes" if int(vote) > 0 else "dislikes"] += delta
+        changes = {
+            field: F(field) + delta
+            for field, delta in deltas.items() if delta
+        }
+        if changes:
+            cls.objects.filter(pk=pk).update(**changes)
+
+
+class AbstractModified(models.Model):
+    """
+    Абстрактная модель для объектов с отметкой времени последнего
+    изменения (Movie, Person). Отметка обновляется при сохранении объекта,
+    а при изменении связанных данных (оценки, голоса, комментарии,
+    закладки, состав фильма) - методом 'touch' (см. signals.py).
+    По ней API отвечает на условные запросы.
+    """
+
+    updated_at = models.DateTimeField(
+        "Дата изменения", auto_now=True, db_index=True
+    )
+
+    class Meta:
+        abstract = True
+
+    @classmethod
+    def touch(cls, pk_list):
+        """Обновляет отметку времени изменения объектов."""
+        cls.objects.filter(pk__in=pk_list).update(updated_at=timezone.now())
+
+
+class PersonQuerySet(models.QuerySet):
+
+    def with_vote_stats(self, user=None):
+        """
+        Добавляет персонам голос пользователя 'my_vote' (1, -1 или None)
+        подзапросом в том же SELECT; Количество лайков и дизлайков и
+        рейтинг хранятся в полях персоны. Голос читается резолвером
+        состояния пользователя (см. 'UserStateResolver.get_vote') без
+        отдельного запроса.
+        """
+        if user is None or not user.is_authenticated:
+            return self.annotate(
+                my_vote=Value(None, output_field=models.SmallIntegerField())
+            )
+        return self.annotate(my_vote=Subquery(
+            LikeDislike.objects.filter(
+                user=user,
+                content_type=ContentType.objects.get_for_model(self.model),
+                object_id=OuterRef("pk"),
+            ).values("vote")[:1]
+        ))
+
+
+class Person(AbstractVotes, AbstractModified):
     """Актеры и режиссеры."""
     M = "М"
     F = "F"
@@ -57,11 +142,19 @@ class Person(models.Model):
         verbose_name="Страна",
         related_name="%(class)ss",
     )
+    is_actor = models.BooleanField(
+        "Актер", default=False, editable=False, db_index=True
+    )
+    is_director = models.BooleanField(
+        "Режиссер", default=False, editable=False, db_index=True
+    )
     votes = GenericRelation(to="LikeDislike", related_query_name="person_vote")
     bookmarks = GenericRelation(
         to="Bookmark", related_query_name="person_bookmark"
     )
 
+    objects = PersonQuerySet.as_manager()
+
     class Meta:
         verbose_name = "Персона"
         verbose_name_plural = "Персоны"
@@ -90,16 +183,26 @@ class Person(models.Model):
             )
         )
 
-    def get_like_count(self):
-        return self.votes.filter(vote__gt=0).count()
-
-    def get_dislike_count(self):
-        return self.votes.filter(vote__lt=0).count()
-
     @property
     def get_like_rating(self):
-        return self.votes.values(
-            "vote").aggregate(Sum("vote")).get("vote__sum")
+        return self.likes - self.dislikes
+
+    @classmethod
+    def refresh_roles(cls, pk_list):
+        """
+        Пересчитывает флаги 'is_actor' и 'is_director' персон одним
+        запросом UPDATE по наличию записей в фильмографии.
+        """
+        cls.objects.filter(pk__in=pk_list).update(
+            is_actor=Exists(
+                MovieActor.objects.filter(actor_id=OuterRef("pk"))
+            ),
+            is_director=Exists(
+                Movie.directors.through.objects.filter(
+                    person_id=OuterRef("pk")
+                )
+            ),
+        )
 
 
 class AbstractCategory(models.Model):
@@ -154,7 +257,7 @@ class Genre(AbstractCategory):
         return reverse("movies:genre_detail", kwargs={"slug": self.slug})
 
 
-class Movie(models.Model):
+class Movie(AbstractModified):
     """Фильмы."""
 
     name = models.CharField("Название", max_length=100, db_index=True)
@@ -199,6 +302,12 @@ class Movie(models.Model):
     )
     pub_date = models.DateTimeField("Дата публикации", auto_now_add=True)
     rating = models.FloatField(null=True, blank=True, default=0)
+    rating_sum = models.PositiveIntegerField(
+        "Сумма оценок", default=0, editable=False
+    )
+    rating_count = models.PositiveIntegerField(
+        "Количество оценок", default=0, editable=False
+    )
     bookmarks = GenericRelation(to="Bookmark", related_query_name="movie")
 
     class Meta:
@@ -219,7 +328,32 @@ class Movie(models.Model):
     def get_average_rating(self):
         """Метод для вычисление среднего рейтинга по сайту."""
 
-        return self.ratings.aggregate(avg=models.Avg("score")).get("avg")
+        if not self.rating_count:
+            return None
+        return self.rating_sum / self.rating_count
+
+    @classmethod
+    def update_rating(cls, pk, score_delta, count_delta=0):
+        """
+        Атомарно изменяет сумму и количество оценок фильма и пересчитывает
+        по ним рейтинг одним запросом UPDATE, не обращаясь к таблице оценок.
+        Возвращает True, если изменилась целая часть рейтинга: от нее
+        зависят закешированные количества фильтра и фасетов по рейтингу.
+        """
+        movie = cls.objects.filter(pk=pk)
+        previous = movie.values_list("rating", flat=True).first()
+        rating_sum = F("rating_sum") + score_delta
+        rating_count = F("rating_count") + count_delta
+        movie.update(
+            rating_sum=rating_sum,
+            rating_count=rating_count,
+            rating=Cast(rating_sum, models.FloatField()) / NullIf(
+                rating_count, 0
+            ),
+            updated_at=timezone.now(),
+        )
+        current = movie.values_list("rating", flat=True).first()
+        return int(previous or 0) != int(current or 0)
 
 
 class MovieActor(models.Model):
@@ -278,12 +412,18 @@ class Rating(models.Model):
     class Meta:
         verbose_name = "Рейтинг"
         verbose_name_plural = "Рейтинги"
+        constraints = [
+            models.UniqueConstraint(
+                fields=("movie", "ip"),
+                name="unique_rating_movie_ip"
+            )
+        ]
 
     def __str__(self):
         return f"{self.movie} - {self.score}"
 
 
-class Comment(models.Model):
+class Comment(AbstractVotes):
     """Комментарии."""
 
     email = models.EmailField("Email")
@@ -314,12 +454,6 @@ class Comment(models.Model):
     def __str__(self):
         return f"{self.name} - {self.movie}"
 
-    def get_like_count(self):
-        return self.votes.filter(vote__gt=0).count()
-
-    def get_dislike_count(self):
-        return self.votes.filter(vote__lt=0).count()
-
 
 class LikeDislike(models.Model):
     """Модель лайков и дизлайков."""
@@ -372,3 +506,79 @@ class Bookmark(models.Model):
 
     def __str__(self):
         return f"{self.user} - {self.content_type}"
+
+
+class ImportedRecord(models.Model):
+    """
+    Запись источника, импортированная в режиме синхронизации: ключ записи
+    и хеш ее содержимого. По хешу импорт пропускает неизмененные записи
+    (см. importer.py).
+    """
+
+    source_key = models.CharField("Ключ записи", max_length=200, unique=True)
+    content_hash = models.CharField("Хеш содержимого", max_length=64)
+    movie = models.ForeignKey(
+        to="Movie",
+        on_delete=models.CASCADE,
+        related_name="imported_records",
+        verbose_name="Фильм",
+    )
+    imported_at = models.DateTimeField("Дата импорта", auto_now=True)
+
+    class Meta:
+        verbose_name = "Импортированная запись"
+        verbose_name_plural = "Импортированные записи"
+
+    def __str__(self):
+        return self.source_key
+
+
+class AbstractSearchEntry(models.Model):
+    """
+    Абстрактная модель записи полнотекстового индекса (виртуальная таблица
+    SQLite FTS5, создается миграцией, см. search.py). Таблица не
+    управляется Django; rowid записи совпадает с id объекта, поэтому
+    объект связан с записью индекса по первичному ключу, и поиск
+    выполняется одним соединением с таблицей индекса, а релевантность
+    'rank' вычисляется одним проходом MATCH.
+    """
+
+    rank = models.FloatField("Релевантность")
+
+    class Meta:
+        abstract = True
+        managed = False
+
+
+class MovieSearchEntry(AbstractSearchEntry):
+    """Запись полнотекстового индекса фильма."""
+
+    movie = models.OneToOneField(
+        to="Movie",
+        on_delete=models.DO_NOTHING,
+        primary_key=True,
+        db_column="rowid",
+        db_constraint=False,
+        related_name="search_entry",
+    )
+    document = SearchMatchField(db_column="movies_movie_fts")
+
+    class Meta(AbstractSearchEntry.Meta):
+        db_table = "movies_movie_fts"
+
+
+class PersonSearchEntry(AbstractSearchEntry):
+    """Запись полнотекстового индекса персоны."""
+
+    person = models.OneToOneField(
+        to="Person",
+        on_delete=models.DO_NOTHING,
+        primary_key=True,
+        db_column="rowid",
+        db_constraint=False,
+        related_name="search_entry",
+    )
+    document = SearchMatchField(db_column="movies_person_fts")
+
+    class Meta(AbstractSearchEntry.Meta):
+        db_table = "movies_person_fts"
@@ -0,0 +1,245 @@
+"""Пагинация списков фильмов и персон."""
+
+import base64
+import binascii
+import json
+
+from django.core.cache import cache
+from django.core.paginator import (
+    EmptyPage, InvalidPage, Page, PageNotAnInteger, Paginator,
+)
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import F, Q, Value
+from django.db.models.functions import Coalesce
+from django.utils.functional import cached_property
+from django.utils.translation import gettext_lazy as _
+
+
+def get_sort_fields(sort_choices):
+    """
+    Возвращает список допустимых значений сортировки из сгруппированных
+    choices формы (например, 'FilterMovieForm.SORT_CHOICES').
+    """
+    return [value for _, options in sort_choices for value, _ in options]
+
+
+class ApproximatePage(Page):
+    """
+    Страница выборки с приблизительным количеством объектов: наличие
+    следующей страницы определяется по лишней строке, выбранной вместе
+    со страницей, а не по количеству страниц.
+    """
+
+    def __init__(self, object_list, number, paginator, has_next):
+        super().__init__(object_list, number, paginator)
+        self._has_next = has_next
+
+    def has_next(self):
+        return self._has_next
+
+    def end_index(self):
+        return self.start_index() + len(self) - 1
+
+
+class CachedCountPaginator(Paginator):
+    """
+    Пагинатор, который хранит количество объектов в кеше по ключу
+    'cache_key', чтобы переход между страницами одной выборки не выполнял
+    COUNT повторно.
+
+    Если задан 'approximate_above', то считается не более
+    'approximate_above + 1' строк: для больших выборок количество
+    помечается приблизительным и выводится как '<approximate_above>+'.
+    Номер страницы такой выборки не ограничивается количеством страниц;
+    Страница выбирается с одной лишней строкой, по которой определяется
+    наличие следующей (см. 'ApproximatePage').
+    """
+
+    def __init__(self, *args, cache_key=None, cache_timeout=None,
+                 approximate_above=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.cache_key = cache_key
+        self.cache_timeout = cache_timeout
+        self.approximate_above = approximate_above
+
+    @cached_property
+    def counted(self):
+        """Пара (количество объектов, приблизительно ли оно)."""
+        cached = cache.get(self.cache_key) if self.cache_key else None
+        if cached is None:
+            cached = self.get_count()
+            if self.cache_key:
+                cache.set(self.cache_key, cached, self.cache_timeout)
+        return tuple(cached)
+
+    @property
+    def count(self):
+        return self.counted[0]
+
+    @property
+    def count_is_approximate(self):
+        return self.counted[1]
+
+    def get_count(self):
+        """Возвращает пару (количество объектов, приблизительно ли оно)."""
+        if self.approximate_above is None:
+            return self.object_list.count(), False
+        limit = self.approximate_above + 1
+        count = self.object_list.order_by()[:limit].count()
+        return count, count >= limit
+
+    @property
+    def display_count(self):
+        """Количество объектов для вывода в шаблоне."""
+        if self.count and self.count_is_approximate:
+            return f"{self.approximate_above}+"
+        return self.count
+
+    def validate_number(self, number):
+        if not self.count_is_approximate:
+            return super().validate_number(number)
+        try:
+            if isinstance(number, float) and not number.is_integer():
+                raise ValueError
+            number = int(number)
+        except (TypeError, ValueError):
+            raise PageNotAnInteger(_("That page number is not an integer"))
+        if number < 1:
+            raise EmptyPage(_("That page number is less than 1"))
+        return number
+
+    def page(self, number):
+        if not self.count_is_approximate:
+            return super().page(number)
+        number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+        object_list = list(self.object_list[bottom:bottom + self.per_page + 1])
+        if not object_list:
+            raise EmptyPage(_("That page contains no results"))
+        return ApproximatePage(
+            object_list[:self.per_page], number, self,
+            has_next=len(object_list) > self.per_page,
+        )
+
+
+class KeysetPage:
+    """
+    Страница keyset-пагинации. Вместо номеров страниц содержит курсоры
+    'next_cursor' и 'previous_cursor' для перехода к соседним страницам.
+    """
+
+    is_keyset = True
+
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class KeysetPaginator:
+    """
+    Пагинатор, выбирающий страницу условием по ключу сортировки вместо
+    OFFSET и не выполняющий COUNT(*).
+
+    Ключ строится из полей 'ordering' (поддерживаются направления '-field')
+    и первичного ключа, который разрешает совпадения значений. Поля
+    с null=True сравниваются через Coalesce со значением по умолчанию поля.
+    """
+
+    def __init__(self, queryset, per_page, ordering):
+        self.queryset = queryset
+        self.per_page = int(per_page)
+        self.keys = []
+        annotations = {}
+        meta = queryset.model._meta
+        for position, name in enumerate(ordering):
+            descending = name.startswith("-")
+            name = name.lstrip("-")
+            if name == "pk" or name == meta.pk.name:
+                continue
+            field = meta.get_field(name)
+            alias = f"_keyset_{position}"
+            annotations[alias] = F(name)
+            if field.null:
+                annotations[alias] = Coalesce(
+                    F(name), Value(field.get_default()),
+                    output_field=field,
+                )
+            self.keys.append((alias, descending))
+        self.keys.append(("pk", False))
+        self.queryset = queryset.annotate(**annotations)
+
+    def page(self, cursor=None):
+        """Возвращает страницу, следующую за курсором (или первую)."""
+        values, backwards = self.decode_cursor(cursor) if cursor else (
+            None, False
+        )
+        qs = self.queryset.order_by(*(
+            f"-{alias}" if descending != backwards else alias
+            for alias, descending in self.keys
+        ))
+        if values is not None:
+            qs = qs.filter(self.build_condition(values, backwards))
+        object_list = list(qs[:self.per_page + 1])
+        has_more = len(object_list) > self.per_page
+        object_list = object_list[:self.per_page]
+        if backwards:
+            object_list.reverse()
+        has_next = has_more if not backwards else True
+        has_previous = has_more if backwards else values is not None
+        return KeysetPage(
+            object_list,
+            next_cursor=(
+                self.encode_cursor(object_list[-1], False)
+                if has_next and object_list else None
+            ),
+            previous_cursor=(
+                self.encode_cursor(object_list[0], True)
+                if has_previous and object_list else None
+            ),
+        )
+
+    def build_condition(self, values, backwards):
+        """
+        Строит условие '(k1, k2, ...) > (v1, v2, ...)' с учетом направления
+        сортировки каждого поля ключа.
+        """
+        condition = Q()
+        equal = Q()
+        for (alias, descending), value in zip(self.keys, values):
+            lookup = "lt" if descending != backwards else "gt"
+            condition |= equal & Q(**{f"{alias}__{lookup}": value})
+            equal &= Q(**{alias: value})
+        return condition
+
+    def encode_cursor(self, obj, backwards):
+        values = [getattr(obj, alias) for alias, _ in self.keys]
+        data = json.dumps(
+            {"v": values, "b": backwards}, cls=DjangoJSONEncoder
+        )
+        return base64.urlsafe_b64encode(data.encode()).decode()
+
+    def decode_cursor(self, cursor):
+        try:
+            data = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            values, backwards = data["v"], bool(data["b"])
+        except (binascii.Error, ValueError, TypeError, KeyError) as error:
+            raise InvalidPage("Некорректный курсор") from error
+        if not isinstance(values, list) or len(values) != len(self.keys):
+            raise InvalidPage("Некорректный курсор")
+        return values, backwards
@@ -0,0 +1,57 @@
+"""Декларативные планы извлечения связанных объектов."""
+
+
+class QueryPlan:
+    """
+    План запроса: набор связей для 'select_related' и 'prefetch_related'
+    и полей для 'only', которые нужны представлению или сериализатору.
+
+    План объявляется атрибутом класса 'query_plan' и применяется
+    к queryset методом 'apply' (см. 'QueryPlanMixin'), благодаря чему
+    количество запросов страницы не зависит от количества связанных
+    объектов.
+    """
+
+    def __init__(self, select_related=(), prefetch_related=(), only=()):
+        self.select_related = tuple(select_related)
+        self.prefetch_related = tuple(prefetch_related)
+        self.only = tuple(only)
+
+    def __repr__(self):
+        return (
+            f"QueryPlan(select_related={self.select_related}, "
+            f"prefetch_related={self.prefetch_related}, only={self.only})"
+        )
+
+    def __eq__(self, other):
+        if not isinstance(other, QueryPlan):
+            return NotImplemented
+        return (
+            self.select_related == other.select_related
+            and self.prefetch_related == other.prefetch_related
+            and self.only == other.only
+        )
+
+    def __or__(self, other):
+        """Объединяет два плана, сохраняя порядок и исключая повторы."""
+        return QueryPlan(
+            select_related=_merge(self.select_related, other.select_related),
+            prefetch_related=_merge(
+                self.prefetch_related, other.prefetch_related
+            ),
+            only=_merge(self.only, other.only),
+        )
+
+    def apply(self, qs):
+        """Применяет план к queryset."""
+        if self.select_related:
+            qs = qs.select_related(*self.select_related)
+        if self.prefetch_related:
+            qs = qs.prefetch_related(*self.prefetch_related)
+        if self.only:
+            qs = qs.only(*self.only)
+        return qs
+
+
+def _merge(first, second):
+    return tuple(dict.fromkeys((*first, *second)))
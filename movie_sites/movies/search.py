@@ -0,0 +1,140 @@
+"""Полнотекстовый поиск по фильмам и персонам."""
+
+import re
+from functools import reduce
+from operator import or_
+
+from django.db import connection
+from django.db.models import F, Q
+
+from .models import Movie, Person
+
+
+class SearchIndex:
+    """
+    Полнотекстовый индекс модели на основе виртуальной таблицы SQLite FTS5.
+
+    Таблица индекса '<таблица модели>_fts' (создается миграцией) хранит
+    текстовые поля модели, rowid записи индекса совпадает с id объекта.
+    Индекс обновляется сигналами модели (см. signals.py) и пересобирается
+    командой 'rebuild_search_index'. На других СУБД поиск выполняется через
+    'icontains' по тем же полям.
+    """
+
+    def __init__(self, model, fields):
+        self.model = model
+        self.fields = fields
+        self.table = f"{model._meta.db_table}_fts"
+
+    @property
+    def is_available(self):
+        return connection.vendor == "sqlite"
+
+    def update(self, obj):
+        """Добавляет объект в индекс или обновляет его запись."""
+        self.update_many([obj])
+
+    def update_many(self, objs):
+        """
+        Добавляет объекты в индекс или обновляет их записи двумя
+        запросами (например, после bulk_create, который не отправляет
+        сигналы).
+        """
+        if not self.is_available or not objs:
+            return
+        columns = ", ".join(self.fields)
+        placeholders = ", ".join(["%s"] * (len(self.fields) + 1))
+        rows = [
+            [obj.pk, *(getattr(obj, field) or "" for field in self.fields)]
+            for obj in objs
+        ]
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"DELETE FROM {self.table} WHERE rowid IN "
+                f"({', '.join(['%s'] * len(objs))})",
+                [obj.pk for obj in objs],
+            )
+            cursor.executemany(
+                f"INSERT INTO {self.table}(rowid, {columns}) "
+                f"VALUES ({placeholders})",
+                rows,
+            )
+
+    def remove(self, pk):
+        """Удаляет объект из индекса."""
+        if not self.is_available:
+            return
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {self.table} WHERE rowid = %s", [pk])
+
+    def rebuild(self, chunk_size=1000):
+        """
+        Пересобирает индекс порциями по 'chunk_size' объектов.
+        Возвращает количество проиндексированных объектов.
+        """
+        if not self.is_available:
+            return 0
+        model_table = self.model._meta.db_table
+        columns = ", ".join(self.fields)
+        values = ", ".join(f"COALESCE({field}, '')" for field in self.fields)
+        indexed = last_pk = 0
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {self.table}")
+            while True:
+                cursor.execute(
+                    f"SELECT MAX(id), COUNT(*) FROM (SELECT id FROM "
+                    f"{model_table} WHERE id > %s ORDER BY id LIMIT %s)",
+                    [last_pk, chunk_size],
+                )
+                max_pk, count = cursor.fetchone()
+                if not count:
+                    return indexed
+                cursor.execute(
+                    f"INSERT INTO {self.table}(rowid, {columns}) "
+                    f"SELECT id, {values} FROM {model_table} "
+                    f"WHERE id > %s AND id <= %s",
+                    [last_pk, max_pk],
+                )
+                indexed += count
+                last_pk = max_pk
+
+    @staticmethod
+    def build_match(words):
+        """
+        Преобразует слова запроса в выражение MATCH: каждое слово
+        экранируется и ищется по префиксу, слова объединяются через AND.
+        """
+        return " ".join(f'"{word}"*' for word in words)
+
+    def search(self, qs, query):
+        """
+        Принимает queryset и поисковый запрос; Возвращает queryset
+        найденных объектов с аннотацией 'search_rank' (чем меньше, тем
+        релевантнее). Объекты соединяются с записями индекса
+        ('search_entry', см. AbstractSearchEntry) по rowid, поэтому MATCH
+        и релевантность вычисляются один раз за запрос, и queryset можно
+        использовать и как подзапрос.
+        """
+        words = re.findall(r"\w+", query.lower())
+        if not words:
+            return qs.none()
+        if not self.is_available:
+            return qs.filter(*(
+                reduce(or_, (
+                    Q(**{f"{field}__icontains": word}) for field in self.fields
+                ))
+                for word in words
+            ))
+        return qs.filter(
+            search_entry__document__match=self.build_match(words)
+        ).annotate(search_rank=F("search_entry__rank"))
+
+    def order_by_rank(self, qs):
+        """Сортирует результаты 'search' по релевантности."""
+        if "search_rank" not in qs.query.annotations:
+            return qs
+        return qs.order_by("search_rank", "pk")
+
+
+movie_index = SearchIndex(Movie, fields=("name", "description"))
+person_index = SearchIndex(Person, fields=("last_name", "first_name"))
@@ -0,0 +1,219 @@
+"""Обработчики сигналов моделей приложения movies."""
+
+from django.contrib.contenttypes.models import ContentType
+from django.db.models.signals import (
+    m2m_changed, post_delete, post_save, pre_delete, pre_save,
+)
+from django.dispatch import receiver
+
+from .cache import bump_catalog_version
+from .models import (
+    Bookmark, Category, Comment, Country, Genre, LikeDislike, Movie,
+    MovieActor, Person, Rating,
+)
+from .search import movie_index, person_index
+
+
+@receiver(post_save, sender=Movie)
+def index_movie(sender, instance, **kwargs):
+    """Обновляет запись фильма в поисковом индексе."""
+    movie_index.update(instance)
+
+
+@receiver(post_delete, sender=Movie)
+def unindex_movie(sender, instance, **kwargs):
+    """Удаляет фильм из поискового индекса."""
+    movie_index.remove(instance.pk)
+
+
+@receiver(post_save, sender=Person)
+def index_person(sender, instance, **kwargs):
+    """Обновляет запись персоны в поисковом индексе."""
+    person_index.update(instance)
+
+
+@receiver(post_delete, sender=Person)
+def unindex_person(sender, instance, **kwargs):
+    """Удаляет персону из поискового индекса."""
+    person_index.remove(instance.pk)
+
+
+@receiver(post_save, sender=Movie)
+@receiver(post_delete, sender=Movie)
+@receiver(m2m_changed, sender=Movie.genres.through)
+@receiver(m2m_changed, sender=Movie.countries.through)
+def invalidate_movie_counts(sender, **kwargs):
+    """
+    Меняет версию данных фильмов, чтобы закешированные количества
+    результатов фильтрации пересчитались.
+    """
+    if kwargs.get("action", "post_").startswith("post_"):
+        bump_catalog_version(Movie)
+
+
+@receiver(post_save, sender=Person)
+@receiver(post_delete, sender=Person)
+@receiver(post_save, sender=MovieActor)
+@receiver(post_delete, sender=MovieActor)
+@receiver(m2m_changed, sender=Movie.directors.through)
+def invalidate_person_counts(sender, **kwargs):
+    """
+    Меняет версию данных персон, чтобы закешированные количества
+    результатов фильтрации пересчитались.
+    """
+    if kwargs.get("action", "post_").startswith("post_"):
+        bump_catalog_version(Person)
+
+
+@receiver(pre_save, sender=MovieActor)
+def remember_previous_actor(sender, instance, **kwargs):
+    """Запоминает актера записи до сохранения (если его заменили)."""
+    instance._previous_actor_id = (
+        sender.objects.filter(pk=instance.pk)
+        .values_list("actor_id", flat=True).first()
+        if instance.pk else None
+    )
+
+
+@receiver(post_save, sender=MovieActor)
+@receiver(post_delete, sender=MovieActor)
+def refresh_actor_role(sender, instance, **kwargs):
+    """Обновляет флаг 'is_actor' персоны после изменения фильмографии."""
+    Person.refresh_roles({
+        instance.actor_id, getattr(instance, "_previous_actor_id", None)
+    } - {None})
+
+
+@receiver(m2m_changed, sender=Movie.actors.through)
+@receiver(m2m_changed, sender=Movie.directors.through)
+def refresh_m2m_roles(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Обновляет флаги ролей персон при изменении актеров или режиссеров
+    фильма через менеджеры связей (add, remove, set, clear) с любой стороны.
+    """
+    if reverse:
+        if action.startswith("post_"):
+            Person.refresh_roles([instance.pk])
+        return
+    if action == "pre_clear":
+        instance._cleared_person_ids = set(
+            sender.objects.filter(movie_id=instance.pk).values_list(
+                "actor_id" if sender is MovieActor else "person_id",
+                flat=True,
+            )
+        )
+    elif action == "post_clear":
+        Person.refresh_roles(instance.__dict__.pop("_cleared_person_ids", ()))
+    elif action in ("post_add", "post_remove"):
+        Person.refresh_roles(pk_set)
+
+
+@receiver(pre_delete, sender=Movie)
+def remember_movie_directors(sender, instance, **kwargs):
+    """
+    Запоминает режиссеров удаляемого фильма: связи с ними удаляются
+    без сигналов m2m_changed.
+    """
+    instance._director_ids = list(
+        instance.directors.values_list("pk", flat=True)
+    )
+
+
+@receiver(post_delete, sender=Movie)
+def refresh_movie_directors(sender, instance, **kwargs):
+    """Обновляет флаг 'is_director' режиссеров удаленного фильма."""
+    Person.refresh_roles(getattr(instance, "_director_ids", ()))
+
+
+def get_related_movie_ids(through, instance):
+    """
+    Возвращает подзапрос id фильмов, связанных с объектом 'instance'
+    через промежуточную модель 'through'.
+    """
+    field = next(
+        field for field in through._meta.fields
+        if field.related_model is type(instance)
+    )
+    return through.objects.filter(**{field.name: instance.pk}).values(
+        "movie_id"
+    )
+
+
+@receiver(post_save, sender=LikeDislike)
+@receiver(post_delete, sender=LikeDislike)
+@receiver(post_save, sender=Bookmark)
+@receiver(post_delete, sender=Bookmark)
+def touch_voted_object(sender, instance, **kwargs):
+    """
+    Обновляет отметку изменения объекта голоса или закладки; Для
+    комментария - отметку его фильма.
+    """
+    model = ContentType.objects.get_for_id(
+        instance.content_type_id
+    ).model_class()
+    if model is Comment:
+        Movie.touch(
+            Comment.objects.filter(pk=instance.object_id).values("movie_id")
+        )
+    elif model in (Movie, Person):
+        model.touch([instance.object_id])
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+@receiver(post_save, sender=Rating)
+@receiver(post_delete, sender=Rating)
+@receiver(post_save, sender=MovieActor)
+@receiver(post_delete, sender=MovieActor)
+def touch_movie(sender, instance, **kwargs):
+    """Обновляет отметку изменения фильма комментария, оценки или роли."""
+    Movie.touch([instance.movie_id])
+
+
+@receiver(post_save, sender=Person)
+@receiver(pre_delete, sender=Person)
+@receiver(post_save, sender=Genre)
+@receiver(pre_delete, sender=Genre)
+@receiver(post_save, sender=Country)
+@receiver(pre_delete, sender=Country)
+@receiver(post_save, sender=Category)
+@receiver(pre_delete, sender=Category)
+def touch_described_movies(sender, instance, created=False, **kwargs):
+    """
+    Обновляет отметку изменения фильмов, в описании которых выводится
+    измененная или удаляемая персона, жанр, страна или категория; Для
+    страны - также отметку ее персон.
+    """
+    if created:
+        return
+    if sender is Category:
+        Movie.touch(Movie.objects.filter(category=instance).values("pk"))
+        return
+    if sender is Country:
+        Person.touch(Person.objects.filter(country=instance).values("pk"))
+    throughs = {
+        Person: (MovieActor, Movie.directors.through),
+        Genre: (Movie.genres.through,),
+        Country: (Movie.countries.through,),
+    }
+    for through in throughs[sender]:
+        Movie.touch(get_related_movie_ids(through, instance))
+
+
+@receiver(m2m_changed, sender=Movie.genres.through)
+@receiver(m2m_changed, sender=Movie.countries.through)
+@receiver(m2m_changed, sender=Movie.actors.through)
+@receiver(m2m_changed, sender=Movie.directors.through)
+def touch_movie_relations(sender, instance, action, reverse, pk_set,
+                          **kwargs):
+    """
+    Обновляет отметку изменения фильмов при изменении их жанров, стран,
+    актеров или режиссеров через менеджеры связей с любой стороны.
+    """
+    if not reverse:
+        if action.startswith("post_"):
+            Movie.touch([instance.pk])
+    elif action in ("post_add", "post_remove"):
+        Movie.touch(pk_set)
+    elif action == "pre_clear":
+        Movie.touch(get_related_movie_ids(sender, instance))
@@ -2,9 +2,8 @@
 
 from django import template
 
-from ..models import (
-    Bookmark, Category, ContentType, Country, Genre, LikeDislike, Movie,
-)
+from ..models import Category, Country, Genre, Movie
+from ..user_state import UserStateResolver, get_user_state
 from ..utils import get_ip
 
 register = template.Library()
@@ -24,6 +23,12 @@ def convert_to_number(value):
     return int(value)
 
 
+@register.filter()
+def get_item(dictionary, key):
+    """Фильтр возвращает значение словаря по ключу (0, если ключа нет)."""
+    return dictionary.get(key, 0) if dictionary else 0
+
+
 @register.simple_tag()
 def get_genres():
     """
@@ -51,43 +56,38 @@ def get_categories():
     return Category.objects.all()
 
 
-@register.simple_tag()
-def get_status_vote(obj, user):
+@register.simple_tag(takes_context=True)
+def get_status_vote(context, obj, user):
     """
-    Функция извлекает из БД(модель LikeDislike) данные о том поставил ли
-    пользователь лайк или дизлайк; Возвращает целое число (1 или -1);
-    Если в БД не существует записи, то ловит исключение и возвращает None.
+    Функция определяет поставил ли пользователь лайк или дизлайк;
+    Возвращает целое число (1 или -1) или None, если голоса нет.
+    Данные читаются из резолвера состояния пользователя текущего запроса,
+    который извлекает голоса всех объектов страницы одним запросом.
     """
 
-    content_type = ContentType.objects.get_for_model(obj)
-    try:
-        likedislike = LikeDislike.objects.get(
-            user=user,
-            content_type=content_type,
-            object_id=obj.id
-        )
-    except LikeDislike.DoesNotExist:
-        return None
-    return likedislike.vote
+    return _get_user_state(context, user).get_vote(obj)
 
 
-@register.simple_tag()
-def bookmark_is_exists(obj, user):
-    """
-    Функция извлекает из БД(модель Bookmark) данные о том, является ли объект
-    в списке избранных определенного пользователя.
-    """
-
-    content_type = ContentType.objects.get_for_model(obj)
-    try:
-        Bookmark.objects.get(
-            user=user,
-            content_type=content_type,
-            object_id=obj.id
-        )
-    except Bookmark.DoesNotExist:
-        return False
-    return True
+@register.simple_tag(takes_context=True)
+def bookmark_is_exists(context, obj, user):
+    """
+    Функция определяет, является ли объект в списке избранных определенного
+    пользователя. Данные читаются из резолвера состояния пользователя.
+    """
+
+    return _get_user_state(context, user).has_bookmark(obj)
+
+
+def _get_user_state(context, user):
+    """
+    Возвращает резолвер состояния пользователя из запроса шаблона;
+    Если запрос недоступен, то создает резолвер для переданного пользователя.
+    """
+
+    request = context.get("request")
+    if request is None or getattr(request, "user", None) != user:
+        return UserStateResolver(user)
+    return get_user_state(request)
 
 
 @register.inclusion_tag("movies/tags/last_movies.html")
@@ -1,3 +1,1997 @@
-from django.test import TestCase
+import base64
+import csv
+import datetime
+import gzip
+import io
+import json
+import os
+import re
+import shutil
+import tempfile
+import time
+from concurrent.futures.process import BrokenProcessPool
+from unittest import mock
 
-# Create your tests here.
+from PIL import Image
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import connection, transaction
+from django.db.models import F
+from django.db.models.functions import Coalesce
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.serializers import ListSerializer
+from rest_framework_simplejwt.tokens import AccessToken
+
+from api_movie.serializers import MovieListSerializer, PersonListSerializer
+from users.authentication import user_cache
+
+from .async_views import (
+    AsyncMovieDetailView, AsyncMovieListView, AsyncPersonDetailView,
+    AsyncPersonListView,
+)
+from .cache import get_catalog_version
+from .export import MovieExport
+from .feeds import FeedError, read_feed
+from .forms import FilterMovieForm, FilterPersonForm
+from .generator import CatalogGenerator
+from .images import ImagePipeline, get_executor
+from .importer import Checkpoint, MovieImporter, make_slug
+from .loaders import CommentThreadLoader
+from .models import (
+    Bookmark, Category, Comment, Country, Genre, ImportedRecord, LikeDislike,
+    Movie, MovieActor, Person, Rating,
+)
+from .pagination import CachedCountPaginator, get_sort_fields
+from .search import SearchIndex, movie_index, person_index
+from .throttling import TokenBucket, get_rejected_counts
+from .user_state import UserStateResolver, get_user_state
+
+
+class DetailQueryBudgetTest(TestCase):
+    """
+    Проверяет, что детальные страницы фильма и персоны (и их API)
+    выполняют фиксированное количество запросов независимо от количества
+    актеров, режиссеров, жанров, стран и фильмов персоны.
+    """
+
+    # Количество запросов страницы фильма: фильм с категорией, страны,
+    # жанры, режиссеры, актеры, комментарии, рейтинг пользователя,
+    # категории меню
+    MOVIE_DETAIL_BUDGET = 8
+    # Количество запросов страницы персоны: персона со страной, фильмы
+    # актера, фильмы режиссера, категории меню
+    PERSON_DETAIL_BUDGET = 4
+    BIRTHDATE = datetime.date(1970, 1, 1)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(
+            "viewer", password="password"
+        )
+        cls.country = Country.objects.create(name="Страна")
+        cls.category = Category.objects.create(name="Фильмы", slug="films")
+        cls.movie = Movie.objects.create(
+            name="Фильм", release_year=2000, category=cls.category
+        )
+        cls.person = Person.objects.create(
+            first_name="Имя", last_name="Фамилия", country=cls.country,
+            birthdate=cls.BIRTHDATE,
+        )
+        cls.fill_movie(cls.movie, 1)
+        cls.fill_person(cls.person, 1)
+
+    @classmethod
+    def fill_movie(cls, movie, size):
+        start = Person.objects.count()
+        persons = Person.objects.bulk_create(
+            Person(
+                first_name=f"Актер {i}", last_name=f"Фамилия {i}",
+                birthdate=cls.BIRTHDATE,
+            )
+            for i in range(start, start + size)
+        )
+        MovieActor.objects.bulk_create(
+            MovieActor(movie=movie, actor=person, role=f"Роль {i}")
+            for i, person in enumerate(persons)
+        )
+        movie.directors.add(*persons)
+        movie.genres.add(*Genre.objects.bulk_create(
+            Genre(name=f"Жанр {i}", slug=f"genre-{i}")
+            for i in range(start, start + size)
+        ))
+        movie.countries.add(*Country.objects.bulk_create(
+            Country(name=f"Страна {i}") for i in range(start, start + size)
+        ))
+
+    @classmethod
+    def fill_person(cls, person, size):
+        start = Movie.objects.count()
+        movies = Movie.objects.bulk_create(
+            Movie(name=f"Фильм {i}", release_year=2000)
+            for i in range(start, start + size)
+        )
+        MovieActor.objects.bulk_create(
+            MovieActor(movie=movie, actor=person) for movie in movies
+        )
+        person.director_movies.add(*movies)
+
+    @classmethod
+    def fill_comments(cls, movie, size, user=None):
+        content_type = ContentType.objects.get_for_model(Comment)
+        for i in range(size):
+            comment = Comment.objects.create(
+                movie=movie, name=f"Автор {i}", email="author@mail.ru",
+                text="Текст",
+            )
+            answer = Comment.objects.create(
+                movie=movie, name=f"Ответ {i}", email="author@mail.ru",
+                text="Текст", major=comment,
+            )
+            if user is not None:
+                LikeDislike.objects.create(
+                    user=user, content_type=content_type,
+                    object_id=answer.id, vote=LikeDislike.Vote.DISLIKE,
+                )
+
+    def count_queries(self, url, **extra):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, **extra)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def assert_constant_queries(self, url, budget, fill, **extra):
+        """
+        Сравнивает количество запросов до и после увеличения количества
+        связанных объектов и проверяет, что оно не превышает 'budget'.
+        Первый запрос заполняет кеш типов содержимого и не учитывается.
+        """
+        self.count_queries(url, **extra)
+        small = self.count_queries(url, **extra)
+        fill(20)
+        large = self.count_queries(url, **extra)
+        self.assertEqual(small, large)
+        self.assertLessEqual(large, budget)
+
+    def test_movie_detail(self):
+        self.assert_constant_queries(
+            reverse("movies:movie_detail", args=[self.movie.id]),
+            self.MOVIE_DETAIL_BUDGET,
+            lambda size: self.fill_movie(self.movie, size),
+        )
+
+    def test_movie_detail_authenticated(self):
+        self.client.force_login(self.user)
+        # Сессия, пользователь запроса и закладка пользователя
+        self.assert_constant_queries(
+            reverse("movies:movie_detail", args=[self.movie.id]),
+            self.MOVIE_DETAIL_BUDGET + 3,
+            lambda size: self.fill_movie(self.movie, size),
+        )
+
+    def test_person_detail(self):
+        self.assert_constant_queries(
+            reverse("movies:person_detail", args=[self.person.id]),
+            self.PERSON_DETAIL_BUDGET,
+            lambda size: self.fill_person(self.person, size),
+        )
+
+    def test_person_detail_authenticated(self):
+        self.client.force_login(self.user)
+        LikeDislike.objects.create(
+            user=self.user, object_id=self.person.id, vote=1,
+            content_type=ContentType.objects.get_for_model(Person),
+        )
+        # Сессия, пользователь запроса и закладка пользователя; Голос
+        # извлекается вместе с персоной
+        self.assert_constant_queries(
+            reverse("movies:person_detail", args=[self.person.id]),
+            self.PERSON_DETAIL_BUDGET + 3,
+            lambda size: self.fill_person(self.person, size),
+        )
+
+    def test_movie_detail_api(self):
+        self.assert_constant_queries(
+            f"/api/v1/movies/{self.movie.id}/",
+            self.MOVIE_DETAIL_BUDGET,
+            lambda size: self.fill_movie(self.movie, size),
+        )
+
+    def test_person_detail_api(self):
+        self.assert_constant_queries(
+            f"/api/v1/persons/{self.person.id}/",
+            self.PERSON_DETAIL_BUDGET,
+            lambda size: self.fill_person(self.person, size),
+        )
+
+    def test_person_detail_api_vote(self):
+        token = AccessToken.for_user(self.user)
+        LikeDislike.objects.create(
+            user=self.user, object_id=self.person.id, vote=1,
+            content_type=ContentType.objects.get_for_model(Person),
+        )
+        url = f"/api/v1/persons/{self.person.id}/"
+        auth = {"HTTP_AUTHORIZATION": f"Bearer {token}"}
+        self.count_queries(url)
+        cache.clear()
+        user_cache.clear_local()
+        # Пользователь запроса; Голос извлекается вместе с персоной
+        self.assertEqual(
+            self.count_queries(url, **auth), self.count_queries(url) + 1
+        )
+        self.assertEqual(
+            self.client.get(url, **auth).json()["my_votes"], "нравится"
+        )
+        self.assertIs(self.client.get(url).json()["my_votes"], False)
+
+    def test_movie_detail_api_comments(self):
+        token = AccessToken.for_user(self.user)
+        self.fill_comments(self.movie, 1, self.user)
+        # Пользователь запроса, голоса пользователя и закладка
+        self.assert_constant_queries(
+            f"/api/v1/movies/{self.movie.id}/",
+            self.MOVIE_DETAIL_BUDGET + 3,
+            lambda size: self.fill_comments(self.movie, size, self.user),
+            HTTP_AUTHORIZATION=f"Bearer {token}",
+        )
+        response = self.client.get(
+            f"/api/v1/movies/{self.movie.id}/",
+            HTTP_AUTHORIZATION=f"Bearer {token}",
+        )
+        comments = response.json()["comments"]
+        self.assertEqual(len(comments), 21)
+        self.assertEqual(comments[0]["votes"], False)
+        self.assertEqual(len(comments[0]["children"]), 1)
+        self.assertEqual(
+            comments[0]["children"][0]["votes"], "не нравится"
+        )
+
+    def test_movie_detail_api_comments_anonymous(self):
+        self.fill_comments(self.movie, 1, self.user)
+        self.assert_constant_queries(
+            f"/api/v1/movies/{self.movie.id}/",
+            self.MOVIE_DETAIL_BUDGET,
+            lambda size: self.fill_comments(self.movie, size, self.user),
+        )
+
+
+class CommentThreadLoaderTest(TestCase):
+    """Проверяет загрузку деревьев комментариев фильмов."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user("reader")
+        cls.movie = Movie.objects.create(name="Фильм", release_year=2000)
+        cls.other = Movie.objects.create(name="Другой", release_year=2000)
+        cls.empty = Movie.objects.create(name="Пустой", release_year=2000)
+
+        def comment(movie, major=None):
+            return Comment.objects.create(
+                name="Автор", email="author@mail.ru", text="Текст",
+                movie=movie, major=major,
+            )
+
+        cls.root = comment(cls.movie)
+        cls.reply = comment(cls.movie, cls.root)
+        cls.nested = comment(cls.movie, cls.reply)
+        cls.second_root = comment(cls.movie)
+        cls.other_root = comment(cls.other)
+        LikeDislike.objects.create(
+            user=cls.user, vote=1, object_id=cls.reply.id,
+            content_type=ContentType.objects.get_for_model(Comment),
+        )
+
+    def load(self, user=None):
+        user_state = UserStateResolver(user) if user else None
+        return CommentThreadLoader(user_state).load(
+            [self.movie.id, self.other.id, self.empty.id]
+        )
+
+    @staticmethod
+    def ids(comments):
+        return {comment.id for comment in comments}
+
+    def test_tree(self):
+        with self.assertNumQueries(1):
+            threads = self.load()
+        self.assertEqual(
+            self.ids(threads[self.movie.id]),
+            {self.root.id, self.second_root.id},
+        )
+        self.assertEqual(
+            self.ids(threads[self.other.id]), {self.other_root.id}
+        )
+        self.assertEqual(threads[self.empty.id], [])
+        root = next(
+            comment for comment in threads[self.movie.id]
+            if comment.id == self.root.id
+        )
+        [reply] = root.thread_children
+        [nested] = reply.thread_children
+        self.assertEqual(
+            (reply.id, nested.id), (self.reply.id, self.nested.id)
+        )
+        self.assertEqual(nested.thread_children, [])
+        self.assertIsNone(reply.user_vote)
+
+    def test_user_votes(self):
+        ContentType.objects.get_for_model(Comment)
+        with self.assertNumQueries(2):
+            threads = self.load(self.user)
+        [reply] = next(
+            comment for comment in threads[self.movie.id]
+            if comment.id == self.root.id
+        ).thread_children
+        self.assertEqual(reply.user_vote, 1)
+        self.assertIsNone(reply.thread_children[0].user_vote)
+
+    def test_query_count_constant(self):
+        ContentType.objects.get_for_model(Comment)
+        for _ in range(5):
+            Comment.objects.create(
+                name="Автор", email="author@mail.ru", text="Ответ",
+                movie=self.other, major=self.other_root,
+            )
+        with self.assertNumQueries(2):
+            threads = self.load(self.user)
+        self.assertEqual(len(threads[self.other.id][0].thread_children), 5)
+        with self.assertNumQueries(0):
+            self.assertEqual(CommentThreadLoader().load([]), {})
+
+
+class UserStateResolverTest(TestCase):
+    """Проверяет извлечение голосов и закладок пользователя пакетами."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user("reader")
+        cls.persons = [
+            Person.objects.create(
+                first_name="Имя", last_name=f"Фамилия {number}",
+                birthdate=datetime.date(1970, 1, 1),
+            )
+            for number in range(4)
+        ]
+        content_type = ContentType.objects.get_for_model(Person)
+        LikeDislike.objects.create(
+            user=cls.user, content_type=content_type,
+            object_id=cls.persons[0].id, vote=1,
+        )
+        LikeDislike.objects.create(
+            user=cls.user, content_type=content_type,
+            object_id=cls.persons[1].id, vote=-1,
+        )
+        Bookmark.objects.create(
+            user=cls.user, content_type=content_type,
+            object_id=cls.persons[2].id,
+        )
+
+    def setUp(self):
+        ContentType.objects.get_for_model(Person)
+
+    def test_anonymous(self):
+        request = RequestFactory().get("/")
+        request.user = AnonymousUser()
+        user_state = get_user_state(request)
+        self.assertIs(get_user_state(request), user_state)
+        user_state.register(*self.persons)
+        with self.assertNumQueries(0):
+            self.assertIsNone(user_state.get_vote(self.persons[0]))
+            self.assertFalse(user_state.has_bookmark(self.persons[2]))
+        self.assertIsNone(UserStateResolver(None).get_vote(self.persons[0]))
+
+    def test_authenticated(self):
+        user_state = UserStateResolver(self.user)
+        user_state.register(*self.persons[:3])
+        with self.assertNumQueries(1):
+            votes = [
+                user_state.get_vote(person) for person in self.persons[:3]
+            ]
+        self.assertEqual(votes, [1, -1, None])
+        with self.assertNumQueries(1):
+            bookmarks = [
+                user_state.has_bookmark(person) for person in self.persons[:3]
+            ]
+        self.assertEqual(bookmarks, [False, False, True])
+        # Незарегистрированный объект извлекается отдельным запросом
+        with self.assertNumQueries(1):
+            self.assertIsNone(user_state.get_vote(self.persons[3]))
+        with self.assertNumQueries(0):
+            self.assertEqual(user_state.get_vote(self.persons[0]), 1)
+
+    def test_annotated_vote(self):
+        user_state = UserStateResolver(self.user)
+        persons = Person.objects.with_vote_stats(self.user).order_by("pk")
+        with self.assertNumQueries(1):
+            votes = [user_state.get_vote(person) for person in persons]
+        self.assertEqual(votes, [1, -1, None, None])
+
+    def test_list_view(self):
+        self.client.force_login(self.user)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse("movies:persons"))
+        self.assertEqual(response.status_code, 200)
+        # Закладки всех персон страницы извлекаются одним запросом
+        self.assertEqual(sum(
+            Bookmark._meta.db_table in query["sql"] for query in queries
+        ), 1)
+
+
+class VoteCountersTest(TestCase):
+    """Проверяет счетчики лайков и дизлайков и их пересчет."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user("reader")
+        cls.person = Person.objects.create(
+            first_name="Имя", last_name="Фамилия",
+            birthdate=datetime.date(1970, 1, 1),
+        )
+        cls.movie = Movie.objects.create(name="Фильм", release_year=2000)
+        cls.comment = Comment.objects.create(
+            name="Автор", email="author@mail.ru", text="Текст",
+            movie=cls.movie,
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+
+    def vote(self, name, obj, vote):
+        response = self.client.get(reverse(name, args=[obj.pk, vote]))
+        self.assertEqual(response.status_code, 302)
+        obj.refresh_from_db(fields=["likes", "dislikes"])
+        return obj.likes, obj.dislikes
+
+    def test_view(self):
+        self.assertEqual(
+            self.vote("movies:vote_person", self.person, 1), (1, 0)
+        )
+        # Смена голоса переносит его в другой счетчик
+        self.assertEqual(
+            self.vote("movies:vote_person", self.person, -1), (0, 1)
+        )
+        # Повторный голос отменяется
+        self.assertEqual(
+            self.vote("movies:vote_person", self.person, -1), (0, 0)
+        )
+        self.assertEqual(
+            self.vote("movies:vote_comment", self.comment, 1), (1, 0)
+        )
+        self.assertEqual(LikeDislike.objects.count(), 1)
+
+    def test_update_vote_counters(self):
+        Person.update_vote_counters(self.person.pk, new_vote=1)
+        Person.update_vote_counters(self.person.pk, old_vote=1, new_vote=-1)
+        Person.update_vote_counters(self.person.pk, old_vote=None)
+        self.person.refresh_from_db()
+        self.assertEqual((self.person.likes, self.person.dislikes), (0, 1))
+
+    def test_rebuild(self):
+        self.vote("movies:vote_person", self.person, 1)
+        self.vote("movies:vote_comment", self.comment, -1)
+        # Расхождение счетчиков с таблицей голосов
+        Person.objects.update(likes=5, dislikes=2)
+        Comment.objects.update(likes=3, dislikes=0)
+        output = io.StringIO()
+        call_command(
+            "rebuild_vote_counters", "--chunk-size", "1", stdout=output
+        )
+        self.assertIn("обновлено 1", output.getvalue())
+        self.person.refresh_from_db()
+        self.comment.refresh_from_db()
+        self.assertEqual((self.person.likes, self.person.dislikes), (1, 0))
+        self.assertEqual((self.comment.likes, self.comment.dislikes), (0, 1))
+        output = io.StringIO()
+        call_command("rebuild_vote_counters", stdout=output)
+        self.assertEqual(output.getvalue().count("обновлено 0"), 2)
+
+
+class PersonRolesTest(TestCase):
+    """Проверяет пересчет флагов ролей персон при изменении состава."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.first, cls.second = (
+            Person.objects.create(
+                first_name="Имя", last_name=f"Фамилия {number}",
+                birthdate=datetime.date(1970, 1, 1),
+            )
+            for number in range(2)
+        )
+        cls.movie = Movie.objects.create(name="Фильм", release_year=2000)
+        cls.other = Movie.objects.create(name="Другой", release_year=2000)
+
+    def assert_roles(self, person, is_actor, is_director):
+        person = Person.objects.get(pk=person.pk)
+        self.assertEqual(
+            (person.is_actor, person.is_director), (is_actor, is_director)
+        )
+
+    def test_actors(self):
+        role = MovieActor.objects.create(movie=self.movie, actor=self.first)
+        self.assert_roles(self.first, True, False)
+        role.actor = self.second
+        role.save()
+        self.assert_roles(self.first, False, False)
+        self.assert_roles(self.second, True, False)
+        self.movie.actors.add(self.first, through_defaults={"role": "Роль"})
+        self.assert_roles(self.first, True, False)
+        self.movie.actors.clear()
+        self.assert_roles(self.first, False, False)
+        self.assert_roles(self.second, False, False)
+        MovieActor.objects.create(movie=self.other, actor=self.first)
+        self.other.delete()
+        self.assert_roles(self.first, False, False)
+
+    def test_directors(self):
+        self.movie.directors.add(self.first, self.second)
+        self.assert_roles(self.first, False, True)
+        self.movie.directors.remove(self.second)
+        self.assert_roles(self.second, False, False)
+        self.other.directors.add(self.first)
+        self.first.director_movies.clear()
+        self.assert_roles(self.first, False, False)
+        self.second.director_movies.set([self.movie, self.other])
+        self.assert_roles(self.second, False, True)
+        self.movie.delete()
+        self.assert_roles(self.second, False, True)
+        self.other.delete()
+        self.assert_roles(self.second, False, False)
+
+    def test_profile_filter(self):
+        MovieActor.objects.create(movie=self.movie, actor=self.first)
+        self.movie.directors.add(self.second)
+        url = reverse("movies:persons")
+        for profiles, expected in (
+            (["actors"], [self.first]),
+            (["directors"], [self.second]),
+            (["actors", "directors"], [self.first, self.second]),
+        ):
+            with self.subTest(profiles=profiles):
+                response = self.client.get(url, {"profile": profiles})
+                self.assertEqual(
+                    list(response.context["object_list"]), expected
+                )
+
+
+class ConditionalGetTest(TestCase):
+    """Проверяет ответы API на условные запросы (ETag, Last-Modified)."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(
+            "viewer", password="password"
+        )
+        cls.movie = Movie.objects.create(name="Фильм", release_year=2000)
+        cls.person = Person.objects.create(
+            first_name="Имя", last_name="Фамилия",
+            birthdate=datetime.date(1970, 1, 1),
+        )
+
+    def get(self, url, etag=None, **extra):
+        if etag is not None:
+            extra["HTTP_IF_NONE_MATCH"] = etag
+        return self.client.get(url, **extra)
+
+    def assert_not_modified(self, url, **extra):
+        etag = self.get(url, **extra)["ETag"]
+        with CaptureQueriesContext(connection) as queries:
+            response = self.get(url, etag, **extra)
+        self.assertEqual(response.status_code, 304)
+        self.assertLessEqual(len(queries), 2)
+        return etag
+
+    def test_movie_list(self):
+        url = "/api/v1/movies/"
+        etag = self.assert_not_modified(url)
+        self.assertNotEqual(self.get(url + "?page_size=1")["ETag"], etag)
+        Movie.objects.create(name="Новый фильм", release_year=2001)
+        self.assertEqual(self.get(url, etag).status_code, 200)
+        etag = self.assert_not_modified(url)
+        Movie.objects.filter(name="Новый фильм").delete()
+        self.assertEqual(self.get(url, etag).status_code, 200)
+
+    def test_movie_detail(self):
+        url = f"/api/v1/movies/{self.movie.id}/"
+        etag = self.assert_not_modified(url)
+        self.assertIn("Last-Modified", self.get(url))
+        comment = Comment.objects.create(
+            movie=self.movie, name="Автор", email="author@mail.ru",
+            text="Текст",
+        )
+        self.assertEqual(self.get(url, etag).status_code, 200)
+        etag = self.assert_not_modified(url)
+        LikeDislike.objects.create(
+            user=self.user, object_id=comment.id, vote=1,
+            content_type=ContentType.objects.get_for_model(Comment),
+        )
+        self.assertEqual(self.get(url, etag).status_code, 200)
+        etag = self.assert_not_modified(url)
+        self.movie.genres.add(Genre.objects.create(name="Жанр", slug="genre"))
+        self.assertEqual(self.get(url, etag).status_code, 200)
+
+    def test_movie_detail_depends_on_user(self):
+        url = f"/api/v1/movies/{self.movie.id}/"
+        token = AccessToken.for_user(self.user)
+        etag = self.assert_not_modified(url)
+        response = self.get(url, etag, HTTP_AUTHORIZATION=f"Bearer {token}")
+        self.assertEqual(response.status_code, 200)
+
+    def test_sparse_fields_etag(self):
+        url = f"/api/v1/movies/{self.movie.id}/"
+        etag = self.assert_not_modified(url + "?fields=name")
+        response = self.get(url, etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+        self.assertIn("description", response.json())
+        self.assertIn("Accept", response["Vary"])
+
+    def test_person_detail(self):
+        url = f"/api/v1/persons/{self.person.id}/"
+        etag = self.assert_not_modified(url)
+        LikeDislike.objects.create(
+            user=self.user, object_id=self.person.id, vote=1,
+            content_type=ContentType.objects.get_for_model(Person),
+        )
+        self.assertEqual(self.get(url, etag).status_code, 200)
+        self.assertEqual(self.get("/api/v1/persons/0/").status_code, 404)
+
+    def test_invalid_pk(self):
+        for url in ("/api/v1/movies/abc/", "/api/v1/persons/abc/"):
+            with self.subTest(url=url):
+                self.assertEqual(self.get(url).status_code, 404)
+
+
+class RatingTest(TestCase):
+    """Проверяет атомарное обновление рейтинга фильма и его пересчет."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.movie = Movie.objects.create(name="Фильм", release_year=2000)
+
+    def setUp(self):
+        cache.clear()
+
+    def rate(self, score, ip="127.0.0.1"):
+        response = self.client.post(
+            reverse("movies:add_rating"),
+            {"movie": self.movie.id, "score": score},
+            REMOTE_ADDR=ip,
+        )
+        self.assertEqual(response.status_code, 302)
+        return Movie.objects.get(pk=self.movie.pk)
+
+    def test_update_rating(self):
+        self.assertTrue(Movie.update_rating(self.movie.pk, 7, count_delta=1))
+        self.assertTrue(Movie.update_rating(self.movie.pk, 5, count_delta=1))
+        self.assertFalse(Movie.update_rating(self.movie.pk, 1))
+        movie = Movie.objects.get(pk=self.movie.pk)
+        self.assertEqual(
+            (movie.rating_sum, movie.rating_count, movie.rating),
+            (13, 2, 6.5),
+        )
+        Movie.update_rating(self.movie.pk, -13, count_delta=-2)
+        self.assertIsNone(Movie.objects.get(pk=self.movie.pk).rating)
+
+    def test_view(self):
+        version = get_catalog_version(Movie)
+        movie = self.rate(8)
+        self.assertEqual((movie.rating_sum, movie.rating_count), (8, 1))
+        version, previous = get_catalog_version(Movie), version
+        self.assertNotEqual(version, previous)
+        # Повторная оценка с того же IP-адреса заменяет прежнюю
+        movie = self.rate(9)
+        self.assertEqual((movie.rating_sum, movie.rating_count), (9, 1))
+        self.assertEqual(Rating.objects.get().score, 9)
+        version, previous = get_catalog_version(Movie), version
+        self.assertNotEqual(version, previous)
+        # Целая часть рейтинга не изменилась: версия данных та же
+        movie = self.rate(10, ip="10.0.0.1")
+        self.assertEqual(movie.rating, 9.5)
+        self.assertEqual(get_catalog_version(Movie), version)
+        self.rate(10, ip="10.0.0.1")
+        self.assertEqual(Rating.objects.count(), 2)
+
+    def test_concurrent_create(self):
+        Rating.objects.create(movie=self.movie, ip="127.0.0.1", score=5)
+        Movie.update_rating(self.movie.pk, 5, count_delta=1)
+        # Первый поиск оценки не находит ее, как в параллельном запросе
+        missing = Rating.objects.none()
+        with mock.patch.object(
+            Rating.objects, "select_for_update",
+            side_effect=[missing, Rating.objects.select_for_update()],
+        ):
+            movie = self.rate(3)
+        self.assertEqual((movie.rating_sum, movie.rating_count), (3, 1))
+        self.assertEqual(Rating.objects.get().score, 3)
+
+    def test_reconcile_ratings(self):
+        other = Movie.objects.create(name="Другой", release_year=2000)
+        Rating.objects.create(movie=self.movie, ip="127.0.0.1", score=4)
+        Rating.objects.create(movie=self.movie, ip="10.0.0.1", score=7)
+        Rating.objects.create(movie=other, ip="127.0.0.1", score=5)
+        Movie.objects.filter(pk=self.movie.pk).update(
+            rating_sum=1, rating_count=1, rating=1
+        )
+        Movie.objects.filter(pk=other.pk).update(
+            rating_sum=5, rating_count=1, rating=5
+        )
+        output = io.StringIO()
+        call_command("reconcile_ratings", "--chunk-size", "1", stdout=output)
+        self.assertIn("обновлено 1", output.getvalue())
+        movie = Movie.objects.get(pk=self.movie.pk)
+        self.assertEqual(
+            (movie.rating_sum, movie.rating_count, movie.rating),
+            (11, 2, 5.5),
+        )
+
+
+class ModifiedStampTest(TestCase):
+    """
+    Проверяет, что изменения связанных данных и массовые обновления
+    меняют отметку изменения 'updated_at' и версию данных.
+    """
+
+    OLD = datetime.datetime(2000, 1, 1, tzinfo=datetime.timezone.utc)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.genre = Genre.objects.create(name="Драма", slug="drama")
+        cls.country = Country.objects.create(name="Страна")
+        cls.category = Category.objects.create(name="Фильмы", slug="films")
+        cls.person = Person.objects.create(
+            first_name="Имя", last_name="Фамилия", country=cls.country,
+            birthdate=datetime.date(1970, 1, 1),
+        )
+        cls.movie = Movie.objects.create(
+            name="Фильм", release_year=2000, category=cls.category
+        )
+        cls.movie.genres.add(cls.genre)
+        cls.movie.countries.add(cls.country)
+        cls.movie.directors.add(cls.person)
+        cls.other = Movie.objects.create(name="Другой", release_year=2000)
+
+    def setUp(self):
+        Movie.objects.update(updated_at=self.OLD)
+        Person.objects.update(updated_at=self.OLD)
+
+    def assert_touched(self, *objs):
+        for obj in objs:
+            obj.refresh_from_db(fields=["updated_at"])
+            self.assertGreater(obj.updated_at, self.OLD, obj)
+        self.other.refresh_from_db(fields=["updated_at"])
+        self.assertEqual(self.other.updated_at, self.OLD)
+
+    def test_rename(self):
+        for obj in (self.genre, self.country, self.category):
+            with self.subTest(obj=obj):
+                self.setUp()
+                obj.name += " 2"
+                obj.save()
+                self.assert_touched(self.movie)
+                if obj is self.country:
+                    self.assert_touched(self.person)
+
+    def test_person_country(self):
+        self.person.country = Country.objects.create(name="Другая")
+        self.person.save()
+        self.assert_touched(self.movie, self.person)
+
+    def test_delete_category(self):
+        self.category.delete()
+        self.assert_touched(self.movie)
+
+    def test_reverse_relations(self):
+        version = get_catalog_version(Movie)
+        self.genre.genre_movies.remove(self.movie)
+        self.assert_touched(self.movie)
+        self.assertNotEqual(get_catalog_version(Movie), version)
+        self.setUp()
+        self.country.country_movies.clear()
+        self.assert_touched(self.movie)
+        self.setUp()
+        self.person.director_movies.remove(self.movie)
+        self.assert_touched(self.movie)
+
+    def test_reconcile_ratings(self):
+        Movie.objects.filter(pk=self.movie.pk).update(
+            rating_sum=10, rating_count=2, rating=5
+        )
+        version = get_catalog_version(Movie)
+        call_command("reconcile_ratings", stdout=io.StringIO())
+        self.assert_touched(self.movie)
+        self.assertNotEqual(get_catalog_version(Movie), version)
+
+    def test_rebuild_vote_counters(self):
+        comment = Comment.objects.create(
+            name="Автор", email="author@mail.ru", text="Текст",
+            movie=self.movie,
+        )
+        Person.objects.filter(pk=self.person.pk).update(likes=3)
+        Comment.objects.filter(pk=comment.pk).update(dislikes=2)
+        self.setUp()
+        version = get_catalog_version(Person)
+        call_command("rebuild_vote_counters", stdout=io.StringIO())
+        self.assert_touched(self.movie, self.person)
+        self.assertNotEqual(get_catalog_version(Person), version)
+
+    def test_image_pipeline(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=media_root.name))
+        version = get_catalog_version(Movie)
+        ImagePipeline(0).save([
+            (self.movie, "poster", ImagePipelineTest.make_image())
+        ])
+        self.assert_touched(self.movie)
+        self.assertNotEqual(get_catalog_version(Movie), version)
+
+
+class SparseFieldsTest(TestCase):
+    """Проверяет выбор полей API параметрами 'fields' и 'expand'."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.movie = Movie.objects.create(name="Фильм", release_year=2000)
+        DetailQueryBudgetTest.fill_movie(cls.movie, 3)
+        DetailQueryBudgetTest.fill_comments(cls.movie, 3)
+
+    def get(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response.json(), [query["sql"] for query in queries]
+
+    def test_list_fields(self):
+        data, queries = self.get("/api/v1/movies/?fields=id,name,rating")
+        self.assertEqual(set(data[0]), {"id", "name", "rating"})
+        self.assertNotIn('"movies_movie"."description"', queries[-1])
+
+    def test_detail_without_comments(self):
+        data, queries = self.get(
+            f"/api/v1/movies/{self.movie.id}/?fields=-comments"
+        )
+        self.assertNotIn("comments", data)
+        self.assertIn("actors", data)
+        self.assertFalse(any("movies_comment" in sql for sql in queries))
+
+    def test_detail_expand(self):
+        data, queries = self.get(
+            f"/api/v1/movies/{self.movie.id}/?fields=name&expand=comments"
+        )
+        self.assertEqual(list(data), ["name", "comments"])
+        self.assertEqual(len(data["comments"]), 3)
+        self.assertFalse(any("movies_genre" in sql for sql in queries))
+
+    def test_default_fields(self):
+        data, _ = self.get(f"/api/v1/movies/{self.movie.id}/")
+        self.assertEqual(
+            list(data), [
+                "name", "release_year", "poster", "rating", "my_rating",
+                "description", "category", "genres", "countries", "actors",
+                "directors", "is_in_bookmarks", "comments",
+            ]
+        )
+
+
+class BulkRetrieveTest(TestCase):
+    """Проверяет действие API 'bulk'."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.movies = Movie.objects.bulk_create(
+            Movie(name=f"Фильм {i}", release_year=2000) for i in range(10)
+        )
+        for movie in cls.movies:
+            DetailQueryBudgetTest.fill_movie(movie, 2)
+            DetailQueryBudgetTest.fill_comments(movie, 2)
+
+    def get(self, ids, **params):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(
+                "/api/v1/movies/bulk/", {"ids": ids, **params}
+            )
+        return response, len(queries)
+
+    def test_order_and_missing(self):
+        ids = [self.movies[2].id, 0, self.movies[0].id]
+        response, _ = self.get(",".join(map(str, ids)), fields="name")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {
+            "results": [{"name": "Фильм 2"}, {"name": "Фильм 0"}],
+            "missing": [0],
+        })
+
+    def test_constant_queries(self):
+        self.get(str(self.movies[0].id))
+        _, small = self.get(str(self.movies[0].id))
+        response, large = self.get(
+            ",".join(str(movie.id) for movie in self.movies)
+        )
+        self.assertEqual(len(response.json()["results"]), 10)
+        self.assertEqual(small, large)
+
+    def test_invalid_ids(self):
+        self.assertEqual(self.get("1,a")[0].status_code, 400)
+        self.assertEqual(self.get("")[0].status_code, 400)
+        with self.settings(API_BULK_MAX_IDS=2):
+            self.assertEqual(self.get("1,2,3")[0].status_code, 400)
+
+    def test_persons(self):
+        person = Person.objects.first()
+        response = self.client.get(
+            "/api/v1/persons/bulk/", {"ids": f"{person.id},0"}
+        )
+        self.assertEqual(response.json()["missing"], [0])
+        self.assertEqual(
+            response.json()["results"][0]["last_name"], person.last_name
+        )
+
+
+class CatalogExportTest(TestCase):
+    """Проверяет потоковую выгрузку каталога."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.movies = Movie.objects.bulk_create(
+            Movie(name=f"Фильм {i}", release_year=2000) for i in range(5)
+        )
+        DetailQueryBudgetTest.fill_movie(cls.movies[0], 2)
+
+    def export(self, resource="movies", **params):
+        response = self.client.get(f"/api/v1/export/{resource}/", params)
+        self.assertEqual(response.status_code, 200)
+        return b"".join(response.streaming_content).decode()
+
+    def test_ndjson(self):
+        lines = self.export().splitlines()
+        rows = [json.loads(line) for line in lines]
+        self.assertEqual(
+            [row["id"] for row in rows], [movie.id for movie in self.movies]
+        )
+        self.assertEqual(rows[0]["genres"], ["Жанр 0", "Жанр 1"])
+        self.assertEqual(len(rows[0]["actors"]), 2)
+
+    def test_csv(self):
+        rows = list(csv.reader(io.StringIO(self.export(output="csv"))))
+        self.assertEqual(rows[0][:3], ["id", "name", "description"])
+        self.assertEqual(len(rows), 6)
+        self.assertIn("Жанр 0|Жанр 1", rows[1])
+
+    def test_chunks(self):
+        export = MovieExport(chunk_size=2)
+        with CaptureQueriesContext(connection) as queries:
+            rows = list(export.iter_rows())
+        self.assertEqual(len(rows), 5)
+        # Три порции: запрос фильмов и по запросу на каждую из 4 связей,
+        # затем пустой запрос, завершающий выгрузку
+        self.assertEqual(len(queries), 3 * 5 + 1)
+
+    def test_updated_since(self):
+        moment = timezone.now()
+        Movie.touch([self.movies[3].id])
+        lines = self.export(updated_since=moment.isoformat())
+        self.assertEqual(json.loads(lines)["id"], self.movies[3].id)
+        response = self.client.get(
+            "/api/v1/export/movies/", {"updated_since": "вчера"}
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_persons(self):
+        lines = self.export("persons").splitlines()
+        self.assertEqual(len(lines), Person.objects.count())
+
+    def test_command(self):
+        output = io.StringIO()
+        call_command("export_catalog", "movies", "--output-format=csv",
+                     stdout=output)
+        self.assertEqual(len(output.getvalue().splitlines()), 6)
+
+
+class FastListSerializerTest(TestCase):
+    """Проверяет, что FastListSerializer выводит тот же JSON."""
+
+    @classmethod
+    def setUpTestData(cls):
+        posters = ["", "Movie/a.webp", "Movie/фото 1.webp", "Movie/../b.webp"]
+        Movie.objects.bulk_create(
+            Movie(
+                name=f"Фильм {i}", release_year=2000, rating=i / 3,
+                poster=posters[i % len(posters)],
+            )
+            for i in range(8)
+        )
+        Person.objects.bulk_create(
+            Person(
+                first_name=f"Имя {i}", last_name="Фамилия",
+                birthdate=datetime.date(1970, 1, 1 + i),
+                picture=posters[i % len(posters)] or None,
+            )
+            for i in range(8)
+        )
+
+    def render(self, serializer_class, data, fast):
+        context = {"request": RequestFactory().get("/api/v1/")}
+        if fast:
+            serializer = serializer_class(data, many=True, context=context)
+        else:
+            serializer = ListSerializer(
+                data, child=serializer_class(), context=context
+            )
+        return JSONRenderer().render(serializer.data)
+
+    def test_same_json(self):
+        for serializer_class, model in (
+            (MovieListSerializer, Movie), (PersonListSerializer, Person)
+        ):
+            queryset = model.objects.all()
+            expected = self.render(serializer_class, queryset, fast=False)
+            for data in (queryset, list(queryset)):
+                self.assertEqual(
+                    self.render(serializer_class, data, fast=True), expected
+                )
+
+    def test_benchmark_command(self):
+        output = io.StringIO()
+        call_command("benchmark_list_serializers", repeat=1, stdout=output)
+        self.assertIn("FastListSerializer", output.getvalue())
+
+
+@override_settings(
+    CATALOG_ASYNC_VIEWS=True,
+    MIDDLEWARE=[
+        name for name in settings.MIDDLEWARE if "debug_toolbar" not in name
+    ],
+)
+class AsyncViewsTest(TestCase):
+    """
+    Проверяет, что асинхронные представления ASGI-приложения выводят
+    то же, что и синхронные.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(
+            "viewer", password="password"
+        )
+        cls.movie = Movie.objects.create(name="Фильм", release_year=2000)
+        DetailQueryBudgetTest.fill_movie(cls.movie, 3)
+        DetailQueryBudgetTest.fill_comments(cls.movie, 3, user=cls.user)
+        cls.person = Person.objects.order_by("pk").first()
+        Bookmark.objects.create(
+            user=cls.user, object_id=cls.movie.id,
+            content_type=ContentType.objects.get_for_model(Movie),
+        )
+        LikeDislike.objects.create(
+            user=cls.user, object_id=cls.person.id, vote=1,
+            content_type=ContentType.objects.get_for_model(Person),
+        )
+
+    def get(self, url, **headers):
+        expected = self.client.get(url, headers=headers)
+
+        async def get():
+            return await self.async_client.get(url, headers=headers)
+
+        response = async_to_sync(get)()
+        self.assertEqual(response.status_code, expected.status_code)
+        return expected, response
+
+    def strip_csrf(self, content):
+        return re.sub(rb'"csrfmiddlewaretoken" value="[^"]*"', b"", content)
+
+    def test_pages(self):
+        self.client.force_login(self.user)
+        self.async_client.force_login(self.user)
+        for url, view_class in (
+            (reverse("movies:index"), AsyncMovieListView),
+            (reverse("movies:index") + "?sort=-name", AsyncMovieListView),
+            (
+                reverse("movies:movie_detail", args=[self.movie.id]),
+                AsyncMovieDetailView,
+            ),
+            (reverse("movies:persons"), AsyncPersonListView),
+            (
+                reverse("movies:person_detail", args=[self.person.id]),
+                AsyncPersonDetailView,
+            ),
+        ):
+            expected, response = self.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertIs(
+                response.asgi_request.resolver_match.func.view_class,
+                view_class,
+            )
+            self.assertEqual(
+                self.strip_csrf(response.content),
+                self.strip_csrf(expected.content),
+            )
+        self.get(reverse("movies:movie_detail", args=[0]))
+        self.get(reverse("movies:index") + "?page=100")
+
+    def test_api(self):
+        token = AccessToken.for_user(self.user)
+        for headers in ({}, {"Authorization": f"Bearer {token}"}):
+            for url in (
+                "/api/v1/movies/",
+                "/api/v1/movies/?page_size=2&sort=-name",
+                f"/api/v1/movies/{self.movie.id}/",
+                f"/api/v1/movies/{self.movie.id}/?fields=name,is_in_bookmarks",
+                "/api/v1/persons/",
+                f"/api/v1/persons/{self.person.id}/",
+                "/api/v1/movies/0/",
+            ):
+                expected, response = self.get(url, **headers)
+                self.assertEqual(response.content, expected.content)
+                self.assertEqual(response.get("ETag"), expected.get("ETag"))
+        expected, response = self.get(
+            f"/api/v1/movies/{self.movie.id}/", **headers
+        )
+        self.assertTrue(response.json()["is_in_bookmarks"])
+        expected, response = self.get(
+            f"/api/v1/movies/{self.movie.id}/",
+            **headers, **{"If-None-Match": response["ETag"]},
+        )
+        self.assertEqual(response.status_code, 304)
+
+
+class SearchIndexTest(TestCase):
+    """Проверяет полнотекстовый индекс фильмов и персон."""
+
+    def search(self, query, index=movie_index):
+        qs = index.order_by_rank(
+            index.search(index.model.objects.all(), query)
+        )
+        return [obj.pk for obj in qs]
+
+    def test_signals(self):
+        movie = Movie.objects.create(name="Звездные войны", release_year=1977)
+        self.assertEqual(self.search("звездн"), [movie.pk])
+        movie.name = "Новая надежда"
+        movie.save()
+        self.assertEqual(self.search("звездн"), [])
+        self.assertEqual(self.search("надежда новая"), [movie.pk])
+        movie.delete()
+        self.assertEqual(self.search("надежда"), [])
+        person = Person.objects.create(
+            first_name="Джордж", last_name="Лукас",
+            birthdate=datetime.date(1944, 5, 14),
+        )
+        self.assertEqual(self.search("лукас", person_index), [person.pk])
+
+    def test_rank(self):
+        other = Movie.objects.create(
+            name="Берег", description="Дом у моря", release_year=2000
+        )
+        best = Movie.objects.create(
+            name="Море", description="Море и море", release_year=2000
+        )
+        self.assertEqual(self.search("мор"), [best.pk, other.pk])
+        # Результаты поиска можно использовать как подзапрос
+        self.assertEqual(
+            Movie.objects.filter(pk__in=movie_index.search(
+                Movie.objects.all(), "берег"
+            ).values("id")).get(),
+            other,
+        )
+        self.assertEqual(self.search("!!!"), [])
+
+    def test_icontains_fallback(self):
+        movie = Movie.objects.create(
+            name="Звездные войны", description="Далекий космос",
+            release_year=1977,
+        )
+        with mock.patch.object(
+            SearchIndex, "is_available", new_callable=mock.PropertyMock,
+            return_value=False,
+        ):
+            self.assertEqual(self.search("войны космос"), [movie.pk])
+            self.assertEqual(self.search("войны море"), [])
+            self.assertEqual(movie_index.rebuild(), 0)
+
+    def test_rebuild_command(self):
+        movies = Movie.objects.bulk_create(
+            Movie(name=f"Фильм {number}", release_year=2000)
+            for number in range(5)
+        )
+        self.assertEqual(self.search("фильм"), [])
+        output = io.StringIO()
+        call_command(
+            "rebuild_search_index", "--chunk-size", "2", stdout=output
+        )
+        self.assertIn("проиндексировано 5", output.getvalue())
+        self.assertCountEqual(
+            self.search("фильм"), [movie.pk for movie in movies]
+        )
+
+    def test_rank_single_match(self):
+        # Релевантность вычисляется одним проходом MATCH, а не подзапросом
+        # для каждой найденной записи
+        Movie.objects.bulk_create(
+            Movie(name=f"Тайна {number}", description="Тайна города",
+                  release_year=2000)
+            for number in range(5000)
+        )
+        movie_index.rebuild()
+        qs = movie_index.order_by_rank(
+            movie_index.search(Movie.objects.all(), "тайна город")
+        )
+        with CaptureQueriesContext(connection) as queries:
+            started = time.monotonic()
+            self.assertEqual(qs.count(), 5000)
+            self.assertEqual(len(qs[:20]), 20)
+            elapsed = time.monotonic() - started
+        self.assertEqual(len(queries), 2)
+        for query in queries:
+            self.assertEqual(query["sql"].count("MATCH"), 1)
+        self.assertLess(elapsed, 5)
+
+
+@override_settings(CATALOG_PAGINATION_MODE="keyset")
+class KeysetPaginationTest(TestCase):
+    """
+    Проверяет keyset-пагинацию списков и API при всех сортировках, в том
+    числе при совпадающих значениях ключа сортировки.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        # Названия, годы и рейтинги повторяются, часть рейтингов - NULL
+        for number in range(20):
+            Movie.objects.create(
+                name=f"Фильм {number % 6}",
+                release_year=2000 + number % 3,
+                rating=None if number % 5 == 0 else number % 4,
+            )
+        for number in range(11):
+            Person.objects.create(
+                first_name=f"Имя {number % 3}",
+                last_name=f"Фамилия {number}",
+                birthdate=datetime.date(1970 + number % 2, 1, 1),
+            )
+
+    def expected(self, model, sort):
+        descending = sort.startswith("-")
+        field = model._meta.get_field(sort.lstrip("-"))
+        key = F(field.name)
+        if field.null:
+            key = Coalesce(field.name, field.get_default())
+        key = key.desc() if descending else key.asc()
+        return list(model.objects.order_by(key, "pk").values_list(
+            "pk", flat=True
+        ))
+
+    def walk(self, url, params):
+        """
+        Проходит список вперед, затем назад от последней страницы;
+        Возвращает id объектов в обоих проходах.
+        """
+        pages, cursor = [], None
+        while True:
+            response = self.client.get(url, {**params, "cursor": cursor or ""})
+            self.assertEqual(response.status_code, 200)
+            page = response.context["page_obj"]
+            self.assertTrue(page.is_keyset)
+            pages.append([obj.pk for obj in page])
+            last = page
+            if not page.has_next():
+                break
+            cursor = page.next_cursor
+        forward = [pk for page in pages for pk in page]
+        backward = list(pages[-1])
+        page = last
+        while page.has_previous():
+            response = self.client.get(
+                url, {**params, "cursor": page.previous_cursor}
+            )
+            page = response.context["page_obj"]
+            backward[:0] = [obj.pk for obj in page]
+        return forward, backward
+
+    def test_movie_sorts(self):
+        url = reverse("movies:index")
+        for sort in get_sort_fields(FilterMovieForm.SORT_CHOICES):
+            with self.subTest(sort=sort):
+                forward, backward = self.walk(url, {"sort": sort})
+                self.assertEqual(forward, self.expected(Movie, sort))
+                self.assertEqual(backward, forward)
+        forward, _ = self.walk(url, {})
+        self.assertEqual(forward, list(
+            Movie.objects.order_by("name", "release_year", "pk")
+            .values_list("pk", flat=True)
+        ))
+
+    def test_person_sorts(self):
+        url = reverse("movies:persons")
+        for sort in get_sort_fields(FilterPersonForm.SORT_CHOICES):
+            with self.subTest(sort=sort):
+                forward, backward = self.walk(url, {"sort": sort})
+                self.assertEqual(forward, self.expected(Person, sort))
+                self.assertEqual(backward, forward)
+
+    def test_invalid_cursor(self):
+        url = reverse("movies:index")
+        wrong_keys = base64.urlsafe_b64encode(
+            json.dumps({"v": [1], "b": False}).encode()
+        ).decode()
+        for cursor in ("не-курсор", "e30=", wrong_keys):
+            with self.subTest(cursor=cursor):
+                response = self.client.get(url, {"cursor": cursor})
+                self.assertEqual(response.status_code, 404)
+                response = self.client.get(
+                    "/api/v1/movies/", {"cursor": cursor}
+                )
+                self.assertEqual(response.status_code, 404)
+
+    def test_api(self):
+        for sort in ("-rating", "name"):
+            with self.subTest(sort=sort):
+                ids = []
+                url = f"/api/v1/movies/?page_size=7&sort={sort}"
+                while url:
+                    data = self.client.get(url).json()
+                    ids += [movie["id"] for movie in data["results"]]
+                    url = data["next"]
+                self.assertEqual(ids, self.expected(Movie, sort))
+                self.assertIsNotNone(data["previous"])
+                data = self.client.get(data["previous"]).json()
+                self.assertEqual(
+                    [movie["id"] for movie in data["results"]], ids[7:14]
+                )
+
+    def test_api_without_pagination(self):
+        # Без 'cursor' и 'page_size' список возвращается целиком
+        data = self.client.get("/api/v1/movies/").json()
+        self.assertIsInstance(data, list)
+        self.assertEqual(len(data), 20)
+
+
+class CachedCountTest(TestCase):
+    """Проверяет кеширование и приблизительный подсчет количества."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.genre = Genre.objects.create(name="Драма", slug="drama")
+        for number in range(20):
+            movie = Movie.objects.create(
+                name=f"Фильм {number}", release_year=2000 + number
+            )
+            if number % 2:
+                movie.genres.add(cls.genre)
+
+    def setUp(self):
+        cache.clear()
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response, [
+            query["sql"] for query in queries if "COUNT(*)" in query["sql"]
+        ]
+
+    def test_count_cached(self):
+        url = reverse("movies:index") + f"?genres={self.genre.id}"
+        response, counts = self.count_queries(url)
+        self.assertEqual(len(counts), 1)
+        self.assertEqual(response.context["paginator"].count, 10)
+        response, counts = self.count_queries(url + "&page=2&sort=name")
+        self.assertEqual(counts, [])
+        self.assertEqual(len(response.context["object_list"]), 2)
+        _, counts = self.count_queries(reverse("movies:index"))
+        self.assertEqual(len(counts), 1)
+
+    def test_version_invalidation(self):
+        url = reverse("movies:index") + f"?genres={self.genre.id}"
+        self.count_queries(url)
+        Movie.objects.create(name="Новый", release_year=1990).genres.add(
+            self.genre
+        )
+        response, counts = self.count_queries(url)
+        self.assertEqual(len(counts), 1)
+        self.assertEqual(response.context["paginator"].count, 11)
+
+    @override_settings(CATALOG_COUNT_APPROXIMATE_ABOVE=10)
+    def test_approximate(self):
+        response = self.client.get(reverse("movies:index"))
+        paginator = response.context["paginator"]
+        self.assertEqual(paginator.count, 11)
+        self.assertTrue(paginator.count_is_approximate)
+        self.assertContains(response, "Найдено: 10+")
+        self.assertNotContains(response, "Последняя")
+        response = self.client.get(reverse("movies:index") + "?page=3")
+        self.assertEqual(response.status_code, 200)
+        page = response.context["page_obj"]
+        self.assertEqual(len(page), 4)
+        self.assertFalse(page.has_next())
+        self.assertEqual((page.start_index(), page.end_index()), (17, 20))
+        self.assertEqual(
+            self.client.get(reverse("movies:index") + "?page=4").status_code,
+            404,
+        )
+        response = self.client.get(
+            reverse("movies:index") + f"?genres={self.genre.id}"
+        )
+        self.assertFalse(response.context["paginator"].count_is_approximate)
+        self.assertContains(response, "Найдено: 10")
+
+    @override_settings(CATALOG_COUNT_APPROXIMATE_ABOVE=10)
+    def test_paginator(self):
+        paginator = CachedCountPaginator(
+            Movie.objects.order_by("id"), 8, cache_key="count",
+            approximate_above=10,
+        )
+        self.assertEqual(paginator.display_count, "10+")
+        self.assertTrue(paginator.page(2).has_next())
+        self.assertEqual(paginator.page(2).next_page_number(), 3)
+        self.assertEqual(cache.get("count"), (11, True))
+
+    @override_settings(CATALOG_COUNT_APPROXIMATE_ABOVE=10)
+    def test_api_facets_count(self):
+        data = self.client.get("/api/v1/movies/facets/").json()
+        self.assertEqual(
+            (data["count"], data["count_is_approximate"]), (11, True)
+        )
+        data = self.client.get(
+            f"/api/v1/movies/facets/?genres={self.genre.id}"
+        ).json()
+        self.assertEqual(
+            (data["count"], data["count_is_approximate"]), (10, False)
+        )
+
+
+class MovieFacetsTest(TestCase):
+    """Проверяет, что фасеты считаются по фильмам раздела списка."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.drama = Genre.objects.create(name="Драма", slug="drama")
+        cls.comedy = Genre.objects.create(name="Комедия", slug="comedy")
+        cls.films = Category.objects.create(name="Фильмы", slug="films")
+        cls.series = Category.objects.create(name="Сериалы", slug="series")
+        movies = [
+            ("Космос", cls.films, 1995, [cls.drama]),
+            ("Космос 2", cls.films, 2005, [cls.drama, cls.comedy]),
+            ("Море", cls.films, 2005, [cls.comedy]),
+            ("Космос", cls.series, 2010, [cls.drama]),
+            ("Горы", cls.series, 2011, [cls.drama]),
+        ]
+        for name, category, year, genres in movies:
+            movie = Movie.objects.create(
+                name=name, category=category, release_year=year
+            )
+            movie.genres.set(genres)
+
+    def setUp(self):
+        cache.clear()
+
+    def assert_facets_match_list(self, url, **params):
+        response = self.client.get(url, params)
+        facets = response.context["facets"]
+        for genre in (self.drama, self.comedy):
+            filtered = self.client.get(url, {**params, "genres": genre.id})
+            self.assertEqual(
+                facets["genres"].get(genre.id, 0),
+                filtered.context["paginator"].count,
+            )
+        self.assertEqual(
+            sum(facets["decades"].values()),
+            response.context["paginator"].count,
+        )
+        return facets
+
+    def test_category(self):
+        url = reverse("movies:movie_categories", args=["films"])
+        facets = self.assert_facets_match_list(url)
+        self.assertEqual(
+            facets["genres"], {self.drama.id: 2, self.comedy.id: 2}
+        )
+        facets = self.assert_facets_match_list(
+            reverse("movies:movie_categories", args=["series"])
+        )
+        self.assertEqual(facets["genres"], {self.drama.id: 2})
+
+    def test_search(self):
+        url = reverse("movies:movie_search")
+        facets = self.assert_facets_match_list(url, s="космос")
+        self.assertEqual(
+            facets["genres"], {self.drama.id: 3, self.comedy.id: 1}
+        )
+        facets = self.assert_facets_match_list(url, s="море")
+        self.assertEqual(facets["genres"], {self.comedy.id: 1})
+
+    def test_api_search(self):
+        data = self.client.get(
+            "/api/v1/movies/facets/", {"search": "космос"}
+        ).json()
+        self.assertEqual(data["count"], 3)
+        self.assertEqual(
+            data["genres"],
+            {str(self.drama.id): 3, str(self.comedy.id): 1},
+        )
+        data = self.client.get("/api/v1/movies/facets/").json()
+        self.assertEqual(data["count"], 5)
+
+
+@override_settings(THROTTLE_RATES={
+    "comment": "2/min", "search": "2/min", "vote": "2/min",
+})
+class ThrottleTest(TestCase):
+    """Проверяет ограничение частоты запросов клиентов."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.movie = Movie.objects.create(name="Фильм", release_year=2000)
+
+    def setUp(self):
+        cache.clear()
+
+    def post_comment(self, **extra):
+        return self.client.post(
+            reverse("movies:add_comment", args=[self.movie.id]),
+            {"name": "Автор", "email": "author@mail.ru", "text": "Текст"},
+            **extra,
+        )
+
+    def test_view(self):
+        self.assertEqual(self.post_comment().status_code, 302)
+        self.assertEqual(self.post_comment().status_code, 302)
+        with self.assertLogs("movies.throttling", "WARNING"):
+            response = self.post_comment()
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response["Retry-After"], "30")
+        self.assertEqual(
+            self.post_comment(REMOTE_ADDR="10.0.0.1").status_code, 302
+        )
+        self.assertEqual(Comment.objects.count(), 3)
+        self.assertEqual(get_rejected_counts()["comment"], 1)
+        output = io.StringIO()
+        call_command("throttle_stats", "--reset", stdout=output)
+        self.assertIn("comment: 1", output.getvalue())
+        self.assertEqual(get_rejected_counts()["comment"], 0)
+
+    def test_api_search(self):
+        for _ in range(3):
+            self.assertEqual(
+                self.client.get("/api/v1/movies/").status_code, 200
+            )
+        for _ in range(2):
+            response = self.client.get("/api/v1/movies/?search=фильм")
+            self.assertEqual(response.status_code, 200)
+        with self.assertLogs("movies.throttling", "WARNING"):
+            response = self.client.get("/api/v1/movies/?search=фильм")
+        self.assertEqual(response.status_code, 429)
+        self.assertIn("Retry-After", response)
+        self.assertEqual(get_rejected_counts()["search"], 1)
+
+    def test_bucket_refill(self):
+        bucket = TokenBucket("test", "2/min")
+        with mock.patch("movies.throttling.time.time") as now:
+            now.return_value = 1000
+            self.assertEqual(bucket.consume("ip:1"), 0)
+            self.assertEqual(bucket.consume("ip:1"), 0)
+            self.assertEqual(bucket.consume("ip:1"), 30)
+            now.return_value = 1015
+            self.assertEqual(bucket.consume("ip:1"), 15)
+            now.return_value = 1030
+            self.assertEqual(bucket.consume("ip:1"), 0)
+            self.assertEqual(bucket.consume("ip:2"), 0)
+        self.assertIsNone(cache.get(bucket.get_cache_key("ip:1") + ":lock"))
+
+    def test_bucket_lock(self):
+        bucket = TokenBucket("test", "2/min")
+        bucket.lock_timeout = 0.05
+        lock_key = bucket.get_cache_key("ip:1") + ":lock"
+        cache.set(lock_key, 1)
+        self.assertEqual(bucket.consume("ip:1"), 0.05)
+        cache.delete(lock_key)
+        self.assertEqual(bucket.consume("ip:1"), 0)
+        self.assertEqual(bucket.consume("ip:1"), 0)
+        self.assertNotEqual(bucket.consume("ip:1"), 0)
+
+
+class MovieImporterTest(TestCase):
+    """Проверяет пакетный импорт фильмов."""
+
+    @staticmethod
+    def make_records(count, start=0):
+        return [
+            {
+                "Название": f"Фильм {number}",
+                "Год": 2000 + number % 20,
+                "Страна": [" сша", "Франция "],
+                "Жанры": ["драма", f"Жанр {number % 3}"],
+            }
+            for number in range(start, start + count)
+        ]
+
+    def test_import(self):
+        Genre.objects.create(name="Драма", slug="drama")
+        movie = Movie.objects.create(name="Фильм 0", release_year=2000)
+        records = self.make_records(3) + [
+            {"Название": "Фильм 1", "Год": 2001},
+            {"Название": "", "Год": 2000},
+            {"Название": "Без года"},
+        ]
+        stats = MovieImporter(chunk_size=2).run(records)
+        self.assertEqual(
+            stats, {"inserted": 2, "updated": 1, "skipped": 3}
+        )
+        self.assertEqual(Movie.objects.count(), 3)
+        self.assertEqual(
+            sorted(movie.genres.values_list("name", flat=True)),
+            ["Драма", "Жанр 0"],
+        )
+        self.assertEqual(
+            sorted(Country.objects.values_list("name", flat=True)),
+            ["Сша", "Франция"],
+        )
+        self.assertEqual(
+            sorted(Genre.objects.values_list("slug", flat=True)),
+            ["drama", "zhanr-0", "zhanr-1", "zhanr-2"],
+        )
+        category = Category.objects.get(name="Фильмы")
+        self.assertEqual(category.movies.count(), 3)
+        self.assertEqual(
+            list(movie_index.search(Movie.objects.all(), "фильм 2")),
+            list(Movie.objects.filter(name="Фильм 2")),
+        )
+        stats = MovieImporter().run(records)
+        self.assertEqual(
+            stats, {"inserted": 0, "updated": 0, "skipped": 6}
+        )
+
+    def test_constant_queries(self):
+        MovieImporter().run(self.make_records(3))
+        counts = []
+        for start, count in ((10, 5), (20, 50)):
+            with CaptureQueriesContext(connection) as queries:
+                MovieImporter().run(self.make_records(count, start))
+            counts.append(len(queries))
+        self.assertEqual(counts[0], counts[1])
+
+    def test_make_slug(self):
+        taken = {"boevik"}
+        self.assertEqual(make_slug("Боевик", taken), "boevik-2")
+        self.assertEqual(make_slug("Боевик", taken), "boevik-3")
+        self.assertEqual(make_slug("Sci-Fi", taken), "sci-fi")
+
+    def test_command(self):
+        path = self.make_file(self.make_records(2))
+        output = io.StringIO()
+        call_command("create_movies", path, stdout=output)
+        self.assertIn(
+            "Вставлено: 2, обновлено: 0, пропущено: 0", output.getvalue()
+        )
+
+    def test_sync(self):
+        records = self.make_records(10)
+        stats = MovieImporter(sync=True).run(records)
+        self.assertEqual(stats["inserted"], 10)
+        self.assertEqual(ImportedRecord.objects.count(), 10)
+        with CaptureQueriesContext(connection) as queries:
+            stats = MovieImporter(sync=True).run(records)
+        self.assertEqual(stats, {"inserted": 0, "updated": 0, "skipped": 10})
+        self.assertFalse(any(
+            Movie._meta.db_table in query["sql"] for query in queries
+        ))
+        records[0] = {
+            **records[0], "Жанры": ["Драма"], "Описание": "Новое описание",
+        }
+        records[1] = {**records[1], "Страна": "США"}
+        stats = MovieImporter(sync=True).run(records)
+        self.assertEqual(stats, {"inserted": 0, "updated": 2, "skipped": 8})
+        movie = Movie.objects.get(name="Фильм 0")
+        self.assertEqual(movie.description, "Новое описание")
+        self.assertEqual(
+            list(movie.genres.values_list("name", flat=True)), ["Драма"]
+        )
+        self.assertEqual(
+            list(movie_index.search(Movie.objects.all(), "описание")),
+            [movie],
+        )
+        self.assertEqual(
+            list(Movie.objects.get(name="Фильм 1").countries.values_list(
+                "name", flat=True
+            )),
+            ["Сша"],
+        )
+
+    def test_checkpoint(self):
+        path = os.path.join(tempfile.mkdtemp(), "import.checkpoint")
+        self.addCleanup(shutil.rmtree, os.path.dirname(path))
+        records = self.make_records(10)
+        importer = MovieImporter(
+            chunk_size=3, sync=True, checkpoint=Checkpoint(path, "feed")
+        )
+        original = importer.import_rows
+        chunks = []
+
+        def import_rows(rows, posters):
+            # Сбой на третьей порции
+            chunks.append(rows)
+            if len(chunks) == 3:
+                raise RuntimeError
+            original(rows, posters)
+
+        with mock.patch.object(importer, "import_rows", import_rows):
+            with self.assertRaises(RuntimeError):
+                importer.run(records)
+        self.assertEqual(Movie.objects.count(), 6)
+        self.assertEqual(Checkpoint(path, "feed").load(), 6)
+        self.assertEqual(Checkpoint(path, "other").load(), 0)
+        importer = MovieImporter(
+            chunk_size=3, sync=True, checkpoint=Checkpoint(path, "feed")
+        )
+        stats = importer.run(records)
+        self.assertEqual(stats, {"inserted": 4, "updated": 0, "skipped": 0})
+        self.assertEqual(Movie.objects.count(), 10)
+        self.assertFalse(os.path.exists(path))
+
+    def make_file(self, records):
+        file = tempfile.NamedTemporaryFile(
+            "w", suffix=".json", encoding="utf-8", delete=False
+        )
+        self.addCleanup(os.remove, file.name)
+        with file:
+            json.dump(records, file, ensure_ascii=False)
+        return file.name
+
+
+class FeedTest(TestCase):
+    """Проверяет потоковое чтение файлов импорта."""
+
+    RECORDS = [
+        {"Название": f"Фильм {number}", "Год": 2000, "Жанры": ["Драма"]}
+        for number in range(20)
+    ]
+
+    def write(self, text, compress=False):
+        file = tempfile.NamedTemporaryFile(delete=False)
+        self.addCleanup(os.remove, file.name)
+        with file:
+            data = text.encode()
+            file.write(gzip.compress(data) if compress else data)
+        return file.name
+
+    def test_formats(self):
+        array = json.dumps(self.RECORDS, ensure_ascii=False, indent=2)
+        ndjson = "\n".join(
+            json.dumps(record, ensure_ascii=False) for record in self.RECORDS
+        )
+        for text in (array, f"\ufeff {array}", ndjson + "\n\n"):
+            for compress in (False, True):
+                path = self.write(text, compress)
+                for read_size in (1, 7, 65536):
+                    with self.subTest(text=text[:10], read_size=read_size):
+                        self.assertEqual(
+                            list(read_feed(path, read_size)), self.RECORDS
+                        )
+        self.assertEqual(list(read_feed(self.write(" [ ] "))), [])
+        self.assertEqual(list(read_feed(self.write(""))), [])
+
+    def test_errors(self):
+        for text in ("[1,]", "[1 2]", "[{}", "[", '{"a": 1}\n{'):
+            for read_size in (1, 65536):
+                with self.subTest(text=text, read_size=read_size):
+                    with self.assertRaises(FeedError):
+                        list(read_feed(self.write(text), read_size))
+
+    def test_streaming(self):
+        # Записи возвращаются до того, как прочитан весь файл
+        text = json.dumps(self.RECORDS[:2])[:-1] + ", {"
+        records = read_feed(self.write(text), read_size=16)
+        self.assertEqual(next(records), self.RECORDS[0])
+        self.assertEqual(next(records), self.RECORDS[1])
+        with self.assertRaises(FeedError):
+            next(records)
+
+    def test_command(self):
+        ndjson = "\n".join(json.dumps(record) for record in self.RECORDS)
+        output = io.StringIO()
+        call_command(
+            "create_movies", self.write(ndjson, compress=True), stdout=output
+        )
+        self.assertIn("Вставлено: 20", output.getvalue())
+        with self.assertRaises(CommandError):
+            call_command("create_movies", self.write("[{}, 1"))
+
+
+class ImagePipelineTest(TestCase):
+    """Проверяет параллельную обработку постеров и фото персон."""
+
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=media_root.name))
+
+    @staticmethod
+    def make_image(color="red"):
+        output = io.BytesIO()
+        Image.new("RGB", (8, 8), color).save(output, format="JPEG")
+        return output.getvalue()
+
+    def assert_webp(self, field_file):
+        with Image.open(field_file.path) as image:
+            self.assertEqual(image.format, "WEBP")
+
+    def test_save(self):
+        movies = [
+            Movie.objects.create(name=f"Фильм {number}", release_year=2000)
+            for number in range(4)
+        ]
+        person = Person.objects.create(
+            first_name="Иван", last_name="Петров",
+            birthdate=datetime.date(1970, 1, 1),
+        )
+        jobs = [(movie, "poster", self.make_image()) for movie in movies]
+        jobs += [
+            (person, "picture", self.make_image("blue")),
+            (Movie(pk=movies[0].pk), "poster", b"not an image"),
+        ]
+        for workers in (0, 2):
+            with self.subTest(workers=workers):
+                pipeline = ImagePipeline(workers, max_pending=2)
+                with self.assertLogs("movies.images", "WARNING"):
+                    saved = pipeline.save(jobs)
+                self.assertEqual(len(saved), 5)
+                self.assertEqual(len(pipeline.failed), 1)
+                for movie in Movie.objects.all():
+                    self.assert_webp(movie.poster)
+                self.assert_webp(Person.objects.get().picture)
+
+    def test_reuse_executor(self):
+        self.assertIs(get_executor(2), get_executor(2))
+
+    def test_broken_pool(self):
+        movies = [
+            Movie.objects.create(name=f"Фильм {number}", release_year=2000)
+            for number in range(3)
+        ]
+        jobs = [(movie, "poster", self.make_image()) for movie in movies]
+        broken = mock.Mock()
+        broken.submit.side_effect = BrokenProcessPool
+        with mock.patch.dict("movies.images._executors", {2: broken}):
+            pipeline = ImagePipeline(2)
+            with self.assertLogs("movies.images", "WARNING"):
+                saved = pipeline.save(jobs)
+            # Первое задание отклонено сломанным пулом, остальные
+            # выполнены новым пулом
+            self.assertEqual(len(pipeline.failed), 1)
+            self.assertEqual(len(saved), 2)
+            executor = get_executor(2)
+            self.assertIsNot(executor, broken)
+            executor.shutdown()
+
+    def test_encode_before_transaction(self):
+        movie = Movie.objects.create(name="Фильм", release_year=2000)
+        pipeline = ImagePipeline(0)
+        encode, atomic = pipeline.encode, transaction.atomic
+        events = []
+
+        def logged_encode(jobs):
+            for result in encode(jobs):
+                events.append("encode")
+                yield result
+
+        def logged_atomic(*args, **kwargs):
+            events.append("atomic")
+            return atomic(*args, **kwargs)
+
+        with mock.patch.object(pipeline, "encode", logged_encode):
+            with mock.patch("movies.images.transaction.atomic", logged_atomic):
+                pipeline.save([(movie, "poster", self.make_image())])
+        # Транзакция открывается после кодирования (вторая - bulk_update)
+        self.assertEqual(events[:2], ["encode", "atomic"])
+
+    def test_import_posters(self):
+        poster_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(poster_dir.cleanup)
+        with open(os.path.join(poster_dir.name, "Мой_фильм.jpeg"), "wb") as f:
+            f.write(self.make_image())
+        importer = MovieImporter(poster_dir=poster_dir.name, workers=0)
+        importer.run([
+            {"Название": "Мой фильм", "Год": 1999},
+            {"Название": "Другой фильм", "Год": 1999},
+        ])
+        self.assert_webp(Movie.objects.get(name="Мой фильм").poster)
+        self.assertFalse(Movie.objects.get(name="Другой фильм").poster)
+
+    def test_admin_upload(self):
+        Movie.objects.create(name="Мой фильм", release_year=1999)
+        Movie.objects.create(name="Плохой фильм", release_year=1999)
+        admin = get_user_model().objects.create_superuser(
+            "admin", password="password"
+        )
+        self.client.force_login(admin)
+        url = reverse("admin:movies_movie_upload_images")
+        self.assertEqual(self.client.get(url).status_code, 200)
+        with self.settings(IMAGE_WORKERS=0):
+            response = self.client.post(url, {"images": [
+                SimpleUploadedFile("Мой_фильм.jpeg", self.make_image()),
+                SimpleUploadedFile("Нет_фильма.jpeg", self.make_image()),
+            ]})
+        self.assertRedirects(
+            response, reverse("admin:movies_movie_changelist")
+        )
+        self.assert_webp(Movie.objects.get(name="Мой фильм").poster)
+        # Ошибка PIL не прерывает загрузку, файл указывается в сообщении
+        encode = mock.patch(
+            "movies.images.encode_webp", side_effect=SyntaxError("broken")
+        )
+        with self.settings(IMAGE_WORKERS=0), encode:
+            with self.assertLogs("movies.images", "WARNING"):
+                response = self.client.post(url, {"images": [
+                    SimpleUploadedFile("Плохой_фильм.jpeg", self.make_image()),
+                ]}, follow=True)
+        self.assertContains(response, "не удалось обработать: Плохой фильм")
+
+
+class CatalogGeneratorTest(TestCase):
+    """Проверяет генератор синтетического каталога."""
+
+    SIZES = {
+        "users": 10, "persons": 30, "movies": 40, "ratings": 400,
+        "comments": 150, "votes": 200, "bookmarks": 50,
+    }
+
+    def snapshot(self):
+        return {
+            "movies": list(Movie.objects.order_by("pk").values_list(
+                "name", "release_year", "rating_sum", "rating_count"
+            )),
+            "comments": list(Comment.objects.order_by("pk").values_list(
+                "movie__name", "major__text", "text", "likes", "dislikes"
+            )),
+            "persons": list(Person.objects.order_by("pk").values_list(
+                "last_name", "is_actor", "is_director", "likes", "dislikes"
+            )),
+        }
+
+    def test_generate(self):
+        with transaction.atomic():
+            counts = CatalogGenerator(seed=1, **self.SIZES).run()
+            snapshot = self.snapshot()
+            transaction.set_rollback(True)
+        self.assertEqual(counts["Фильмы"], 40)
+        self.assertEqual(counts["Комментарии"], 150)
+        self.assertEqual(counts["Лайки"], 200)
+        output = io.StringIO()
+        call_command(
+            "generate_catalog", "--seed=1",
+            *(f"--{name}={size}" for name, size in self.SIZES.items()),
+            stdout=output,
+        )
+        self.assertEqual(self.snapshot(), snapshot)
+        with self.assertRaises(CommandError):
+            call_command("generate_catalog", "--seed=1", stdout=output)
+        self.assertTrue(Comment.objects.filter(
+            major__major__isnull=False
+        ).exists())
+        self.assertFalse(Comment.objects.exclude(
+            major__isnull=True
+        ).exclude(major__movie=F("movie")).exists())
+        # Первые фильмы популярнее остальных
+        movies = Movie.objects.order_by("pk")
+        self.assertGreater(
+            movies[0].rating_count, movies.reverse()[0].rating_count
+        )
+        self.assertEqual(
+            sum(movie.rating_count for movie in movies), 400
+        )
+        self.assertEqual(
+            sum(Person.objects.values_list("likes", flat=True))
+            + sum(Comment.objects.values_list("likes", flat=True)),
+            LikeDislike.objects.filter(vote=1).count(),
+        )
+        self.assertTrue(Person.objects.filter(is_actor=True).exists())
@@ -0,0 +1,151 @@
+"""Ограничение частоты запросов клиентов (корзина токенов в кеше)."""
+
+import logging
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .utils import get_ip
+
+logger = logging.getLogger(__name__)
+
+PERIODS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+
+def parse_rate(rate):
+    """
+    Преобразует частоту вида 'N/период' ('10/min', '100/hour'; период
+    определяется по первой букве: s, m, h, d) в пару (N, секунды).
+    """
+    count, period = rate.split("/")
+    return int(count), PERIODS[period[0]]
+
+
+class TokenBucket:
+    """
+    Корзина токенов области 'scope' с частотой 'rate' ('N/период').
+
+    Корзина каждого клиента вмещает N токенов и пополняется на N токенов
+    за период; Каждый запрос расходует токен, поэтому клиент может сделать
+    N запросов подряд, а затем - не чаще N за период. Состояние корзины
+    (остаток токенов и время последнего запроса) хранится в кеше;
+    Чтение и запись состояния выполняются под блокировкой клиента
+    (ключ, созданный атомарным cache.add), поэтому одновременные запросы
+    клиента не расходуют один и тот же токен. Блокировка истекает через
+    'lock_timeout' секунд, если процесс не снял ее; Если блокировку не
+    удалось получить за это время, то запрос отклоняется.
+    """
+
+    lock_timeout = 1
+    lock_poll = 0.01
+
+    def __init__(self, scope, rate):
+        self.scope = scope
+        self.capacity, self.period = parse_rate(rate)
+        self.fill_rate = self.capacity / self.period
+
+    def get_cache_key(self, ident):
+        return f"throttle:{self.scope}:{ident}"
+
+    def consume(self, ident):
+        """
+        Расходует токен клиента 'ident'; Возвращает 0, если запрос
+        разрешен, иначе - количество секунд до появления токена.
+        """
+        key = self.get_cache_key(ident)
+        lock_key = f"{key}:lock"
+        if not self.acquire(lock_key):
+            return self.lock_timeout
+        try:
+            return self.take_token(key)
+        finally:
+            cache.delete(lock_key)
+
+    def acquire(self, lock_key):
+        """
+        Ждет блокировку 'lock_key' не дольше 'lock_timeout' секунд;
+        Возвращает True, если блокировка получена.
+        """
+        deadline = time.monotonic() + self.lock_timeout
+        while not cache.add(lock_key, 1, self.lock_timeout):
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(self.lock_poll)
+        return True
+
+    def take_token(self, key):
+        now = time.time()
+        state = cache.get(key)
+        tokens = self.capacity
+        if state is not None:
+            tokens, updated = state
+            tokens = min(
+                self.capacity, tokens + (now - updated) * self.fill_rate
+            )
+        if tokens < 1:
+            return (1 - tokens) / self.fill_rate
+        cache.set(key, (tokens - 1, now), self.period)
+        return 0
+
+
+def get_bucket(scope):
+    """
+    Возвращает корзину области 'scope' по настройке THROTTLE_RATES;
+    Если частота области не задана, то возвращает None.
+    """
+    rate = getattr(settings, "THROTTLE_RATES", {}).get(scope)
+    if rate is None:
+        return None
+    return TokenBucket(scope, rate)
+
+
+def get_client_ident(request):
+    """Идентификатор клиента: пользователь или IP-адрес."""
+    user = getattr(request, "user", None)
+    if user is not None and user.is_authenticated:
+        return f"user:{user.pk}"
+    return f"ip:{get_ip(request)}"
+
+
+def get_rejected_key(scope):
+    return f"throttle_rejected:{scope}"
+
+
+def check_throttle(request, scope):
+    """
+    Проверяет запрос по корзине области 'scope'; Возвращает 0, если запрос
+    разрешен, иначе - количество секунд до следующего разрешенного
+    запроса. Отклоненный запрос учитывается в счетчике области.
+    """
+    bucket = get_bucket(scope)
+    if bucket is None:
+        return 0
+    ident = get_client_ident(request)
+    wait = bucket.consume(ident)
+    if wait:
+        record_rejection(scope, ident)
+    return wait
+
+
+def record_rejection(scope, ident):
+    """Увеличивает счетчик отклоненных запросов области."""
+    key = get_rejected_key(scope)
+    if not cache.add(key, 1, None):
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, 1, None)
+    logger.warning("Запрос отклонен: область %s, клиент %s", scope, ident)
+
+
+def get_rejected_counts():
+    """Возвращает количество отклоненных запросов по областям."""
+    scopes = getattr(settings, "THROTTLE_RATES", {})
+    counts = cache.get_many([get_rejected_key(scope) for scope in scopes])
+    return {scope: counts.get(get_rejected_key(scope), 0) for scope in scopes}
+
+
+def reset_rejected_counts():
+    scopes = getattr(settings, "THROTTLE_RATES", {})
+    cache.delete_many([get_rejected_key(scope) for scope in scopes])
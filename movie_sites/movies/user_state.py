@@ -0,0 +1,90 @@
+"""Состояние пользователя (голоса и закладки) в рамках одного запроса."""
+
+from collections import defaultdict
+
+from django.contrib.contenttypes.models import ContentType
+
+from .models import Bookmark, LikeDislike
+
+
+class UserStateResolver:
+    """
+    Резолвер голосов и закладок пользователя.
+
+    Объекты, которые будут выведены на странице, регистрируются методом
+    'register'. При первом обращении к голосу или закладке объекта
+    определенной модели одним запросом извлекаются данные для всех
+    зарегистрированных объектов этой модели; последующие обращения
+    читаются из памяти. Голос, извлеченный вместе с объектом (аннотация
+    'my_vote', см. 'PersonQuerySet.with_vote_stats'), берется из объекта.
+    """
+
+    def __init__(self, user):
+        self.user = user
+        self._pending = defaultdict(set)
+        self._votes = {}
+        self._voted_ids = defaultdict(set)
+        self._bookmarks = set()
+        self._bookmarked_ids = defaultdict(set)
+
+    @property
+    def is_active(self):
+        return self.user is not None and self.user.is_authenticated
+
+    def register(self, *objects):
+        """Регистрирует объекты, для которых понадобится состояние."""
+        for obj in objects:
+            content_type = ContentType.objects.get_for_model(obj)
+            self._pending[content_type.id].add(obj.pk)
+
+    def get_vote(self, obj):
+        """
+        Возвращает голос пользователя за объект (1 или -1);
+        Если пользователь не голосовал, то возвращает None.
+        """
+        if not self.is_active:
+            return None
+        if hasattr(obj, "my_vote"):
+            return obj.my_vote
+        content_type = ContentType.objects.get_for_model(obj)
+        if obj.pk not in self._voted_ids[content_type.id]:
+            ids = self._unresolved(content_type, obj, self._voted_ids)
+            votes = LikeDislike.objects.filter(
+                user=self.user, content_type=content_type, object_id__in=ids
+            ).values_list("object_id", "vote")
+            for object_id, vote in votes:
+                self._votes[(content_type.id, object_id)] = vote
+        return self._votes.get((content_type.id, obj.pk))
+
+    def has_bookmark(self, obj):
+        """Определяет находится ли объект в закладках пользователя."""
+        if not self.is_active:
+            return False
+        content_type = ContentType.objects.get_for_model(obj)
+        if obj.pk not in self._bookmarked_ids[content_type.id]:
+            ids = self._unresolved(content_type, obj, self._bookmarked_ids)
+            bookmarks = Bookmark.objects.filter(
+                user=self.user, content_type=content_type, object_id__in=ids
+            ).values_list("object_id", flat=True)
+            for object_id in bookmarks:
+                self._bookmarks.add((content_type.id, object_id))
+        return (content_type.id, obj.pk) in self._bookmarks
+
+    def _unresolved(self, content_type, obj, resolved):
+        """
+        Возвращает id зарегистрированных объектов модели, данные по которым
+        еще не извлекались, и помечает их как извлеченные.
+        """
+        ids = (self._pending[content_type.id] | {obj.pk})
+        ids -= resolved[content_type.id]
+        resolved[content_type.id] |= ids
+        return ids
+
+
+def get_user_state(request):
+    """Возвращает резолвер состояния пользователя для текущего запроса."""
+    user_state = getattr(request, "_user_state", None)
+    if user_state is None:
+        user_state = UserStateResolver(getattr(request, "user", None))
+        request._user_state = user_state
+    return user_state
@@ -1,6 +1,6 @@
 from django.contrib import messages
 from django.contrib.contenttypes.models import ContentType
-from django.db.models import Avg, Q
+from django.db import IntegrityError, transaction
 from django.forms.models import inlineformset_factory
 from django.http import HttpResponse
 from django.shortcuts import redirect, render
@@ -8,11 +8,20 @@ from django.urls import reverse_lazy
 from django.views.generic import CreateView, DetailView, ListView
 from django.views.generic.base import View
 
+from .cache import bump_catalog_version
+from .filters import FullTextSearchMixin
 from .forms import (
     CommentForm, MovieActorForm, MovieForm, PersonForm, RatingForm,
 )
-from .mixins import BaseMovieListMixin, BasePersonListMixin
+from .loaders import CommentThreadLoader
+from .mixins import (
+    BaseMovieListMixin, BasePersonListMixin, QueryPlanMixin, ThrottleMixin,
+    UserStateMixin,
+)
 from .models import Bookmark, LikeDislike, Movie, MovieActor, Person, Rating
+from .query_plans import QueryPlan
+from .search import movie_index, person_index
+from .user_state import get_user_state
 from .utils import get_ip
 
 
@@ -24,30 +33,45 @@ class MovieListView(BaseMovieListMixin):
 class MovieCategoriesView(BaseMovieListMixin):
     """Возвращает список фильмов по определенной категории."""
 
-    def get_queryset(self):
+    def get_base_queryset(self):
         category_slug = self.kwargs["category_slug"]
-        return super().get_queryset().filter(category__slug=category_slug)
+        return super().get_base_queryset().filter(
+            category__slug=category_slug
+        )
 
 
-class MovieDetailView(DetailView):
+class MovieDetailView(UserStateMixin, QueryPlanMixin, DetailView):
     """Класс-представление для вывода определенного фильма по 'id'."""
 
     model = Movie
     template_name = "movies/movie_detail.html"
     pk_url_kwarg = "movie_id"
+    query_plan = QueryPlan(
+        select_related=("category",),
+        prefetch_related=("countries", "genres", "directors", "actors"),
+    )
 
     def get_context_data(self, **kwargs):
         """
         Добавление формы 'RatingForm' с полем 'score' для оценки пользователем
         текущего фильма. Поле 'ip' определяется из request.
         Если пользователь уже оценил фильм, то выводит его предыдущую оценку.
+        Дерево комментариев с голосами загружается заранее
+        (см. 'CommentThreadLoader').
         """
 
         context = super().get_context_data(**kwargs)
         context["rating_form"] = RatingForm()
         context["form"] = CommentForm()
+        context["comments"] = self.get_comments()
         return context
 
+    def get_comments(self):
+        """Корневые комментарии фильма с деревом ответов и голосами."""
+        return CommentThreadLoader(
+            get_user_state(self.request)
+        ).load_for(self.object)
+
 
 class MovieCreateView(CreateView):  # добавить функционал чтобы добавлять мог только администратор
     """Создание нового фильма."""
@@ -98,26 +122,21 @@ class MovieCreateView(CreateView):  # добавить функционал чт
         )
 
 
-class MovieSearchView(BaseMovieListMixin):  # настроить взаимодействие поиска и фильтра
-    """Класс-представления для поиска фильма по названию."""
+class MovieSearchView(ThrottleMixin, FullTextSearchMixin, BaseMovieListMixin):  # настроить взаимодействие поиска и фильтра
+    """
+    Класс-представления для полнотекстового поиска фильма по названию
+    и описанию.
+    """
 
-    def get_queryset(self):
-        search = self.request.GET.get("s")
-        if search:
-            return super().get_queryset().filter(name__icontains=search)
-        return super().get_queryset()
+    search_index = movie_index
+    throttle_scope = "search"
 
 
-class PersonSearchView(BasePersonListMixin):  # настроить взаимодействие поиска и фильтра
-    """Класс представление для поиска персон."""
+class PersonSearchView(ThrottleMixin, FullTextSearchMixin, BasePersonListMixin):  # настроить взаимодействие поиска и фильтра
+    """Класс представление для полнотекстового поиска персон."""
 
-    def get_queryset(self):
-        search = self.request.GET.get("s")
-        if search:
-            return super().get_queryset().filter(
-                Q(first_name__icontains=search) | Q(last_name__icontains=search)
-            )
-        return super().get_queryset()
+    search_index = person_index
+    throttle_scope = "search"
 
 
 class PersonListView(BasePersonListMixin):
@@ -133,12 +152,20 @@ class PersonCreateView(CreateView):
     extra_context = {"title": "Создание нового актера"}
 
 
-class PersonDetailView(DetailView):
+class PersonDetailView(UserStateMixin, QueryPlanMixin, DetailView):
     """Возвращает определенную по id персону."""
     model = Person
     template_name = "movies/person_detail.html"
     extra_context = {"title": "Детальная информация"}
     pk_url_kwarg = "person_id"
+    query_plan = QueryPlan(
+        select_related=("country",),
+        prefetch_related=("actor_movies", "director_movies"),
+    )
+
+    def get_queryset(self):
+        """Голос пользователя извлекается вместе с персоной."""
+        return super().get_queryset().with_vote_stats(self.request.user)
 
 
 class BookmarkMovieListView(BaseMovieListMixin):
@@ -147,8 +174,12 @@ class BookmarkMovieListView(BaseMovieListMixin):
     авторизированного пользователя.
     """
 
-    def get_queryset(self):
-        return super().get_queryset().filter(bookmarks__user=self.request.user)
+    count_cache_enabled = False
+
+    def get_base_queryset(self):
+        return super().get_base_queryset().filter(
+            bookmarks__user=self.request.user
+        )
 
 
 class BookmarkPersonListView(BasePersonListMixin):
@@ -157,14 +188,19 @@ class BookmarkPersonListView(BasePersonListMixin):
     авторизированного пользователя.
     """
 
-    def get_queryset(self):
-        return super().get_queryset().filter(bookmarks__user=self.request.user)
+    count_cache_enabled = False
+
+    def get_base_queryset(self):
+        return super().get_base_queryset().filter(
+            bookmarks__user=self.request.user
+        )
 
 
-class AddBookmarkView(View):
+class AddBookmarkView(ThrottleMixin, View):
     """Добавление закладки на определенный контент, а также её удаление."""
 
     model = None
+    throttle_scope = "bookmark"
 
     def get(self, request, pk):
         bookmark, created = Bookmark.objects.get_or_create(
@@ -177,9 +213,11 @@ class AddBookmarkView(View):
         return redirect(request.META.get("HTTP_REFERER", "/"))
 
 
-class AddComment(View):
+class AddComment(ThrottleMixin, View):
     """Добавление комментария."""
 
+    throttle_scope = "comment"
+
     def post(self, request, pk):
         form = CommentForm(request.POST)
         movie = Movie.objects.get(id=pk)
@@ -192,48 +230,91 @@ class AddComment(View):
         return redirect(movie.get_absolute_url())
 
 
-class AddRating(View):
-    """Добавление рейтинга фильму."""
+class AddRating(ThrottleMixin, View):
+    """
+    Добавление рейтинга фильму. Сумма и количество оценок фильма
+    изменяются атомарно, поэтому рейтинг пересчитывается за O(1)
+    без агрегации всех оценок фильма. Версия данных фильмов меняется,
+    только если изменилась целая часть рейтинга (см. 'update_rating').
+    """
+
+    throttle_scope = "rating"
 
     def post(self, request):
         form = RatingForm(request.POST)
         if form.is_valid():
-            rating, _ = Rating.objects.update_or_create(
-                movie_id=int(request.POST.get("movie")),
-                ip=get_ip(request),
-                defaults={"score": request.POST.get("score")},
-            )
-            avg_rating = (
-                rating.movie.ratings.values("movie")
-                .annotate(avg=Avg("score"))[0]
-                .get("avg")
-            )
-            rating.movie.rating = avg_rating
-            rating.movie.save()
-            return redirect("movies:movie_detail", request.POST.get("movie"))
+            movie_id = int(request.POST.get("movie"))
+            score = int(form.cleaned_data["score"])
+            ip = get_ip(request)
+            changed = False
+            with transaction.atomic():
+                rating = Rating.objects.select_for_update().filter(
+                    movie_id=movie_id, ip=ip
+                ).first()
+                if rating is None:
+                    try:
+                        with transaction.atomic():
+                            Rating.objects.create(
+                                movie_id=movie_id, ip=ip, score=score
+                            )
+                    except IntegrityError:
+                        # Оценку с этого IP-адреса уже создал параллельный
+                        # запрос (уникальность пары фильм - IP)
+                        rating = Rating.objects.select_for_update().get(
+                            movie_id=movie_id, ip=ip
+                        )
+                    else:
+                        changed = Movie.update_rating(
+                            movie_id, score, count_delta=1
+                        )
+                if rating is not None and rating.score != score:
+                    changed = Movie.update_rating(
+                        movie_id, score - rating.score
+                    )
+                    rating.score = score
+                    rating.save(update_fields=["score"])
+            if changed:
+                bump_catalog_version(Movie)
+            return redirect("movies:movie_detail", movie_id)
         return HttpResponse(status=400)
 
 
-class LikeDislikeView(View):
+class LikeDislikeView(ThrottleMixin, View):
     """
     Создание лайков и дизлайков на определенный контент,
-    а также их удаление.
+    а также их удаление. Счетчики 'likes' и 'dislikes' объекта
+    изменяются атомарно в той же транзакции.
     """
 
     model = None
+    throttle_scope = "vote"
 
     def get(self, request, pk, vote):
         votes = {"1": "like", "-1": "dislike"}
         obj = self.model.objects.get(pk=pk)
         content_type = ContentType.objects.get_for_model(obj)
-        likedislike, created = LikeDislike.objects.get_or_create(
-            user=request.user, content_type=content_type, object_id=obj.id
-        )
-        if not created and likedislike.vote == int(vote):
-            likedislike.delete()
-            messages.success(request, f"{votes[vote]} удален")
-        else:
-            likedislike.vote = vote
-            likedislike.save()
-            messages.success(request, f"{votes[vote]} создан")
+        with transaction.atomic():
+            likedislike = LikeDislike.objects.select_for_update().filter(
+                user=request.user, content_type=content_type, object_id=obj.id
+            ).first()
+            old_vote = likedislike.vote if likedislike else None
+            if old_vote == int(vote):
+                likedislike.delete()
+                self.model.update_vote_counters(obj.id, old_vote=old_vote)
+                messages.success(request, f"{votes[vote]} удален")
+            else:
+                if likedislike is None:
+                    LikeDislike.objects.create(
+                        user=request.user,
+                        content_type=content_type,
+                        object_id=obj.id,
+                        vote=vote,
+                    )
+                else:
+                    likedislike.vote = vote
+                    likedislike.save(update_fields=["vote"])
+                self.model.update_vote_counters(
+                    obj.id, old_vote=old_vote, new_vote=vote
+                )
+                messages.success(request, f"{votes[vote]} создан")
         return redirect(request.META.get("HTTP_REFERER", "/"))
@@ -0,0 +1,135 @@
+"""Аутентификация API по JWT с кешированием пользователей."""
+
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import (
+    AuthenticationFailed, InvalidToken,
+)
+from rest_framework_simplejwt.settings import api_settings
+
+
+class UserCache:
+    """
+    Двухуровневый кеш пользователей по id: словарь в памяти процесса
+    (время жизни JWT_USER_LOCAL_CACHE_TIMEOUT секунд) и общий кеш Django
+    (JWT_USER_CACHE_TIMEOUT секунд). Запись удаляется из обоих уровней
+    при сохранении или удалении пользователя (см. signals.py); Записи
+    в памяти других процессов устаревают не позднее, чем через время
+    жизни локального уровня.
+
+    В кеше хранятся только id и поля 'fields' (без хеша пароля и email),
+    из которых 'get' собирает пользователя как загруженного из БД с
+    отложенными остальными полями: они загружаются из БД при первом
+    обращении, а 'save' записывает только загруженные поля, поэтому
+    незагруженные поля не перезаписываются.
+    """
+
+    key_prefix = "jwt_user"
+    max_local_size = 1000
+    fields = ("is_active", "is_staff", "is_superuser")
+
+    def __init__(self):
+        self._local = {}
+
+    @property
+    def timeout(self):
+        return getattr(settings, "JWT_USER_CACHE_TIMEOUT", 60)
+
+    @property
+    def local_timeout(self):
+        return getattr(settings, "JWT_USER_LOCAL_CACHE_TIMEOUT", 5)
+
+    def get_cache_key(self, user_id):
+        return f"{self.key_prefix}:{user_id}"
+
+    def get(self, user_id):
+        """
+        Возвращает нового облегченного пользователя из кеша (чтобы запросы
+        не изменяли общий объект) или None.
+        """
+        expires, data = self._local.get(user_id, (0, None))
+        if expires <= time.monotonic():
+            data = cache.get(self.get_cache_key(user_id))
+            if data is None:
+                return None
+            self._set_local(user_id, data)
+        return self.build_user(data)
+
+    def set(self, user_id, user):
+        data = {"pk": user.pk}
+        data |= {field: getattr(user, field) for field in self.fields}
+        cache.set(self.get_cache_key(user_id), data, self.timeout)
+        self._set_local(user_id, data)
+
+    def build_user(self, data):
+        """
+        Пользователь с id и полями записи кеша, остальные поля которого
+        отложены (как у объекта из queryset.only()).
+        """
+        model = get_user_model()
+        data = {**data, model._meta.pk.attname: data["pk"]}
+        # from_db принимает значения в порядке полей модели
+        names = [
+            field.attname for field in model._meta.concrete_fields
+            if field.attname in data
+        ]
+        return model.from_db(
+            model.objects.db, names, [data[name] for name in names]
+        )
+
+    def delete(self, user_id):
+        cache.delete(self.get_cache_key(user_id))
+        self._local.pop(user_id, None)
+
+    def clear_local(self):
+        self._local.clear()
+
+    def _set_local(self, user_id, user):
+        now = time.monotonic()
+        if len(self._local) >= self.max_local_size:
+            self._local = {
+                key: value for key, value in self._local.items()
+                if value[0] > now
+            }
+        self._local[user_id] = (now + self.local_timeout, user)
+
+
+user_cache = UserCache()
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication, извлекающая пользователя токена из кеша
+    'user_cache' вместо запроса к БД на каждый запрос API. Проверки
+    токена и ошибки (нет id пользователя, пользователь не найден или
+    неактивен) - те же, что у JWTAuthentication.
+    """
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(
+                _("Token contained no recognizable user identification")
+            )
+        user = user_cache.get(user_id)
+        if user is None:
+            try:
+                user = self.user_model.objects.get(
+                    **{api_settings.USER_ID_FIELD: user_id}
+                )
+            except self.user_model.DoesNotExist:
+                raise AuthenticationFailed(
+                    _("User not found"), code="user_not_found"
+                )
+            user_cache.set(user_id, user)
+        if not user.is_active:
+            raise AuthenticationFailed(
+                _("User is inactive"), code="user_inactive"
+            )
+        return user
@@ -0,0 +1,18 @@
+"""Обработчики сигналов модели пользователя."""
+
+from django.conf import settings
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework_simplejwt.settings import api_settings
+
+from .authentication import user_cache
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def invalidate_user_cache(sender, instance, **kwargs):
+    """
+    Удаляет пользователя из кеша аутентификации API при любом изменении
+    (смена пароля, деактивация) или удалении.
+    """
+    user_cache.delete(getattr(instance, api_settings.USER_ID_FIELD))
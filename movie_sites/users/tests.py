@@ -1,3 +1,111 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework_simplejwt.tokens import AccessToken
 
-# Create your tests here.
+from .authentication import user_cache
+
+
+class CachedJWTAuthenticationTest(TestCase):
+    """
+    Проверяет, что пользователь JWT извлекается из кеша, а изменение
+    или удаление пользователя сбрасывает запись кеша.
+    """
+
+    url = "/api/v1/movies/"
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(
+            "reader", "reader@mail.ru", password="password",
+            first_name="Иван",
+        )
+
+    def setUp(self):
+        cache.clear()
+        user_cache.clear_local()
+        self.auth = {
+            "HTTP_AUTHORIZATION": f"Bearer {AccessToken.for_user(self.user)}"
+        }
+
+    def count_user_queries(self):
+        table = get_user_model()._meta.db_table
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url, **self.auth)
+        self.assertEqual(response.status_code, 200)
+        return sum(table in query["sql"] for query in queries)
+
+    def test_user_cached(self):
+        self.assertEqual(self.count_user_queries(), 1)
+        self.assertEqual(self.count_user_queries(), 0)
+        # Запись общего кеша используется после истечения локальной
+        user_cache.clear_local()
+        self.assertEqual(self.count_user_queries(), 0)
+
+    def test_cached_fields(self):
+        self.count_user_queries()
+        self.assertEqual(
+            cache.get(user_cache.get_cache_key(self.user.pk)),
+            {
+                "pk": self.user.pk, "is_active": True, "is_staff": False,
+                "is_superuser": False,
+            },
+        )
+        user = user_cache.get(self.user.pk)
+        self.assertEqual(user.pk, self.user.pk)
+        self.assertIn("password", user.get_deferred_fields())
+        self.assertTrue(user.is_authenticated)
+        # Отложенные поля загружаются из БД при обращении
+        self.assertEqual(user.username, "reader")
+
+    def test_me(self):
+        self.count_user_queries()
+        url = "/api/v1/auth/users/me/"
+        response = self.client.get(url, **self.auth)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["username"], "reader")
+        self.assertEqual(response.json()["email"], "reader@mail.ru")
+        # Изменяются только переданные поля, остальные не перезаписываются
+        response = self.client.patch(
+            url, {"email": "new@mail.ru"}, content_type="application/json",
+            **self.auth,
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["username"], "reader")
+        user = get_user_model().objects.get(pk=self.user.pk)
+        self.assertEqual(user.email, "new@mail.ru")
+        self.assertEqual(user.username, "reader")
+        self.assertEqual(user.first_name, "Иван")
+        self.assertEqual(user.password, self.user.password)
+
+    def test_save_invalidates(self):
+        self.count_user_queries()
+        self.user.password = make_password("new-password")
+        self.user.save()
+        self.assertEqual(self.count_user_queries(), 1)
+
+    def test_inactive_user(self):
+        self.count_user_queries()
+        self.user.is_active = False
+        self.user.save()
+        response = self.client.get(self.url, **self.auth)
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response.json()["code"], "user_inactive")
+
+    def test_deleted_user(self):
+        self.count_user_queries()
+        self.user.delete()
+        response = self.client.get(self.url, **self.auth)
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response.json()["code"], "user_not_found")
+
+    def test_token_without_user_id(self):
+        token = AccessToken()
+        response = self.client.get(
+            self.url, HTTP_AUTHORIZATION=f"Bearer {token}"
+        )
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response.json()["code"], "token_not_valid")